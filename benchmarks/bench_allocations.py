@@ -0,0 +1,188 @@
+"""
+Бенчмарк выделения памяти в покадровом конвейере
+
+Сравнивает текущий ObjectTracker.process_frame (буферы и ядро переиспользуются)
+с прежней реализацией, которая на каждом кадре создавала ядро, границы и все
+промежуточные изображения. Отдельно меряется путь отображения: разметка поверх
+кадра и уменьшенная RGB-копия для окна.
+
+Учитываются выделения, видимые tracemalloc (объекты Python и массивы numpy,
+включая результаты OpenCV). Для каждого кадра берётся пик выделенной памяти
+сверх уровня до обработки кадра.
+
+Пример:
+    python benchmarks/bench_allocations.py --width 1920 --height 1080 --frames 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results
+
+add_src_to_path()
+
+import cv2
+import numpy as np
+
+from core.object_tracker import ObjectTracker
+from utils.buffer_pool import BufferPool
+
+# Зелёный объект на тёмном фоне и настройки, которые его находят
+OBJECT_COLOR = (40, 220, 40)
+TRACKING_SETTINGS = {
+    'hue_low': 50, 'hue_high': 70,
+    'saturation_low': 100, 'saturation_high': 255,
+    'value_low': 100, 'value_high': 255,
+    'skip_stationary': False
+}
+DISPLAY_SIZE = (960, 540)
+
+
+def make_frames(width: int, height: int, count: int) -> List[np.ndarray]:
+    """Кадры с движущимся по окружности кругом (создаются до начала замеров)"""
+    frames = []
+    radius = max(8, min(width, height) // 30)
+    for i in range(count):
+        frame = np.full((height, width, 3), 30, dtype=np.uint8)
+        angle = 2 * np.pi * i / max(count, 1)
+        center = (int(width / 2 + width / 4 * np.cos(angle)),
+                  int(height / 2 + height / 4 * np.sin(angle)))
+        cv2.circle(frame, center, radius, OBJECT_COLOR, -1)
+        frames.append(frame)
+    return frames
+
+
+def legacy_process_frame(frame: np.ndarray, settings: Dict):
+    """Прежний конвейер трекера: новые массивы на каждом шаге"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    lower_bound = np.array([settings['hue_low'], settings['saturation_low'], settings['value_low']])
+    upper_bound = np.array([settings['hue_high'], settings['saturation_high'], settings['value_high']])
+    mask = cv2.inRange(hsv, lower_bound, upper_bound)
+    kernel = np.ones((5, 5), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, iterations=settings['morph_iters'])
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=settings['morph_iters'])
+    if settings['blur_size'] > 0:
+        mask = cv2.GaussianBlur(mask, (settings['blur_size'], settings['blur_size']), 0)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest_contour = max(contours, key=cv2.contourArea)
+    M = cv2.moments(largest_contour)
+    if M["m00"] == 0:
+        return None
+    return int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"]), cv2.contourArea(largest_contour)
+
+
+def legacy_display(frame: np.ndarray, tracker: ObjectTracker, position):
+    """Прежний путь отображения: копия кадра, RGB полного размера, затем уменьшение"""
+    display_frame = frame.copy()
+    if position:
+        display_frame = tracker.draw_tracking_info(display_frame, position)
+    rgb_frame = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
+    return cv2.resize(rgb_frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def pooled_display(frame: np.ndarray, tracker: ObjectTracker, position, buffers: BufferPool):
+    """Текущий путь отображения (как в MainWindow): всё в переиспользуемых буферах"""
+    display_frame = frame
+    if position:
+        display_frame = buffers.copy_of('overlay', frame)
+        display_frame = tracker.draw_tracking_info(display_frame, position)
+    width, height = DISPLAY_SIZE
+    scaled = cv2.resize(display_frame, DISPLAY_SIZE, interpolation=cv2.INTER_AREA,
+                        dst=buffers.get('scaled', (height, width, 3)))
+    return cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB, dst=buffers.get('rgb', (height, width, 3)))
+
+
+def measure(step: Callable[[np.ndarray], object], frames: List[np.ndarray], warmup: int) -> Dict:
+    """Пиковое выделение памяти и время на кадр в установившемся режиме"""
+    for frame in frames[:warmup]:
+        step(frame)
+
+    peaks = []
+    durations = []
+    tracemalloc.start()
+    try:
+        for frame in frames[warmup:]:
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            step(frame)
+            durations.append(time.perf_counter() - started)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+    frame_bytes = frames[0].nbytes
+    return {
+        'frames': len(peaks),
+        'alloc_peak_mean_bytes': statistics.mean(peaks),
+        'alloc_peak_max_bytes': max(peaks),
+        'alloc_per_frame_ratio': statistics.mean(peaks) / frame_bytes,
+        'time_mean_ms': statistics.mean(durations) * 1000
+    }
+
+
+def run(width: int, height: int, frame_count: int, warmup: int) -> Dict:
+    """Прогнать все варианты конвейера на одних и тех же кадрах"""
+    frames = make_frames(width, height, frame_count + warmup)
+
+    tracker = ObjectTracker()
+    tracker.update_settings(TRACKING_SETTINGS)
+    tracker.tracking_enabled = True
+    settings = dict(tracker.settings)
+
+    buffers = BufferPool()
+
+    def pooled_pipeline(frame):
+        position = tracker.process_frame(frame)
+        pooled_display(frame, tracker, position, buffers)
+
+    def legacy_pipeline(frame):
+        position = legacy_process_frame(frame, settings)
+        legacy_display(frame, tracker, position)
+
+    results = {
+        'resolution': [width, height],
+        'frame_bytes': frames[0].nbytes,
+        'tracker': {
+            'pooled': measure(tracker.process_frame, frames, warmup),
+            'legacy': measure(lambda frame: legacy_process_frame(frame, settings), frames, warmup)
+        },
+        'pipeline': {
+            'pooled': measure(pooled_pipeline, frames, warmup),
+            'legacy': measure(legacy_pipeline, frames, warmup)
+        },
+        'tracker_buffer_bytes': tracker.buffers.nbytes(),
+        'display_buffer_bytes': buffers.nbytes()
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Выделение памяти на кадр в конвейере трекинга")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=200, help="Кадров в замере")
+    parser.add_argument('--warmup', type=int, default=10, help="Кадров на прогрев буферов")
+    parser.add_argument('--output', help="Файл JSON для результатов")
+    args = parser.parse_args()
+
+    results = run(args.width, args.height, args.frames, args.warmup)
+    write_results('allocations', results, args.output)
+
+    pooled = results['tracker']['pooled']['alloc_peak_mean_bytes']
+    legacy = results['tracker']['legacy']['alloc_peak_mean_bytes']
+    print(f"Трекер: {pooled / 1024:.1f} КБ/кадр против {legacy / 1024:.1f} КБ/кадр прежде",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
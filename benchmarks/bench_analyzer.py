@@ -0,0 +1,136 @@
+"""
+Бенчмарк пропускной способности DataAnalyzer
+
+Траектории генерируются по тем же формулам, что и синтетические клипы,
+с шумом измерения; размер задаётся числом точек.
+
+Пример:
+    python benchmarks/bench_analyzer.py --points 10000 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results
+
+add_src_to_path()
+
+from core.data_analyzer import DataAnalyzer
+from core.chunked_analyzer import ChunkedAnalyzer
+from core.spatial_analysis import Zone
+from core.trajectory_query import TrajectoryQuery
+from core.trajectory_io import records_to_columns, save_npz, load_npz
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+FPS = 30.0
+# Зоны для замера пространственного анализа: два прямоугольника и треугольник
+ZONES = [
+    Zone('left', [(0, 0), (640, 0), (640, 1080), (0, 1080)]),
+    Zone('right', [(1280, 0), (1920, 0), (1920, 1080), (1280, 1080)]),
+    Zone('center', [(960, 200), (1300, 880), (620, 880)])
+]
+
+
+def make_columns(points: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Колонки траектории: фигура Лиссажу 1920x1080 с шумом около пикселя"""
+    rng = np.random.default_rng(seed)
+    frames = np.arange(points, dtype=np.int64)
+    t = frames / max(points, 1)
+    return {
+        'timestamp': frames / FPS,
+        'x': 960 + 670 * np.sin(2 * np.pi * 3 * t) + rng.normal(0, 0.8, points),
+        'y': 540 + 380 * np.sin(2 * np.pi * 2 * t) + rng.normal(0, 0.8, points),
+        'area': np.full(points, 900.0),
+        'frame': frames,
+        'flags': np.zeros(points, dtype=np.uint32)
+    }
+
+
+def timed(function, repeat: int) -> float:
+    """Медианное время вызова, с"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def check_roundtrip(expected: Dict[str, np.ndarray], loaded: Dict[str, np.ndarray]):
+    """Траектория после save_npz/load_npz должна совпасть с исходной"""
+    for name, values in expected.items():
+        if name not in loaded or not np.array_equal(np.asarray(values), loaded[name]):
+            raise RuntimeError(f"NPZ: колонка {name} не совпадает после сохранения и загрузки")
+
+
+def run_size(points: int, repeat: int) -> Dict:
+    """Замеры для одного размера траектории"""
+    columns = make_columns(points)
+    analyzer = DataAnalyzer()
+    analyzer.load_columns(columns)
+
+    results = {
+        'points': points,
+        'analyze_movement_ms': timed(analyzer.analyze_movement, repeat) * 1000,
+        'total_distance_ms': timed(analyzer.calculate_total_distance, repeat) * 1000,
+    }
+    results['analyze_points_per_sec'] = points / (results['analyze_movement_ms'] / 1000)
+    chunked = ChunkedAnalyzer.from_columns(columns)
+    results['chunked_analyze_ms'] = timed(chunked.analyze_movement, repeat) * 1000
+
+    # Индекс строится один раз, запрос окна не зависит от числа точек в нём
+    results['query_build_ms'] = timed(lambda: TrajectoryQuery(columns), repeat) * 1000
+    query = analyzer.query()
+    middle = float(columns['timestamp'][points // 2])
+    results['window_stats_us'] = timed(lambda: query.window_stats(middle - 60, middle + 60), 100) * 1e6
+
+    results['spectrum_ms'] = timed(analyzer.analyze_spectrum, repeat) * 1000
+
+    analyzer.set_zones(ZONES)
+    results['spatial_ms'] = timed(analyzer.analyze_spatial, repeat) * 1000
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'analysis.csv')
+        results['export_csv_ms'] = timed(lambda: analyzer.export_analysis_csv(filename), 1) * 1000
+        npz_name = os.path.join(directory, 'trajectory.npz')
+        results['save_npz_ms'] = timed(lambda: save_npz(npz_name, columns), 1) * 1000
+        results['load_npz_ms'] = timed(lambda: load_npz(npz_name), 1) * 1000
+        check_roundtrip(columns, load_npz(npz_name)[0])
+
+    # Путь через список словарей (как в старом формате JSON) — только на малых размерах
+    if points <= 100_000:
+        records = [{'timestamp': t, 'x': x, 'y': y, 'area': a} for t, x, y, a in
+                   zip(*(columns[name].tolist() for name in ('timestamp', 'x', 'y', 'area')))]
+        results['records_to_columns_ms'] = timed(lambda: records_to_columns(records), repeat) * 1000
+    return results
+
+
+def run(sizes: List[int] = DEFAULT_SIZES, repeat: int = 3) -> Dict:
+    """Прогнать все размеры"""
+    results = {}
+    for points in sizes:
+        print(f"Анализатор: {points} точек...", file=sys.stderr)
+        results[str(points)] = run_size(points, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность анализа траектории")
+    parser.add_argument('--points', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    write_results('analyzer', run(args.points, args.repeat), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Бенчмарк методов расчёта производных: время на миллион точек и точность
+
+Траектория — та же фигура Лиссажу, что в bench_analyzer.py, с шумом
+измерения, неравномерными метками времени и пропусками; точная скорость
+известна аналитически, поэтому для каждого метода пишется и ошибка.
+
+Пример:
+    python benchmarks/bench_derivatives.py --points 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results
+
+add_src_to_path()
+
+from core.data_analyzer import DataAnalyzer
+from core.derivatives import METHODS
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+FPS = 30.0
+# Доля кадров, на которых объект не найден, и длина пропусков
+GAP_EVERY = 5000
+GAP_LENGTH = 90
+
+
+def make_trajectory(points: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Колонки траектории и точная скорость: джиттер меток времени и пропуски"""
+    rng = np.random.default_rng(seed)
+    frames = np.arange(points + (points // GAP_EVERY) * GAP_LENGTH, dtype=np.int64)
+    keep = (frames % GAP_EVERY) < GAP_EVERY - GAP_LENGTH
+    frames = frames[keep][:points]
+    t = frames / FPS + rng.normal(0, 0.002, len(frames))
+    t.sort()
+
+    period = max(len(frames) / FPS, 1.0)
+    wx, wy = 2 * np.pi * 3 / period, 2 * np.pi * 2 / period
+    x = 960 + 670 * np.sin(wx * t)
+    y = 540 + 380 * np.sin(wy * t)
+    speed = np.hypot(670 * wx * np.cos(wx * t), 380 * wy * np.cos(wy * t))
+    return {
+        'timestamp': t,
+        'x': x + rng.normal(0, 0.8, len(t)),
+        'y': y + rng.normal(0, 0.8, len(t)),
+        'area': np.full(len(t), 900.0),
+        'frame': frames,
+        'flags': np.zeros(len(t), dtype=np.uint32)
+    }, speed
+
+
+def run_size(points: int, repeat: int) -> Dict:
+    """Замеры всех методов для одного размера"""
+    columns, true_speed = make_trajectory(points)
+    analyzer = DataAnalyzer()
+    analyzer.load_columns(columns)
+
+    results = {'points': len(true_speed)}
+    for method in METHODS:
+        analyzer.set_derivative_method(method)
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            analysis = analyzer.analyze_movement()
+            samples.append(time.perf_counter() - started)
+        elapsed = statistics.median(samples)
+        error = np.abs(analysis['velocities'] - true_speed)
+        results[method] = {
+            'per_million_ms': elapsed * 1000 * 1_000_000 / len(true_speed),
+            'speed_error_mean_px': float(error.mean()),
+            'speed_error_p95_px': float(np.percentile(error, 95))
+        }
+    return results
+
+
+def run(sizes: List[int] = DEFAULT_SIZES, repeat: int = 3) -> Dict:
+    """Прогнать все размеры"""
+    results = {}
+    for points in sizes:
+        print(f"Производные: {points} точек...", file=sys.stderr)
+        results[str(points)] = run_size(points, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время и точность методов производных")
+    parser.add_argument('--points', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    write_results('derivatives', run(args.points, args.repeat), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Бенчмарк конфигурации выполнения: потоки OpenCV и OpenCL по режимам
+
+Для каждого режима (GUI, одно видео без GUI, пакет на пуле процессов)
+трекер гоняется по синтетическим кадрам с числом потоков из
+utils/runtime_config.py и, для сравнения, с настройками OpenCV по умолчанию.
+Пакетный режим запускает по процессу на ядро и меряет суммарную
+пропускную способность — там и видна переподписка ядер. Если в системе
+есть OpenCL, каждый режим дополнительно меряется через UMat.
+
+Пример:
+    python benchmarks/bench_runtime.py --resolution 1080p --frames 20 --passes 5
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results
+from benchmarks.synthetic import OBJECT_PALETTE, RESOLUTIONS, make_scenario, render_frames
+
+add_src_to_path()
+
+import cv2
+
+from core.object_tracker import ObjectTracker
+from utils.runtime_config import (
+    configure_runtime, ensure_applied, get_runtime_config, threads_for_mode,
+    MODE_GUI, MODE_HEADLESS, MODE_BATCH_WORKER
+)
+
+
+def _setup(threads: Optional[int], use_opencl: bool) -> Dict:
+    """Задать потоки (None — по умолчанию OpenCV) и OpenCL в текущем процессе"""
+    if threads is None:
+        cv2.setNumThreads(-1)
+        cv2.ocl.setUseOpenCL(False)
+        return {'threads': cv2.getNumThreads(), 'opencl': False}
+    configure_runtime(MODE_HEADLESS, use_opencl=use_opencl)
+    ensure_applied()
+    cv2.setNumThreads(threads)
+    config = get_runtime_config()
+    return {'threads': cv2.getNumThreads(), 'opencl': config['opencl'],
+            'opencl_device': config['opencl_device']}
+
+
+def _track_frames(scenario: Dict, passes: int) -> Dict:
+    """Прогнать трекер по кадрам сценария passes раз, вернуть кадры и время"""
+    frames = [frame.copy() for frame in render_frames(scenario)]
+    tracker = ObjectTracker()
+    tracker.update_settings(OBJECT_PALETTE[0]['hsv'])
+    tracker.update_settings({'skip_stationary': False})
+    tracker.tracking_enabled = True
+
+    tracker.process_frame(frames[0])   # прогрев буферов и ядер OpenCL
+    started = time.perf_counter()
+    for _ in range(passes):
+        for frame in frames:
+            tracker.process_frame(frame)
+    return {'frames': len(frames) * passes, 'elapsed': time.perf_counter() - started}
+
+
+def _worker_job(args) -> Dict:
+    """Задача процесса пула: настроить процесс и отработать свою порцию кадров"""
+    scenario, passes, threads, use_opencl = args
+    _setup(threads, use_opencl)
+    return _track_frames(scenario, passes)
+
+
+def measure_single(scenario: Dict, passes: int, threads: Optional[int], use_opencl: bool) -> Dict:
+    """Один поток обработки в текущем процессе"""
+    config = _setup(threads, use_opencl)
+    run = _track_frames(scenario, passes)
+    return dict(config, tracker_fps=run['frames'] / run['elapsed'])
+
+
+def measure_parallel(scenario: Dict, passes: int, workers: int, threads: Optional[int],
+                     use_opencl: bool) -> Dict:
+    """workers процессов одновременно; суммарные кадры в секунду по стене"""
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        runs = list(pool.map(_worker_job, [(scenario, passes, threads, use_opencl)] * workers))
+    elapsed = time.perf_counter() - started
+    total_frames = sum(run['frames'] for run in runs)
+    return {
+        'workers': workers,
+        'threads_per_worker': threads,
+        'opencl': use_opencl,
+        'aggregate_fps': total_frames / elapsed,
+        'per_worker_fps': [run['frames'] / run['elapsed'] for run in runs]
+    }
+
+
+def opencl_available() -> bool:
+    """Есть ли в системе среда OpenCL"""
+    try:
+        return cv2.ocl.haveOpenCL()
+    except Exception:
+        return False
+
+
+def run(resolution: str = '1080p', frames: int = 20, passes: int = 5,
+        workers: Optional[int] = None) -> Dict:
+    """Замеры для всех режимов"""
+    scenario = make_scenario(resolution, frames=frames)
+    workers = workers or os.cpu_count() or 1
+    opencl_modes = [False, True] if opencl_available() else [False]
+
+    results = {'cpu_count': os.cpu_count(), 'opencl_available': opencl_available(),
+               'single': {}, 'batch': {}}
+    # Исходное поведение приложения: потоки OpenCV по умолчанию, без OpenCL
+    results['single']['opencv_default'] = measure_single(scenario, passes, None, False)
+    results['batch']['opencv_default'] = measure_parallel(scenario, passes, workers, None, False)
+
+    for use_opencl in opencl_modes:
+        suffix = '_opencl' if use_opencl else ''
+        for mode in (MODE_GUI, MODE_HEADLESS):
+            results['single'][mode + suffix] = measure_single(
+                scenario, passes, threads_for_mode(mode), use_opencl)
+        results['batch'][MODE_BATCH_WORKER + suffix] = measure_parallel(
+            scenario, passes, workers, threads_for_mode(MODE_BATCH_WORKER, workers), use_opencl)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Потоки OpenCV и OpenCL по режимам выполнения")
+    parser.add_argument('--resolution', choices=sorted(RESOLUTIONS), default='1080p')
+    parser.add_argument('--frames', type=int, default=20, help="разных кадров в наборе")
+    parser.add_argument('--passes', type=int, default=5, help="проходов по набору")
+    parser.add_argument('-j', '--workers', type=int, help="процессов в пакетном режиме")
+    parser.add_argument('--output', help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    write_results('runtime', run(args.resolution, args.frames, args.passes, args.workers),
+                  args.output)
+
+
+if __name__ == '__main__':
+    main()
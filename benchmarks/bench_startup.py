@@ -0,0 +1,170 @@
+"""
+Бенчмарк времени запуска: холодная стоимость импорта каждого модуля
+
+Каждый модуль импортируется в отдельном свежем процессе с ``-X importtime``,
+поэтому кэш модулей интерпретатора не влияет на результат.
+
+Пример:
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import SRC_DIR, write_results
+
+# Сторонние модули, стоимость которых отслеживаем
+THIRD_PARTY_MODULES = [
+    'numpy',
+    'customtkinter',
+    'cv2',
+    'PIL.Image',
+    'PIL.ImageTk',
+    'matplotlib.pyplot',
+    'matplotlib.backends.backend_tkagg',
+    'scipy.signal',
+]
+
+# Модули приложения в порядке импорта при запуске
+APP_MODULES = [
+    'utils.constants',
+    'core.video_processor',
+    'core.object_tracker',
+    'core.data_analyzer',
+    'gui.results_panel',
+    'gui.main_window',
+    'main',
+]
+
+# Модули, которые не должны загружаться до открытия видео / анализа
+DEFERRED_MODULES = ['cv2', 'PIL.Image', 'matplotlib.pyplot', 'scipy']
+
+
+def measure_import(module: str) -> Dict:
+    """Импортировать модуль в новом процессе и разобрать вывод -X importtime"""
+    code = f"import {module}"
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=env, cwd=SRC_DIR
+    )
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ''
+        return {'error': last_line}
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or parts[2].strip() != module:
+            continue
+        try:
+            cumulative_us = int(parts[1])
+        except ValueError:
+            continue
+    return {'cumulative_ms': cumulative_us / 1000.0 if cumulative_us is not None else 0.0}
+
+
+def check_deferred_modules() -> Dict:
+    """Проверить, какие тяжёлые модули загружаются вместе с главным окном"""
+    code = (
+        "import sys, json\n"
+        "import gui.main_window\n"
+        f"print(json.dumps({{m: m in sys.modules for m in {DEFERRED_MODULES!r}}}))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                            text=True, env=env, cwd=SRC_DIR)
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ''
+        return {'error': last_line}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(modules: List[str], repeat: int) -> Dict:
+    """Измерить холодный импорт каждого модуля repeat раз"""
+    results = {}
+    for module in modules:
+        samples = []
+        error = None
+        for _ in range(repeat):
+            measurement = measure_import(module)
+            if 'error' in measurement:
+                error = measurement['error']
+                break
+            samples.append(measurement['cumulative_ms'])
+
+        if error:
+            results[module] = {'error': error}
+            print(f"{module:40s} ошибка: {error}", file=sys.stderr)
+            continue
+
+        results[module] = {
+            'median_ms': statistics.median(samples),
+            'min_ms': min(samples),
+            'max_ms': max(samples),
+            'samples': samples
+        }
+        print(f"{module:40s} {results[module]['median_ms']:9.1f} мс", file=sys.stderr)
+    return results
+
+
+def compare_with_baseline(results: Dict, baseline_path: str, tolerance: float) -> List[str]:
+    """Найти модули, импорт которых стал заметно медленнее базового"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']['imports']
+
+    regressions = []
+    for module, current in results.items():
+        previous = baseline.get(module)
+        if not previous or 'median_ms' not in previous or 'median_ms' not in current:
+            continue
+        limit = previous['median_ms'] * (1.0 + tolerance)
+        if current['median_ms'] > limit:
+            regressions.append(
+                f"{module}: {current['median_ms']:.1f} мс > {limit:.1f} мс "
+                f"(база {previous['median_ms']:.1f} мс)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3, help="число запусков на модуль")
+    parser.add_argument('--output', help="файл для сохранения результатов (JSON)")
+    parser.add_argument('--baseline', help="JSON с предыдущими результатами для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="допустимое относительное замедление (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    imports = run_benchmark(THIRD_PARTY_MODULES + APP_MODULES, args.repeat)
+    deferred = check_deferred_modules()
+    results = {'imports': imports, 'loaded_with_main_window': deferred}
+    write_results('startup', results, args.output)
+
+    status = 0
+    eager = [m for m, loaded in deferred.items() if loaded is True]
+    if eager:
+        print(f"Загружаются при старте, хотя должны быть отложены: {', '.join(eager)}",
+              file=sys.stderr)
+        status = 1
+
+    if args.baseline:
+        regressions = compare_with_baseline(imports, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"Регрессия: {line}", file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Бенчмарк трекера на синтетических клипах
+
+Для каждого сценария из benchmarks/synthetic.py клип декодируется через
+VideoProcessor, и на каждом кадре работает по одному ObjectTracker на объект.
+Меряются кадры в секунду, задержка по этапам (p50/p95/p99 из StageProfiler),
+память и точность позиций относительно эталона.
+
+Пример:
+    python benchmarks/bench_tracker.py --quick
+    python benchmarks/bench_tracker.py --resolution 1080p --objects 2 --occlusion
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results, peak_rss_mb
+from benchmarks.synthetic import (
+    OBJECT_PALETTE, RESOLUTIONS, DATA_DIR, generate_clip, make_scenario, scenario_name,
+    standard_scenarios
+)
+
+add_src_to_path()
+
+from core.video_processor import VideoProcessor
+from core.object_tracker import ObjectTracker
+from utils.profiler import get_profiler
+
+
+def accuracy(detections: np.ndarray, truth: Dict) -> List[Dict]:
+    """Ошибка позиции и доля найденных объектов по каждому объекту"""
+    reports = []
+    for i in range(detections.shape[0]):
+        detected = ~np.isnan(detections[i, :, 0])
+        visible = truth['visible'][i]
+        hits = detected & visible
+        errors = np.hypot(*(detections[i, hits] - truth['positions'][i, hits]).T)
+        hidden = ~visible
+        reports.append({
+            'object': OBJECT_PALETTE[i]['name'],
+            'visible_frames': int(visible.sum()),
+            'detection_rate': float(hits.sum() / visible.sum()) if visible.any() else 0.0,
+            # Частично перекрытый объект может находиться — это не ложное срабатывание,
+            # но центр при этом смещён, поэтому такие кадры в ошибку не входят
+            'detected_while_occluded': float((detected & hidden).sum() / hidden.sum())
+                                        if hidden.any() else 0.0,
+            'error_mean_px': float(errors.mean()) if len(errors) else None,
+            'error_p95_px': float(np.percentile(errors, 95)) if len(errors) else None,
+            'error_max_px': float(errors.max()) if len(errors) else None
+        })
+    return reports
+
+
+def run_scenario(scenario: Dict, directory: str = DATA_DIR,
+                 tracker_settings: Optional[Dict] = None) -> Dict:
+    """Прогнать трекеры по клипу сценария и собрать метрики"""
+    video_path, truth = generate_clip(scenario, directory)
+
+    trackers = []
+    for i in range(scenario['objects']):
+        tracker = ObjectTracker()
+        tracker.update_settings(OBJECT_PALETTE[i]['hsv'])
+        # Замеряем и перенос позиции на неподвижной сцене (по умолчанию выключен)
+        tracker.update_settings({'skip_stationary': True})
+        tracker.update_settings(tracker_settings or {})
+        tracker.tracking_enabled = True
+        trackers.append(tracker)
+
+    processor = VideoProcessor()
+    if not processor.open_video(video_path):
+        raise RuntimeError(f"Не удалось открыть клип: {video_path}")
+
+    profiler = get_profiler()
+    profiler.reset()
+    profiler.set_enabled(True)
+
+    frame_count = scenario['frames']
+    detections = np.full((len(trackers), frame_count, 2), np.nan)
+    carried = 0
+    tracking_time = 0.0
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        for index in range(frame_count):
+            with profiler.stage('decode'):
+                frame = processor.read_sampled_frame()
+            if frame is None:
+                break
+            for i, tracker in enumerate(trackers):
+                tracker_started = time.perf_counter()
+                position = tracker.process_frame(frame)
+                tracking_time += time.perf_counter() - tracker_started
+                if position:
+                    detections[i, index] = position[:2]
+                    carried += tracker.last_detection_carried
+        elapsed = time.perf_counter() - started
+        _, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        profiler.set_enabled(False)
+        processor.close_video()
+
+    processed = processor.frame_index
+    tracker_frames = processed * len(trackers)
+    return {
+        'scenario': scenario,
+        'frames': processed,
+        'pipeline_fps': processed / elapsed if elapsed > 0 else 0.0,
+        'tracker_fps': tracker_frames / tracking_time if tracking_time > 0 else 0.0,
+        'carried_frames': int(carried),
+        'stages': profiler.summary(),
+        'memory': {
+            'traced_peak_mb': traced_peak / 2 ** 20,
+            'tracker_buffers_mb': sum(t.buffers.nbytes() for t in trackers) / 2 ** 20,
+            'peak_rss_mb': peak_rss_mb()
+        },
+        'accuracy': accuracy(detections, truth)
+    }
+
+
+def run(scenarios: List[Dict], directory: str = DATA_DIR) -> Dict:
+    """Прогнать набор сценариев"""
+    results = {}
+    for scenario in scenarios:
+        name = scenario_name(scenario)
+        print(f"Трекер: {name}...", file=sys.stderr)
+        results[name] = run_scenario(scenario, directory)
+        print(f"  {results[name]['pipeline_fps']:.1f} кадр/с", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость и точность трекера на синтетике")
+    parser.add_argument('--quick', action='store_true', help="короткий набор (480p)")
+    parser.add_argument('--resolution', choices=sorted(RESOLUTIONS),
+                        help="один сценарий вместо стандартного набора")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--objects', type=int, default=1)
+    parser.add_argument('--noise', type=float, default=0.0)
+    parser.add_argument('--occlusion', action='store_true')
+    parser.add_argument('--directory', default=DATA_DIR, help="каталог для клипов")
+    parser.add_argument('--output', help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    if args.resolution:
+        scenarios = [make_scenario(args.resolution, args.frames, objects=args.objects,
+                                   noise=args.noise, occlusion=args.occlusion)]
+    else:
+        scenarios = standard_scenarios(args.quick)
+    write_results('tracker', run(scenarios, args.directory), args.output)
+
+
+if __name__ == '__main__':
+    main()
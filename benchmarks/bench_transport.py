@@ -0,0 +1,164 @@
+"""
+Бенчмарк передачи кадров процессам: очередь с pickle против общей памяти
+
+Сначала меряется только транспорт — кадры отправляются процессам, которые
+возвращают крошечный результат, — затем полный трекинг синтетического
+клипа через ParallelTracker с разным числом процессов в сравнении с
+однопроцессным HeadlessProcessor.
+
+Пример:
+    python benchmarks/bench_transport.py --resolution 1080p --frames 300
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import add_src_to_path, write_results
+from benchmarks.synthetic import OBJECT_PALETTE, RESOLUTIONS, generate_clip, make_scenario
+
+add_src_to_path()
+
+from core.frame_transport import SharedFrameRing, ParallelTracker
+from core.headless_processor import HeadlessProcessor
+from utils.constants import TRANSPORT_SETTINGS
+
+
+def _pickle_worker(frames_in, results):
+    """Получает кадры целиком через очередь (сериализация pickle)"""
+    while True:
+        frame = frames_in.get()
+        if frame is None:
+            break
+        results.put(int(frame[0, 0, 0]))
+
+
+def _ring_worker(ring_spec, slots_in, free_slots, results):
+    """Получает номера ячеек и читает кадр из общей памяти"""
+    ring = SharedFrameRing.attach(ring_spec)
+    try:
+        while True:
+            slot = slots_in.get()
+            if slot is None:
+                break
+            value = int(ring.slot(slot)[0, 0, 0])
+            free_slots.put(slot)
+            results.put(value)
+    finally:
+        ring.close()
+
+
+def measure_pickle(frame: np.ndarray, count: int, workers: int) -> float:
+    """Кадров в секунду через multiprocessing.Queue с копией кадра"""
+    context = multiprocessing.get_context(TRANSPORT_SETTINGS["start_method"])
+    frames_in, results = context.Queue(maxsize=workers * 3), context.Queue()
+    processes = [context.Process(target=_pickle_worker, args=(frames_in, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    started = time.perf_counter()
+    for _ in range(count):
+        frames_in.put(frame)
+    for _ in range(count):
+        results.get()
+    elapsed = time.perf_counter() - started
+    for _ in processes:
+        frames_in.put(None)
+    for process in processes:
+        process.join()
+    return count / elapsed
+
+
+def measure_ring(frame: np.ndarray, count: int, workers: int) -> float:
+    """Кадров в секунду через кольцо в общей памяти (копия кадра в ячейку — как при декодировании)"""
+    context = multiprocessing.get_context(TRANSPORT_SETTINGS["start_method"])
+    slots = workers * TRANSPORT_SETTINGS["slots_per_worker"]
+    with SharedFrameRing(slots, frame.shape) as ring:
+        slots_in, free_slots, results = context.Queue(), context.Queue(), context.Queue()
+        for slot in range(slots):
+            free_slots.put(slot)
+        processes = [context.Process(target=_ring_worker,
+                                     args=(ring.spec(), slots_in, free_slots, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        started = time.perf_counter()
+        for _ in range(count):
+            slot = free_slots.get()
+            np.copyto(ring.slot(slot), frame)
+            slots_in.put(slot)
+        for _ in range(count):
+            results.get()
+        elapsed = time.perf_counter() - started
+        for _ in processes:
+            slots_in.put(None)
+        for process in processes:
+            process.join()
+    return count / elapsed
+
+
+def measure_tracking(video_path: str, workers_list: List[int]) -> Dict:
+    """Полный трекинг клипа: один процесс и ParallelTracker с разным числом процессов"""
+    settings = dict(OBJECT_PALETTE[0]['hsv'], skip_stationary=False)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = os.path.join(directory, 'bench.traj')
+        summary = HeadlessProcessor(settings, checkpoint_interval=0).run(
+            video_path, log_path, resume=False)
+        results['single_process'] = {
+            'tracker_fps': summary['processed_frames'] / summary['elapsed'],
+            'points': summary['points']
+        }
+        for workers in workers_list:
+            summary = ParallelTracker(settings, workers=workers).run(video_path, log_path)
+            results[f'workers_{workers}'] = {
+                'tracker_fps': summary['sampled_frames'] / summary['elapsed'],
+                'points': summary['points']
+            }
+    return results
+
+
+def run(resolution: str = '1080p', frames: int = 300, transport_frames: int = 500,
+        workers_list: Optional[List[int]] = None) -> Dict:
+    """Замеры транспорта и полного трекинга"""
+    cpu_count = os.cpu_count() or 1
+    workers_list = workers_list or sorted({1, 2, max(1, cpu_count // 2), cpu_count})
+    width, height = RESOLUTIONS[resolution]
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    results = {'cpu_count': cpu_count, 'resolution': resolution,
+               'frame_mb': frame.nbytes / 1e6, 'transport': {}}
+    for workers in workers_list:
+        results['transport'][f'workers_{workers}'] = {
+            'pickle_queue_fps': measure_pickle(frame, transport_frames, workers),
+            'shared_ring_fps': measure_ring(frame, transport_frames, workers)
+        }
+
+    video_path, _ = generate_clip(make_scenario(resolution, frames=frames))
+    results['tracking'] = measure_tracking(video_path, workers_list)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Передача кадров процессам трекинга")
+    parser.add_argument('--resolution', choices=sorted(RESOLUTIONS), default='1080p')
+    parser.add_argument('--frames', type=int, default=300, help="кадров в клипе для трекинга")
+    parser.add_argument('--transport-frames', type=int, default=500,
+                        help="кадров в замере одного транспорта")
+    parser.add_argument('-j', '--workers', type=int, nargs='+', help="числа процессов для замера")
+    parser.add_argument('--output', help="файл JSON для результатов")
+    args = parser.parse_args()
+
+    write_results('transport', run(args.resolution, args.frames, args.transport_frames, args.workers),
+                  args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Общие утилиты для бенчмарков
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+
+def add_src_to_path():
+    """Добавить src в путь для импортов (как это делает run.py)"""
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+
+
+def get_git_revision() -> Optional[str]:
+    """Получить текущую ревизию git, если она доступна"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT_DIR, capture_output=True, text=True, timeout=5
+        )
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def get_environment() -> Dict:
+    """Описание окружения, в котором запускался бенчмарк"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'git_revision': get_git_revision(),
+        'timestamp': time.time()
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Пиковый объём резидентной памяти процесса, МБ (None, если недоступно)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def flatten_metrics(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """Плоский словарь числовых метрик: {'tracker.480p_1obj.pipeline_fps': ...}"""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = float(value)
+    return metrics
+
+
+def find_regressions(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Сравнить метрики с базовым прогоном
+
+    Метрики *_fps и *_per_sec должны не падать, *_ms, *_us и *_px (время и ошибка
+    позиции) — не расти больше чем на tolerance (доля). Остальные метрики
+    не сравниваются.
+    """
+    current = flatten_metrics(results)
+    previous = flatten_metrics(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        old = previous.get(name)
+        if not old:
+            continue
+        if name.endswith(('_fps', '_per_sec')) and value < old * (1.0 - tolerance):
+            regressions.append(f"{name}: {value:.2f} < {old:.2f}")
+        elif name.endswith(('_ms', '_us', '_px')) and value > old * (1.0 + tolerance):
+            regressions.append(f"{name}: {value:.2f} > {old:.2f}")
+    return regressions
+
+
+def write_results(name: str, results: Dict, output: Optional[str] = None) -> Dict:
+    """Сохранить результаты бенчмарка в JSON (или вывести в stdout)"""
+    report = {
+        'benchmark': name,
+        'environment': get_environment(),
+        'results': results
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
@@ -0,0 +1,81 @@
+"""
+Запуск всего набора бенчмарков с записью в один JSON
+
+Пример:
+    python benchmarks/run_all.py --quick --output results.json
+    python benchmarks/run_all.py --output new.json --baseline results.json
+"""
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import write_results, find_regressions
+
+SUITES = ('startup', 'allocations', 'tracker', 'analyzer', 'derivatives', 'runtime', 'transport')
+
+
+def run_suite(name: str, quick: bool):
+    """Запустить один бенчмарк (модули импортируются по требованию)"""
+    if name == 'startup':
+        from benchmarks import bench_startup
+        return {'imports': bench_startup.run_benchmark(
+            bench_startup.THIRD_PARTY_MODULES + bench_startup.APP_MODULES, 1 if quick else 3)}
+    if name == 'allocations':
+        from benchmarks import bench_allocations
+        return bench_allocations.run(854, 480, 50, 5) if quick else \
+            bench_allocations.run(1920, 1080, 200, 10)
+    if name == 'tracker':
+        from benchmarks import bench_tracker
+        from benchmarks.synthetic import standard_scenarios
+        return bench_tracker.run(standard_scenarios(quick))
+    if name == 'analyzer':
+        from benchmarks import bench_analyzer
+        sizes = [10_000, 100_000] if quick else bench_analyzer.DEFAULT_SIZES
+        return bench_analyzer.run(sizes)
+    if name == 'derivatives':
+        from benchmarks import bench_derivatives
+        return bench_derivatives.run([100_000] if quick else bench_derivatives.DEFAULT_SIZES)
+    if name == 'runtime':
+        from benchmarks import bench_runtime
+        return bench_runtime.run('480p', 10, 3) if quick else bench_runtime.run()
+    if name == 'transport':
+        from benchmarks import bench_transport
+        return bench_transport.run('480p', 100, 200) if quick else bench_transport.run()
+    raise ValueError(f"Неизвестный бенчмарк: {name}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', choices=SUITES, help="запустить только эти бенчмарки")
+    parser.add_argument('--quick', action='store_true', help="сокращённые сценарии")
+    parser.add_argument('--output', help="файл для сохранения результатов (JSON)")
+    parser.add_argument('--baseline', help="JSON предыдущего прогона для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="допустимое относительное ухудшение (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or SUITES:
+        try:
+            results[name] = run_suite(name, args.quick)
+        except Exception as e:
+            print(f"Бенчмарк {name} не выполнен: {e}", file=sys.stderr)
+            results[name] = {'error': str(e)}
+    write_results('suite', results, args.output)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"Регрессия: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
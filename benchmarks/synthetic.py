@@ -0,0 +1,240 @@
+"""
+Синтетические видео с цветными объектами на известных траекториях
+
+Клип полностью определяется параметрами сценария и seed, поэтому результаты
+бенчмарков воспроизводимы на любой машине. Вместе с видео сохраняется
+эталон: точные центры объектов и признак их видимости на каждом кадре.
+
+Пример:
+    python benchmarks/synthetic.py --resolution 1080p --frames 300 --objects 2 --occlusion
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import ROOT_DIR
+
+import cv2
+
+DATA_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'data')
+
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+# Объекты: цвет BGR и диапазон HSV, по которому трекер находит именно его
+OBJECT_PALETTE = [
+    {'name': 'green', 'color': (40, 220, 40),
+     'hsv': {'hue_low': 50, 'hue_high': 70, 'saturation_low': 100, 'saturation_high': 255,
+             'value_low': 100, 'value_high': 255}},
+    {'name': 'blue', 'color': (230, 80, 30),
+     'hsv': {'hue_low': 100, 'hue_high': 125, 'saturation_low': 100, 'saturation_high': 255,
+             'value_low': 100, 'value_high': 255}},
+    {'name': 'yellow', 'color': (30, 220, 230),
+     'hsv': {'hue_low': 22, 'hue_high': 38, 'saturation_low': 100, 'saturation_high': 255,
+             'value_low': 100, 'value_high': 255}},
+]
+TRAJECTORY_KINDS = ('lissajous', 'circle', 'bounce')
+
+BACKGROUND_LEVEL = 40
+OCCLUDER_COLOR = (90, 90, 90)
+NOISE_FIELDS = 8        # заранее посчитанных полей шума (циклически по кадрам)
+
+
+def scenario_name(scenario: Dict) -> str:
+    """Короткое имя сценария для отчётов"""
+    name = f"{scenario['resolution']}_{scenario['objects']}obj"
+    if scenario.get('noise'):
+        name += f"_noise{scenario['noise']:g}"
+    if scenario.get('occlusion'):
+        name += "_occl"
+    return name
+
+
+def make_scenario(resolution: str = '480p', frames: int = 300, fps: float = 30.0,
+                  objects: int = 1, noise: float = 0.0, occlusion: bool = False,
+                  seed: int = 0) -> Dict:
+    """Параметры клипа (по ним же строится имя файла в кэше)"""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Неизвестное разрешение: {resolution}")
+    if not 1 <= objects <= len(OBJECT_PALETTE):
+        raise ValueError(f"Число объектов должно быть от 1 до {len(OBJECT_PALETTE)}")
+    return {'resolution': resolution, 'frames': frames, 'fps': fps, 'objects': objects,
+            'noise': noise, 'occlusion': occlusion, 'seed': seed}
+
+
+def object_trajectory(kind: str, frame_count: int, width: int, height: int,
+                      phase: float) -> np.ndarray:
+    """Точные центры объекта для всех кадров, массив (frame_count, 2)"""
+    t = np.arange(frame_count, dtype=np.float64) / max(frame_count, 1)
+    cx, cy = width / 2, height / 2
+    ax, ay = width * 0.35, height * 0.35
+
+    if kind == 'lissajous':
+        x = cx + ax * np.sin(2 * np.pi * (3 * t + phase))
+        y = cy + ay * np.sin(2 * np.pi * (2 * t + phase))
+    elif kind == 'circle':
+        x = cx + ax * np.cos(2 * np.pi * (t + phase))
+        y = cy + ay * np.sin(2 * np.pi * (t + phase))
+    elif kind == 'bounce':
+        # Треугольная волна по обеим осям — резкие развороты у краёв
+        x = cx + ax * (2 * np.abs(2 * ((1.7 * t + phase) % 1) - 1) - 1)
+        y = cy + ay * (2 * np.abs(2 * ((2.3 * t + phase) % 1) - 1) - 1)
+    else:
+        raise ValueError(f"Неизвестная траектория: {kind}")
+    return np.column_stack([x, y])
+
+
+def occluder_rect(width: int, height: int) -> Tuple[int, int, int, int]:
+    """Вертикальная полоса-помеха в правой трети кадра (x0, y0, x1, y1)"""
+    x0 = int(width * 0.62)
+    return x0, 0, x0 + max(8, width // 16), height
+
+
+def ground_truth(scenario: Dict) -> Dict[str, np.ndarray]:
+    """
+    Эталон сценария
+
+    Returns:
+        positions (objects, frames, 2), visible (objects, frames) и radius (objects,)
+    """
+    width, height = RESOLUTIONS[scenario['resolution']]
+    count = scenario['objects']
+    frames = scenario['frames']
+    base_radius = max(6, min(width, height) // 36)
+
+    positions = np.empty((count, frames, 2))
+    radius = np.empty(count)
+    for i in range(count):
+        positions[i] = object_trajectory(TRAJECTORY_KINDS[i % len(TRAJECTORY_KINDS)],
+                                         frames, width, height, phase=i / count)
+        radius[i] = base_radius * (1.0 - 0.15 * i)
+
+    visible = np.ones((count, frames), dtype=bool)
+    if scenario.get('occlusion'):
+        x0, _, x1, _ = occluder_rect(width, height)
+        # Объект считается видимым, только если полоса его совсем не задевает
+        left = positions[:, :, 0] - radius[:, None]
+        right = positions[:, :, 0] + radius[:, None]
+        visible = (right < x0) | (left > x1)
+    return {'positions': positions, 'visible': visible, 'radius': radius}
+
+
+def render_frames(scenario: Dict, truth: Optional[Dict] = None):
+    """Генератор кадров сценария (BGR, uint8; буфер кадра переиспользуется)"""
+    truth = truth or ground_truth(scenario)
+    width, height = RESOLUTIONS[scenario['resolution']]
+    rng = np.random.default_rng(scenario['seed'])
+
+    noise_fields = []
+    if scenario.get('noise'):
+        for _ in range(NOISE_FIELDS):
+            field = rng.normal(0.0, scenario['noise'], (height, width, 3))
+            noise_fields.append(field.astype(np.int16))
+
+    background = np.full((height, width, 3), BACKGROUND_LEVEL, dtype=np.uint8)
+    frame = np.empty_like(background)
+    noisy = np.empty((height, width, 3), dtype=np.int16)
+    occluder = occluder_rect(width, height) if scenario.get('occlusion') else None
+
+    for index in range(scenario['frames']):
+        np.copyto(frame, background)
+        for i in range(scenario['objects']):
+            x, y = truth['positions'][i, index]
+            # Сдвиг на 4 бита — центр с субпиксельной точностью
+            center = (int(round(x * 16)), int(round(y * 16)))
+            cv2.circle(frame, center, int(round(truth['radius'][i] * 16)),
+                       OBJECT_PALETTE[i]['color'], -1, lineType=cv2.LINE_AA, shift=4)
+        if occluder:
+            cv2.rectangle(frame, occluder[:2], occluder[2:], OCCLUDER_COLOR, -1)
+        if noise_fields:
+            np.add(frame, noise_fields[index % len(noise_fields)], out=noisy, dtype=np.int16)
+            np.clip(noisy, 0, 255, out=noisy)
+            frame[...] = noisy
+        yield frame
+
+
+def _clip_paths(scenario: Dict, directory: str) -> Tuple[str, str]:
+    """Путь к клипу и его эталону в кэше (имя зависит от всех параметров)"""
+    digest = hashlib.sha1(json.dumps(scenario, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+    base = os.path.join(directory, f"{scenario_name(scenario)}_{digest}")
+    return base + '.avi', base + '.truth.npz'
+
+
+def generate_clip(scenario: Dict, directory: str = DATA_DIR, force: bool = False) -> Tuple[str, Dict]:
+    """
+    Записать клип сценария на диск (или взять готовый из кэша)
+
+    Используется MJPG в AVI: кодек есть в любой сборке OpenCV.
+
+    Returns:
+        (путь к видео, эталон)
+    """
+    os.makedirs(directory, exist_ok=True)
+    video_path, truth_path = _clip_paths(scenario, directory)
+    truth = ground_truth(scenario)
+    if not force and os.path.exists(video_path) and os.path.exists(truth_path):
+        return video_path, truth
+
+    width, height = RESOLUTIONS[scenario['resolution']]
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'),
+                             scenario['fps'], (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Не удалось создать видео: {video_path}")
+    try:
+        for frame in render_frames(scenario, truth):
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    np.savez(truth_path, scenario=json.dumps(scenario), **truth)
+    return video_path, truth
+
+
+def standard_scenarios(quick: bool = False) -> List[Dict]:
+    """Набор сценариев бенчмарка: разрешения, шум, перекрытия, несколько объектов"""
+    if quick:
+        return [
+            make_scenario('480p', frames=90),
+            make_scenario('480p', frames=90, objects=2, noise=8.0, occlusion=True),
+        ]
+    return [
+        make_scenario('480p'),
+        make_scenario('480p', noise=12.0),
+        make_scenario('480p', objects=3, occlusion=True),
+        make_scenario('1080p'),
+        make_scenario('1080p', objects=2, noise=8.0, occlusion=True),
+        make_scenario('4k', frames=120),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сгенерировать синтетический клип с эталоном")
+    parser.add_argument('--resolution', choices=sorted(RESOLUTIONS), default='480p')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--objects', type=int, default=1)
+    parser.add_argument('--noise', type=float, default=0.0, help="СКО гауссова шума")
+    parser.add_argument('--occlusion', action='store_true', help="добавить полосу-помеху")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--directory', default=DATA_DIR)
+    parser.add_argument('--force', action='store_true', help="перезаписать клип из кэша")
+    args = parser.parse_args()
+
+    scenario = make_scenario(args.resolution, args.frames, args.fps, args.objects,
+                             args.noise, args.occlusion, args.seed)
+    video_path, _ = generate_clip(scenario, args.directory, args.force)
+    print(video_path)
+
+
+if __name__ == '__main__':
+    main()
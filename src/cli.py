@@ -0,0 +1,356 @@
+"""
+Командная строка: обработка видео без графического интерфейса
+"""
+import argparse
+import json
+import os
+import sys
+
+# Добавляем текущую директорию в путь для импортов
+sys.path.insert(0, os.path.dirname(__file__))
+
+from utils.constants import HEADLESS_SETTINGS, SERVICE_SETTINGS, SAMPLING_SETTINGS
+
+
+def print_progress(current: int, total: int):
+    """Вывести прогресс обработки в stderr"""
+    if total > 0 and (current % 100 == 0 or current == total):
+        print(f"\rКадр {current}/{total} ({current / total:.0%})", end='', file=sys.stderr)
+
+
+def add_sampling_arguments(parser: argparse.ArgumentParser):
+    """Аргументы прореживания кадров"""
+    parser.add_argument('--stride', type=int, default=SAMPLING_SETTINGS["stride"],
+                        help="обрабатывать каждый N-й кадр")
+    parser.add_argument('--rate', type=float, default=SAMPLING_SETTINGS["target_rate"],
+                        help="целевая частота выборки, Гц (вместо --stride)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="уплотнять выборку там, где объект движется быстро")
+
+
+def sampling_from_args(args) -> dict:
+    """Параметры FrameSampler из аргументов командной строки"""
+    return {'stride': args.stride, 'target_rate': args.rate, 'adaptive': args.adaptive}
+
+
+def settings_from_args(args) -> dict:
+    """Настройки трекинга из файла --settings и ключей командной строки"""
+    from core.headless_processor import load_settings_file
+
+    settings = load_settings_file(args.settings) if args.settings else {}
+    if args.skip_stationary:
+        settings['skip_stationary'] = True
+    return settings
+
+
+def command_track(args) -> int:
+    """Трекинг одного видео с контрольными точками"""
+    from core.headless_processor import HeadlessProcessor
+    from core.trajectory_io import load_trajectory, save_npz, save_json
+    from utils.profiler import get_profiler
+    from utils.runtime_config import configure_runtime, get_runtime_config, MODE_HEADLESS
+
+    configure_runtime(MODE_HEADLESS, use_opencl=args.opencl or None)
+    profiler = get_profiler()
+    if args.profile:
+        profiler.set_enabled(True)
+
+    settings = settings_from_args(args)
+    log_path = args.output or os.path.splitext(args.video)[0] + '.traj'
+
+    if args.workers and args.workers > 1:
+        # Несколько процессов-обработчиков: кадры передаются через общую память, без контрольных точек
+        from core.frame_transport import ParallelTracker
+        processor = ParallelTracker(settings, workers=args.workers,
+                                    sampling=sampling_from_args(args),
+                                    progress_callback=print_progress)
+        run = lambda: processor.run(args.video, log_path)
+        interrupted = "\nОбработка прервана"
+    else:
+        processor = HeadlessProcessor(
+            settings,
+            checkpoint_interval=args.checkpoint_interval,
+            keyframe_interval=args.keyframe_interval,
+            progress_callback=print_progress,
+            sampling=sampling_from_args(args)
+        )
+        run = lambda: processor.run(args.video, log_path, args.checkpoint, resume=not args.no_resume)
+        interrupted = "\nОбработка прервана, прогресс сохранён в контрольной точке"
+    try:
+        summary = run()
+    except KeyboardInterrupt:
+        print(interrupted, file=sys.stderr)
+        return 130
+    finally:
+        if args.profile:
+            profiler.dump(args.profile, {'video': os.path.abspath(args.video),
+                                         'settings': processor.settings})
+    print(file=sys.stderr)
+
+    if args.export:
+        columns, _ = load_trajectory(log_path)
+        if args.export.lower().endswith('.npz'):
+            save_npz(args.export, columns, processor.settings)
+        else:
+            save_json(args.export, columns, processor.settings)
+
+    if args.annotate and summary['completed']:
+        columns, _ = load_trajectory(log_path)
+        summary['annotated'] = export_annotated(args.video, args.annotate, columns)
+
+    summary['runtime'] = get_runtime_config()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if summary['completed'] else 1
+
+
+def export_annotated(video: str, output: str, columns: dict, calibration=None) -> dict:
+    """Записать видео с разметкой по траектории"""
+    from core.video_exporter import VideoExporter
+
+    summary = VideoExporter(progress_callback=print_progress).export(video, output, columns, calibration)
+    print(file=sys.stderr)
+    return summary
+
+
+def command_annotate(args) -> int:
+    """Видео с разметкой по готовой траектории"""
+    from core.trajectory_io import load_trajectory
+    from core.calibration import load_profile
+    from utils.runtime_config import configure_runtime, MODE_HEADLESS
+
+    configure_runtime(MODE_HEADLESS)
+    columns, _ = load_trajectory(args.trajectory)
+    calibration = load_profile(args.calibration) if args.calibration else None
+    try:
+        summary = export_annotated(args.video, args.output, columns, calibration)
+    except KeyboardInterrupt:
+        print("\nЭкспорт прерван", file=sys.stderr)
+        return 130
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+def command_batch(args) -> int:
+    """Пакетная обработка каталога или glob-шаблона"""
+    from core.batch_runner import BatchRunner, collect_videos
+
+    videos = collect_videos(args.source, recursive=args.recursive)
+    if not videos:
+        print(f"Видео не найдены: {args.source}", file=sys.stderr)
+        return 1
+
+    def report(entry):
+        print(f"[{entry['status']}] {entry['video']}", file=sys.stderr)
+
+    settings = settings_from_args(args)
+    runner = BatchRunner(args.output, settings, workers=args.workers, force=args.force,
+                         progress_callback=report, sampling=sampling_from_args(args),
+                         use_opencl=args.opencl or None, calibration=args.calibration)
+    manifest = runner.run(videos)
+    print(json.dumps(manifest['counts'], ensure_ascii=False))
+    return 1 if manifest['counts']['failed'] else 0
+
+
+def command_analyze(args) -> int:
+    """Анализ траектории блоками (журнал .traj не загружается в память целиком)"""
+    from core.chunked_analyzer import ChunkedAnalyzer
+    from core.calibration import load_profile
+
+    calibration = load_profile(args.calibration) if args.calibration else None
+    options = {'chunk_size': args.chunk_size} if args.chunk_size else {}
+    analyzer = ChunkedAnalyzer.from_file(args.trajectory, calibration=calibration, **options)
+    summary = analyzer.analyze_movement(args.csv)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+def command_compare(args) -> int:
+    """Несколько наборов настроек трекинга за одно декодирование видео"""
+    from core.headless_processor import load_settings_file
+    from core.tracker_comparison import TrackerFanout, config_names, side_by_side
+    from core.trajectory_io import save_csv
+    from utils.runtime_config import configure_runtime, MODE_HEADLESS
+
+    if len(args.settings) < 2:
+        print("Для сравнения нужно не меньше двух файлов настроек (-s a.json -s b.json)", file=sys.stderr)
+        return 2
+    configure_runtime(MODE_HEADLESS)
+    configs = dict(zip(config_names(args.settings),
+                       (load_settings_file(path) for path in args.settings)))
+    fanout = TrackerFanout(configs, sampling=sampling_from_args(args), progress_callback=print_progress)
+    try:
+        summary = fanout.run(args.video, args.output)
+    except KeyboardInterrupt:
+        print("\nОбработка прервана", file=sys.stderr)
+        return 130
+    print(file=sys.stderr)
+
+    if args.csv:
+        table = side_by_side({name: fanout.columns(name) for name in configs})
+        save_csv(args.csv, list(table), list(table.values()))
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if summary['completed'] else 1
+
+
+def parse_mark(text: str) -> tuple:
+    """Отметка объекта КАДР:X,Y или КАДР:X,Y,W,H → (кадр, рамка)"""
+    from core.hsv_autotune import click_box
+
+    try:
+        frame, coords = text.split(':', 1)
+        values = [int(float(v)) for v in coords.split(',')]
+        if len(values) == 2:
+            return int(frame), click_box(*values)
+        if len(values) == 4:
+            return int(frame), tuple(values)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"ожидается КАДР:X,Y или КАДР:X,Y,W,H, получено {text!r}")
+
+
+def command_autotune(args) -> int:
+    """Подбор порогов HSV по отмеченным на кадрах областям объекта"""
+    from core.hsv_autotune import HsvAutoTuner
+    from core.video_processor import VideoProcessor
+    from utils.runtime_config import configure_runtime, MODE_HEADLESS
+
+    configure_runtime(MODE_HEADLESS)
+    video_processor = VideoProcessor()
+    if not video_processor.open_video(args.video):
+        print(f"Не удалось открыть видео: {args.video}", file=sys.stderr)
+        return 1
+    samples = []
+    try:
+        for frame_num, box in args.mark:
+            frame = video_processor.get_frame(frame_num)
+            if frame is None:
+                print(f"Кадр {frame_num} не прочитан", file=sys.stderr)
+                return 1
+            samples.append((frame.copy(), box))
+    finally:
+        video_processor.close_video()
+
+    result = HsvAutoTuner(workers=args.workers, progress_callback=print_progress).tune(args.video, samples)
+    print(file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'tracking': result['settings']}, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+def command_serve(args) -> int:
+    """Запуск локального сервиса трекинга"""
+    from service.tracking_service import run_service
+
+    run_service(host=args.host, port=args.port, workers=args.workers, output_dir=args.output)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Video Motion Analyzer без GUI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    track = subparsers.add_parser('track', help="трекинг одного видео")
+    track.add_argument('video', help="путь к видео файлу")
+    track.add_argument('-o', '--output', help="журнал траектории (.traj), по умолчанию рядом с видео")
+    track.add_argument('-s', '--settings', help="JSON файл с настройками трекинга")
+    track.add_argument('--skip-stationary', action='store_true',
+                       help="не распознавать кадры, пока сцена вокруг объекта не меняется "
+                            "(быстрее, позиция переносится)")
+    track.add_argument('--export', help="дополнительно сохранить траекторию в .npz или .json")
+    track.add_argument('--checkpoint', help="файл контрольной точки (по умолчанию <output>.checkpoint)")
+    track.add_argument('--checkpoint-interval', type=int,
+                       default=HEADLESS_SETTINGS["checkpoint_interval"],
+                       help="кадров между контрольными точками")
+    track.add_argument('--keyframe-interval', type=int,
+                       default=HEADLESS_SETTINGS["keyframe_interval"],
+                       help="интервал ключевых кадров для перехода при возобновлении")
+    track.add_argument('--no-resume', action='store_true',
+                       help="игнорировать существующую контрольную точку")
+    track.add_argument('--opencl', action='store_true',
+                       help="обработка кадров через OpenCL (UMat), если он доступен")
+    track.add_argument('-j', '--workers', type=int,
+                       help="распознавание в N процессах (кадры через общую память, "
+                            "без контрольных точек)")
+    track.add_argument('--profile', metavar='FILE',
+                       help="замерить этапы обработки кадра и сохранить p50/p95/p99 в JSON")
+    track.add_argument('--annotate', metavar='VIDEO',
+                       help="после трекинга записать видео с разметкой (.mp4, .avi)")
+    add_sampling_arguments(track)
+    track.set_defaults(handler=command_track)
+
+    annotate = subparsers.add_parser('annotate', help="видео с разметкой по готовой траектории")
+    annotate.add_argument('video', help="исходное видео")
+    annotate.add_argument('trajectory', help="траектория (.traj, .npz или .json)")
+    annotate.add_argument('-o', '--output', required=True, help="выходное видео (.mp4, .avi)")
+    annotate.add_argument('--calibration', metavar='PROFILE',
+                          help="профиль калибровки камеры: скорость в метрах в секунду")
+    annotate.set_defaults(handler=command_annotate)
+
+    batch = subparsers.add_parser('batch', help="пакетная обработка каталога видео")
+    batch.add_argument('source', help="каталог или glob-шаблон (например, 'clips/*.mp4')")
+    batch.add_argument('-o', '--output', required=True, help="каталог для результатов")
+    batch.add_argument('-s', '--settings', help="JSON файл с настройками трекинга")
+    batch.add_argument('--skip-stationary', action='store_true',
+                       help="не распознавать кадры, пока сцена вокруг объекта не меняется")
+    batch.add_argument('-j', '--workers', type=int, help="число процессов (по умолчанию — число ядер)")
+    batch.add_argument('-r', '--recursive', action='store_true', help="искать видео в подкаталогах")
+    batch.add_argument('--force', action='store_true', help="пересчитать даже актуальные результаты")
+    batch.add_argument('--calibration', metavar='PROFILE',
+                       help="профиль калибровки камеры (файл или имя): сводка в метрах")
+    batch.add_argument('--opencl', action='store_true',
+                       help="обработка кадров через OpenCL (UMat), если он доступен")
+    add_sampling_arguments(batch)
+    batch.set_defaults(handler=command_batch)
+
+    analyze = subparsers.add_parser('analyze', help="анализ движения по файлу траектории")
+    analyze.add_argument('trajectory', help="траектория (.traj читается блоками; .npz, .json)")
+    analyze.add_argument('--csv', help="сохранить скорость и ускорение по точкам в CSV")
+    analyze.add_argument('--chunk-size', type=int,
+                         help="точек в блоке анализа (по умолчанию 65536)")
+    analyze.add_argument('--calibration', metavar='PROFILE',
+                         help="профиль калибровки камеры: анализ в метрах")
+    analyze.set_defaults(handler=command_analyze)
+
+    compare = subparsers.add_parser('compare', help="сравнить наборы настроек трекинга на одном видео")
+    compare.add_argument('video', help="путь к видео файлу")
+    compare.add_argument('-s', '--settings', action='append', required=True,
+                         help="JSON файл с настройками (не меньше двух; первый — опорный)")
+    compare.add_argument('-o', '--output', help="каталог для журналов траекторий <имя>.traj")
+    compare.add_argument('--csv', help="позиции всех наборов по кадрам рядом, в CSV")
+    add_sampling_arguments(compare)
+    compare.set_defaults(handler=command_compare)
+
+    autotune = subparsers.add_parser('autotune', help="подобрать пороги HSV по отмеченному объекту")
+    autotune.add_argument('video', help="путь к видео файлу")
+    autotune.add_argument('-m', '--mark', type=parse_mark, action='append', required=True,
+                          help="объект на кадре: КАДР:X,Y (точка) или КАДР:X,Y,W,H (рамка); "
+                               "можно несколько раз")
+    autotune.add_argument('-o', '--output', help="сохранить лучшие настройки в JSON (для --settings)")
+    autotune.add_argument('-j', '--workers', type=int, help="число процессов перебора")
+    autotune.set_defaults(handler=command_autotune)
+
+    serve = subparsers.add_parser('serve', help="локальный сервис трекинга с HTTP/JSON API")
+    serve.add_argument('--host', default=SERVICE_SETTINGS["host"],
+                       help="адрес loopback-интерфейса (127.0.0.1 или ::1)")
+    serve.add_argument('--port', type=int, default=SERVICE_SETTINGS["port"])
+    serve.add_argument('-j', '--workers', type=int, default=SERVICE_SETTINGS["workers"],
+                       help="число одновременно выполняемых задач")
+    serve.add_argument('-o', '--output', default=SERVICE_SETTINGS["output_dir"],
+                       help="каталог для результатов задач")
+    serve.set_defaults(handler=command_serve)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    """Точка входа командной строки"""
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Пакетная обработка каталога видео на пуле процессов
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional, Callable
+
+from utils.constants import SUPPORTED_VIDEO_FORMATS, TRACKING_SETTINGS
+from utils.runtime_config import configure_runtime, threads_for_mode, MODE_BATCH_WORKER
+
+SUMMARY_SUFFIX = '.summary.json'
+TRAJECTORY_SUFFIX = '.npz'
+MANIFEST_NAME = 'manifest.json'
+
+
+def collect_videos(source: str, recursive: bool = False) -> List[str]:
+    """Найти видео в каталоге или по glob-шаблону (с фильтром по расширению)"""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, '**', '*') if recursive else os.path.join(source, '*')
+    else:
+        pattern = source
+    paths = glob.glob(pattern, recursive=recursive or '**' in pattern)
+    return sorted(
+        os.path.abspath(path) for path in paths
+        if os.path.isfile(path) and os.path.splitext(path)[1].lower() in SUPPORTED_VIDEO_FORMATS
+    )
+
+
+def output_names(videos: List[str]) -> Dict[str, str]:
+    """Имена выходных файлов для видео (с суффиксом, если имена совпадают)"""
+    stems = {}
+    for video in videos:
+        stem = os.path.splitext(os.path.basename(video))[0]
+        stems.setdefault(stem, []).append(video)
+
+    names = {}
+    for stem, paths in stems.items():
+        for video in paths:
+            if len(paths) == 1:
+                names[video] = stem
+            else:
+                digest = hashlib.sha1(video.encode('utf-8')).hexdigest()[:8]
+                names[video] = f"{stem}_{digest}"
+    return names
+
+
+def is_up_to_date(video: str, summary_path: str, trajectory_path: str,
+                  settings_hash: str) -> bool:
+    """Проверить, что результаты для видео уже посчитаны с теми же настройками"""
+    # Импорт здесь, чтобы модуль оставался лёгким для процесса-координатора
+    from core.headless_processor import file_fingerprint
+
+    if not (os.path.exists(summary_path) and os.path.exists(trajectory_path)):
+        return False
+    try:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (summary.get('video') == file_fingerprint(video) and
+            summary.get('settings_hash') == settings_hash)
+
+
+def analysis_summary(source, calibration=None, frame_size=None) -> Dict:
+    """
+    Сводная статистика анализа движения (в единицах калибровки)
+
+    source — колонки траектории или путь к журналу .traj; журнал
+    анализируется блоками, не загружаясь в память целиком.
+    """
+    from core.chunked_analyzer import ChunkedAnalyzer
+
+    if isinstance(source, str):
+        analyzer = ChunkedAnalyzer.from_file(source, calibration=calibration, frame_size=frame_size)
+    else:
+        analyzer = ChunkedAnalyzer.from_columns(source, calibration=calibration, frame_size=frame_size)
+    results = analyzer.analyze_movement()
+    summary = {
+        key: results.get(key, 0) for key in
+        ('total_time', 'total_distance', 'max_velocity', 'max_acceleration', 'avg_velocity')
+    }
+    summary['units'] = analyzer.units
+    return summary
+
+
+def process_video_job(job: Dict) -> Dict:
+    """
+    Обработать одно видео (выполняется в процессе пула)
+
+    Пишет <name>.npz с траекторией и <name>.summary.json со сводкой анализа.
+    """
+    from core.headless_processor import HeadlessProcessor, file_fingerprint
+    from core.trajectory_io import TrajectoryLogReader, save_npz
+    from core.calibration import load_profile
+
+    video = job['video']
+    base = os.path.join(job['output_dir'], job['name'])
+    log_path = base + '.traj'
+    started = time.time()
+
+    processor = HeadlessProcessor(job['settings'], sampling=job.get('sampling'))
+    run_summary = processor.run(video, log_path)
+
+    analyze_started = time.time()
+    # Журнал отображается в память: в .npz он переписывается блоками
+    records = TrajectoryLogReader(log_path).memmap()
+    save_npz(base + TRAJECTORY_SUFFIX, {name: records[name] for name in records.dtype.names},
+             processor.settings)
+    del records
+    frames = run_summary['processed_frames'] + run_summary['resumed_from_frame']
+    sampled = run_summary['sampled_frames']
+
+    summary = {
+        'video': file_fingerprint(video),
+        'settings': processor.settings,
+        'settings_hash': job['settings_hash'],
+        'frames': frames,
+        'points': run_summary['points'],
+        'sampled_frames': sampled,
+        'sampling': run_summary['sampling'],
+        'detection_rate': run_summary['points'] / sampled if sampled else 0.0,
+        'calibration': job.get('calibration'),
+        'analysis': analysis_summary(
+            log_path,
+            load_profile(job['calibration']) if job.get('calibration') else None,
+            run_summary['frame_size']),
+        'timings': {
+            'tracking': analyze_started - started,
+            'analysis': time.time() - analyze_started,
+            'total': time.time() - started
+        }
+    }
+    with open(base + SUMMARY_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    # Журнал нужен только для возобновления; результат — в .npz
+    os.remove(log_path)
+    return summary
+
+
+class BatchRunner:
+    """Пакетная обработка: одна задача на видео, пул процессов по числу ядер"""
+
+    def __init__(self, output_dir: str, settings: Optional[Dict] = None,
+                 workers: Optional[int] = None, force: bool = False,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 sampling: Optional[Dict] = None, use_opencl: Optional[bool] = None,
+                 calibration: Optional[str] = None):
+        self.output_dir = output_dir
+        self.settings = dict(TRACKING_SETTINGS)
+        self.settings.update(settings or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.force = force
+        self.sampling = sampling or {}
+        self.use_opencl = use_opencl
+        self.calibration = calibration
+        self.progress_callback = progress_callback
+
+    def build_jobs(self, videos: List[str]) -> List[Dict]:
+        """Сформировать задачи, пропуская видео с актуальными результатами"""
+        from core.headless_processor import settings_fingerprint
+
+        settings_hash = settings_fingerprint({'tracking': self.settings,
+                                              'sampling': self.sampling,
+                                              'calibration': self.calibration})
+        names = output_names(videos)
+        jobs = []
+        for video in videos:
+            base = os.path.join(self.output_dir, names[video])
+            job = {
+                'video': video,
+                'name': names[video],
+                'output_dir': self.output_dir,
+                'settings': self.settings,
+                'settings_hash': settings_hash,
+                'sampling': self.sampling,
+                'calibration': self.calibration,
+                'skip': False
+            }
+            if not self.force and is_up_to_date(video, base + SUMMARY_SUFFIX,
+                                                 base + TRAJECTORY_SUFFIX, settings_hash):
+                job['skip'] = True
+            jobs.append(job)
+        return jobs
+
+    def run(self, videos: List[str]) -> Dict:
+        """Обработать список видео и записать manifest.json"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        started = time.time()
+        jobs = self.build_jobs(videos)
+        entries = []
+
+        pending = [job for job in jobs if not job['skip']]
+        # Размер пула — один и тот же для потоков OpenCV в процессах и для манифеста
+        pool_workers = max(1, min(self.workers, len(pending)))
+        for job in jobs:
+            if job['skip']:
+                entries.append(self._report({'video': job['video'], 'name': job['name'],
+                                             'status': 'skipped'}))
+
+        if pending:
+            # Каждый процесс получает свою долю ядер для потоков OpenCV
+            with ProcessPoolExecutor(max_workers=pool_workers, initializer=configure_runtime,
+                                     initargs=(MODE_BATCH_WORKER, pool_workers, self.use_opencl)) as pool:
+                futures = {pool.submit(process_video_job, job): job for job in pending}
+                for future in as_completed(futures):
+                    job = futures[future]
+                    entry = {'video': job['video'], 'name': job['name']}
+                    try:
+                        summary = future.result()
+                        entry.update(status='done', frames=summary['frames'],
+                                     points=summary['points'], timings=summary['timings'])
+                    except Exception as e:
+                        entry.update(status='failed', error=str(e))
+                    entries.append(self._report(entry))
+
+        manifest = {
+            'created': time.time(),
+            'elapsed': time.time() - started,
+            'workers': pool_workers if pending else 0,
+            'opencv_threads_per_worker': threads_for_mode(MODE_BATCH_WORKER, pool_workers),
+            'settings': self.settings,
+            'counts': {
+                status: sum(1 for e in entries if e['status'] == status)
+                for status in ('done', 'skipped', 'failed')
+            },
+            'videos': sorted(entries, key=lambda e: e['video'])
+        }
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    def _report(self, entry: Dict) -> Dict:
+        """Сообщить о завершении задачи"""
+        if self.progress_callback:
+            self.progress_callback(entry)
+        return entry
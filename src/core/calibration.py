@@ -0,0 +1,207 @@
+"""
+Калибровка камеры: пиксели → метры на плоскости сцены
+"""
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from utils.constants import CALIBRATION_SETTINGS
+
+cv2 = lazy_import("cv2")
+
+PROFILE_EXTENSION = '.json'
+
+
+class CalibrationProfile:
+    """
+    Профиль калибровки одной камеры
+
+    Внутренние параметры (camera_matrix, dist_coeffs) заданы для разрешения
+    image_size и пересчитываются под другое разрешение той же камеры.
+    Гомография переводит исправленные пиксели (в разрешении image_size)
+    в координаты на плоскости сцены в метрах.
+
+    Дисторсия снимается только с найденных центров объектов
+    (undistortPoints), а не с целых кадров; карты для remap строятся
+    лишь при необходимости показать исправленный кадр и кэшируются по
+    разрешению.
+    """
+
+    def __init__(self, name: str, image_size: Tuple[int, int],
+                 camera_matrix: Optional[np.ndarray] = None,
+                 dist_coeffs: Optional[np.ndarray] = None,
+                 homography: Optional[np.ndarray] = None,
+                 units: str = 'm'):
+        self.name = name
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.camera_matrix = None if camera_matrix is None else np.asarray(camera_matrix, dtype=np.float64).reshape(3, 3)
+        self.dist_coeffs = None if dist_coeffs is None else np.asarray(dist_coeffs, dtype=np.float64).ravel()
+        self.homography = None if homography is None else np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.units = units if self.homography is not None else 'px'
+
+        self._maps: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._maps_lock = threading.Lock()
+
+    # === СЕРИАЛИЗАЦИЯ ===
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CalibrationProfile':
+        """Создать профиль из словаря (формат JSON-файла профиля)"""
+        return cls(
+            name=data.get('name', 'camera'),
+            image_size=tuple(data['image_size']),
+            camera_matrix=data.get('camera_matrix'),
+            dist_coeffs=data.get('dist_coeffs'),
+            homography=data.get('homography'),
+            units=data.get('units', 'm')
+        )
+
+    def to_dict(self) -> Dict:
+        """Словарь для сохранения в JSON"""
+        return {
+            'name': self.name,
+            'image_size': list(self.image_size),
+            'camera_matrix': None if self.camera_matrix is None else self.camera_matrix.tolist(),
+            'dist_coeffs': None if self.dist_coeffs is None else self.dist_coeffs.tolist(),
+            'homography': None if self.homography is None else self.homography.tolist(),
+            'units': self.units
+        }
+
+    @classmethod
+    def load(cls, filename: str) -> 'CalibrationProfile':
+        """Загрузить профиль из JSON файла"""
+        with open(filename, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, filename: str):
+        """Сохранить профиль в JSON файл"""
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    # === ПОСТРОЕНИЕ ===
+
+    @staticmethod
+    def homography_from_points(image_points: List[Tuple[float, float]],
+                               world_points: List[Tuple[float, float]]) -> np.ndarray:
+        """
+        Гомография плоскости по соответствиям (не менее 4 точек)
+
+        image_points — исправленные пиксели, world_points — метры на плоскости.
+        """
+        image = np.asarray(image_points, dtype=np.float64).reshape(-1, 1, 2)
+        world = np.asarray(world_points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(image) < 4 or len(image) != len(world):
+            raise ValueError("Нужно не менее 4 пар точек изображение ↔ плоскость")
+        homography, _ = cv2.findHomography(image, world, 0)
+        if homography is None:
+            raise ValueError("Не удалось вычислить гомографию (точки вырождены)")
+        return homography
+
+    # === ПРЕОБРАЗОВАНИЯ ===
+
+    def has_distortion(self) -> bool:
+        """Заданы ли внутренние параметры и дисторсия"""
+        return self.camera_matrix is not None and self.dist_coeffs is not None
+
+    def _resolution_scale(self, frame_size: Optional[Tuple[int, int]]) -> Tuple[float, float]:
+        """Во сколько раз разрешение траектории отличается от разрешения калибровки"""
+        if not frame_size:
+            return 1.0, 1.0
+        return frame_size[0] / self.image_size[0], frame_size[1] / self.image_size[1]
+
+    def scaled_camera_matrix(self, frame_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Матрица камеры для другого разрешения той же камеры"""
+        sx, sy = self._resolution_scale(frame_size)
+        matrix = self.camera_matrix.copy()
+        matrix[0] *= sx
+        matrix[1] *= sy
+        return matrix
+
+    def undistort_points(self, x: np.ndarray, y: np.ndarray,
+                         frame_size: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Исправить дисторсию у набора точек (одним вызовом для всей траектории)
+
+        Returns:
+            (x, y) в пикселях исправленного изображения разрешения калибровки
+        """
+        sx, sy = self._resolution_scale(frame_size)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if not self.has_distortion() or len(x) == 0:
+            return x / sx, y / sy
+
+        points = np.column_stack([x, y]).reshape(-1, 1, 2)
+        matrix = self.scaled_camera_matrix(frame_size)
+        # P = исходная матрица камеры: результат сразу в пикселях разрешения калибровки
+        undistorted = cv2.undistortPoints(points, matrix, self.dist_coeffs, P=self.camera_matrix)
+        undistorted = undistorted.reshape(-1, 2)
+        return undistorted[:, 0], undistorted[:, 1]
+
+    def to_world(self, x: np.ndarray, y: np.ndarray,
+                 frame_size: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Пиксели траектории → координаты на плоскости (векторно по всем точкам)"""
+        ux, uy = self.undistort_points(x, y, frame_size)
+        if self.homography is None:
+            return ux, uy
+
+        h = self.homography
+        w = h[2, 0] * ux + h[2, 1] * uy + h[2, 2]
+        wx = (h[0, 0] * ux + h[0, 1] * uy + h[0, 2]) / w
+        wy = (h[1, 0] * ux + h[1, 1] * uy + h[1, 2]) / w
+        return wx, wy
+
+    def apply_to_columns(self, columns: Dict[str, np.ndarray],
+                         frame_size: Optional[Tuple[int, int]] = None) -> Dict[str, np.ndarray]:
+        """Колонки траектории с x, y в единицах профиля (остальные колонки без копирования)"""
+        result = dict(columns)
+        result['x'], result['y'] = self.to_world(columns['x'], columns['y'], frame_size)
+        return result
+
+    def undistort_maps(self, frame_size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Карты remap для кадров заданного разрешения (строятся один раз)"""
+        frame_size = (int(frame_size[0]), int(frame_size[1]))
+        with self._maps_lock:
+            maps = self._maps.get(frame_size)
+            if maps is None:
+                matrix = self.scaled_camera_matrix(frame_size)
+                maps = cv2.initUndistortRectifyMap(matrix, self.dist_coeffs, None, matrix,
+                                                   frame_size, cv2.CV_16SC2)
+                self._maps[frame_size] = maps
+            return maps
+
+    def undistort_frame(self, frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Исправить дисторсию целого кадра (для показа, не для трекинга)"""
+        if not self.has_distortion():
+            return frame
+        height, width = frame.shape[:2]
+        map1, map2 = self.undistort_maps((width, height))
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=dst)
+
+
+def profile_path(name: str, directory: str = CALIBRATION_SETTINGS["directory"]) -> str:
+    """Путь к файлу профиля камеры по имени"""
+    return os.path.join(directory, name + PROFILE_EXTENSION)
+
+
+def list_profiles(directory: str = CALIBRATION_SETTINGS["directory"]) -> List[str]:
+    """Имена сохранённых профилей камер"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(directory)
+                  if name.endswith(PROFILE_EXTENSION))
+
+
+def load_profile(name_or_path: str,
+                 directory: str = CALIBRATION_SETTINGS["directory"]) -> CalibrationProfile:
+    """Загрузить профиль по пути к файлу или по имени камеры"""
+    if os.path.isfile(name_or_path):
+        return CalibrationProfile.load(name_or_path)
+    return CalibrationProfile.load(profile_path(name_or_path, directory))
@@ -0,0 +1,187 @@
+"""
+Анализ траекторий больше оперативной памяти: проход по журналу блоками
+"""
+import csv
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from core.trajectory_io import (
+    TrajectoryLogReader, DEFAULT_CHUNK_SIZE, LOG_EXTENSION, column_length, load_trajectory
+)
+from core.data_analyzer import DataAnalyzer
+from core.derivatives import METHOD_MOVING_AVERAGE
+
+# Окно скользящего среднего DataAnalyzer.smooth_data
+SMOOTH_WINDOW = 5
+# Сколько предыдущих точек нужно для точного ускорения первой точки блока
+DIFF_HALO = 2
+
+
+class ChunkedAnalyzer:
+    """
+    Анализ движения блоками фиксированного размера
+
+    Даёт те же показатели, что DataAnalyzer.analyze_movement с методом
+    производных moving_average, но держит в памяти только блок и его
+    перекрытие с соседями: для скорости и ускорения нужны две предыдущие
+    точки, для сглаживания — половина окна с каждой стороны. У концов всей
+    траектории, как и в np.convolve (mode='same'), за пределами данных
+    стоят нули.
+    """
+
+    def __init__(self, read_columns: Callable[[int, int], Dict[str, np.ndarray]], count: int,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, calibration=None,
+                 frame_size: Optional[Tuple[int, int]] = None,
+                 smooth_window: int = SMOOTH_WINDOW):
+        self.read_columns = read_columns
+        self.count = count
+        self.chunk_size = max(1, chunk_size)
+        self.calibration = calibration
+        self.frame_size = frame_size
+        self.units = calibration.units if calibration else 'px'
+        self.smooth_window = smooth_window
+        self.window = np.ones(smooth_window) / smooth_window
+        # Границы окна np.convolve(mode='same'): out[i] использует data[i - left .. i + right]
+        self.left = smooth_window // 2
+        self.right = (smooth_window - 1) // 2
+        self.analysis_results = {}
+
+    @classmethod
+    def from_file(cls, filename: str, **kwargs) -> 'ChunkedAnalyzer':
+        """
+        Анализатор по файлу траектории
+
+        Журнал .traj читается блоками с диска; остальные форматы
+        загружаются целиком и только анализируются по блокам.
+        """
+        if filename.lower().endswith(LOG_EXTENSION):
+            reader = TrajectoryLogReader(filename)
+            return cls(reader.read_columns, reader.record_count(), **kwargs)
+        columns, _ = load_trajectory(filename)
+        return cls.from_columns(columns, **kwargs)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], **kwargs) -> 'ChunkedAnalyzer':
+        """Анализатор по колонкам (например, np.memmap), срезы без копирования"""
+        def read(start: int, stop: int) -> Dict[str, np.ndarray]:
+            return {name: values[start:stop] for name, values in columns.items()}
+        return cls(read, column_length(columns), **kwargs)
+
+    def _load(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """Точки [start, stop) в единицах калибровки"""
+        columns = self.read_columns(start, stop)
+        if self.calibration is not None:
+            columns = self.calibration.apply_to_columns(columns, self.frame_size)
+        return columns
+
+    def _smooth(self, values: np.ndarray, start: int, stop: int, offset: int) -> np.ndarray:
+        """
+        Сглаженные значения точек [start, stop) по блоку values
+
+        values[j] соответствует точке offset + j и покрывает окно сглаживания
+        везде, где оно не выходит за концы траектории.
+        """
+        padded = np.zeros(stop - start + self.left + self.right)
+        lo = max(0, start - self.left)
+        hi = min(self.count, stop + self.right)
+        padded[lo - (start - self.left):hi - (start - self.left)] = values[lo - offset:hi - offset]
+        return np.convolve(padded, self.window, mode='valid')
+
+    def iter_chunks(self) -> Iterable[Dict[str, np.ndarray]]:
+        """
+        Блоки результатов по точкам: timestamp, x, y, velocity, acceleration
+
+        Скорость и ускорение — сглаженные, как в DataAnalyzer.analyze_movement.
+        """
+        for start in range(0, self.count, self.chunk_size):
+            stop = min(start + self.chunk_size, self.count)
+            # Перекрытие: слева — для разностей и сглаживания, справа — для сглаживания
+            offset = max(0, start - self.left - DIFF_HALO)
+            block = self._load(offset, min(self.count, stop + self.right))
+
+            timestamps = np.asarray(block['timestamp'], dtype=np.float64)
+            dt = np.diff(timestamps)
+            # segments[j] — отрезок от точки offset + j до offset + j + 1
+            segments = np.hypot(np.diff(block['x']), np.diff(block['y']))
+            velocities = np.zeros(len(timestamps))
+            np.divide(segments, dt, out=velocities[1:], where=dt > 0)
+            accelerations = np.zeros(len(timestamps))
+            np.divide(np.diff(velocities), dt, out=accelerations[1:], where=dt > 0)
+
+            local = slice(start - offset, stop - offset)
+            yield {
+                'timestamp': timestamps[local],
+                'x': np.asarray(block['x'])[local],
+                'y': np.asarray(block['y'])[local],
+                # Отрезки, заканчивающиеся в точках блока (каждый учитывается один раз)
+                'segment': segments[max(start, 1) - offset - 1:stop - offset - 1],
+                'velocity': self._smooth(velocities, start, stop, offset),
+                'acceleration': self._smooth(accelerations, start, stop, offset)
+            }
+
+    def analyze_movement(self, csv_path: Optional[str] = None) -> Dict:
+        """
+        Сводка анализа движения за один проход по траектории
+
+        Если задан csv_path, по ходу прохода пишется тот же CSV, что и
+        DataAnalyzer.export_analysis_csv.
+        """
+        if self.count < max(2, self.smooth_window):
+            # Короткая траектория: сглаживание не применяется — как в DataAnalyzer
+            return self._analyze_in_memory(csv_path)
+
+        total_distance = 0.0
+        velocity_sum = 0.0
+        max_velocity = -np.inf
+        max_acceleration = -np.inf
+        first_time = last_time = None
+
+        csv_file = open(csv_path, 'w', newline='', encoding='utf-8') if csv_path else None
+        try:
+            writer = csv.writer(csv_file) if csv_file else None
+            if writer:
+                writer.writerow(['Timestamp', 'X', 'Y', 'Velocity', 'Acceleration'])
+            for chunk in self.iter_chunks():
+                if first_time is None:
+                    first_time = float(chunk['timestamp'][0])
+                last_time = float(chunk['timestamp'][-1])
+                total_distance += float(chunk['segment'].sum())
+                velocity_sum += float(chunk['velocity'].sum())
+                max_velocity = max(max_velocity, float(chunk['velocity'].max()))
+                max_acceleration = max(max_acceleration, float(chunk['acceleration'].max()))
+                if writer:
+                    writer.writerows(zip(*[chunk[name].tolist() for name in
+                                           ('timestamp', 'x', 'y', 'velocity', 'acceleration')]))
+        finally:
+            if csv_file:
+                csv_file.close()
+
+        self.analysis_results = {
+            'points': self.count,
+            'total_time': last_time - first_time,
+            'total_distance': total_distance,
+            'max_velocity': max_velocity,
+            'max_acceleration': max_acceleration,
+            'avg_velocity': velocity_sum / self.count,
+            'derivative_method': METHOD_MOVING_AVERAGE,
+            'units': self.units
+        }
+        return self.analysis_results
+
+    def _analyze_in_memory(self, csv_path: Optional[str]) -> Dict:
+        """Анализ коротких траекторий обычным DataAnalyzer"""
+        analyzer = DataAnalyzer()
+        analyzer.set_calibration(self.calibration, self.frame_size)
+        analyzer.set_derivative_method(METHOD_MOVING_AVERAGE)
+        analyzer.load_columns(self.read_columns(0, self.count))
+        results = analyzer.analyze_movement()
+        if csv_path:
+            analyzer.export_analysis_csv(csv_path)
+        self.analysis_results = {
+            key: results.get(key, 0) for key in
+            ('total_time', 'total_distance', 'max_velocity', 'max_acceleration', 'avg_velocity')
+        }
+        self.analysis_results.update({'points': self.count, 'units': self.units,
+                                      'derivative_method': METHOD_MOVING_AVERAGE})
+        return self.analysis_results
@@ -2,93 +2,159 @@
 Модуль для анализа данных трекинга
 """
 import numpy as np
-from typing import List, Dict, Tuple, Optional
-import matplotlib.pyplot as plt
-from scipy import signal
-import csv
+from typing import List, Dict, Tuple, Optional, TYPE_CHECKING
+
+from utils.lazy_import import lazy_import
+from core.trajectory_io import (
+    records_to_columns, empty_columns, column_length, load_trajectory, save_csv
+)
+from core.calibration import CalibrationProfile
+from core.spatial_analysis import Zone, dwell_heatmap, zone_occupancy
+from core.trajectory_query import TrajectoryQuery
+from core.derivatives import compute_derivatives, METHODS, METHOD_MOVING_AVERAGE
+from core.spectral_analysis import analyze_spectrum
+from utils.constants import SPATIAL_SETTINGS, DERIVATIVE_SETTINGS
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# matplotlib нужен только для построения графиков
+plt = lazy_import("matplotlib.pyplot")
+
+# Подписи единиц для графиков
+UNIT_LABELS = {'px': 'пикс', 'm': 'м'}
 
 
 class DataAnalyzer:
     """Класс для анализа данных движения"""
     
     def __init__(self):
-        self.data = []
+        self.columns = empty_columns()
+        self.pixel_columns = self.columns
+        self.analysis_results = {}
+        self.calibration: Optional[CalibrationProfile] = None
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.units = 'px'
+        self.zones: List[Zone] = []
+        self.spatial_results = {}
+        self.spectral_results = {}
+        self._query: Optional[TrajectoryQuery] = None
+        self.derivative_method = DERIVATIVE_SETTINGS["method"]
+        
+    def set_calibration(self, profile: Optional[CalibrationProfile],
+                        frame_size: Optional[Tuple[int, int]] = None):
+        """
+        Задать калибровку камеры (None — работать в пикселях)
+        
+        frame_size — разрешение видео, в котором записана траектория
+        (если отличается от разрешения калибровки).
+        """
+        self.calibration = profile
+        self.frame_size = frame_size
+        self.units = profile.units if profile else 'px'
+        self.load_columns(self.pixel_columns)
+        
+    def set_derivative_method(self, method: str):
+        """Выбрать метод расчёта скорости и ускорения (см. core/derivatives.py)"""
+        if method not in METHODS:
+            raise ValueError(f"Неизвестный метод производных: {method}")
+        self.derivative_method = method
         self.analysis_results = {}
         
     def load_data(self, tracking_data: List[Dict]):
         """Загрузить данные для анализа"""
-        self.data = tracking_data
+        self.load_columns(records_to_columns(tracking_data))
+        
+    def load_columns(self, columns: Dict[str, np.ndarray]):
+        """Загрузить данные в виде колонок numpy (без копирования)"""
+        self.pixel_columns = {name: np.asarray(values) for name, values in columns.items()}
+        self.columns = self.pixel_columns
+        if self.calibration is not None and column_length(self.pixel_columns):
+            # Вся траектория переводится в единицы калибровки одним векторным проходом
+            self.columns = self.calibration.apply_to_columns(self.pixel_columns, self.frame_size)
+        self.analysis_results = {}
+        self.spatial_results = {}
+        self.spectral_results = {}
+        self._query = None
         
-    def calculate_velocity(self) -> List[float]:
+    def load_file(self, filename: str) -> bool:
+        """Загрузить траекторию из файла (NPZ или JSON)"""
+        try:
+            columns, _ = load_trajectory(filename)
+            self.load_columns(columns)
+            return True
+        except Exception as e:
+            print(f"Ошибка загрузки траектории: {e}")
+            return False
+        
+    def point_count(self) -> int:
+        """Количество загруженных точек"""
+        return column_length(self.columns)
+        
+    def query(self) -> TrajectoryQuery:
+        """Индекс по загруженной траектории (строится один раз на загрузку)"""
+        if self._query is None:
+            self._query = TrajectoryQuery(self.columns)
+        return self._query
+        
+    def calculate_velocity(self) -> np.ndarray:
         """Вычислить скорость движения"""
-        if len(self.data) < 2:
-            return []
+        if self.point_count() < 2:
+            return np.empty(0)
             
-        velocities = [0.0]  # Первая точка имеет скорость 0
+        dt = np.diff(self.columns['timestamp'])
+        distance = np.hypot(np.diff(self.columns['x']), np.diff(self.columns['y']))
         
-        for i in range(1, len(self.data)):
-            dt = self.data[i]['timestamp'] - self.data[i-1]['timestamp']
-            if dt <= 0:
-                velocities.append(0.0)
-                continue
-                
-            dx = self.data[i]['x'] - self.data[i-1]['x']
-            dy = self.data[i]['y'] - self.data[i-1]['y']
-            distance = np.sqrt(dx**2 + dy**2)
-            
-            velocity = distance / dt
-            velocities.append(velocity)
-            
+        # Первая точка имеет скорость 0, при dt <= 0 скорость тоже 0
+        velocities = np.zeros(len(dt) + 1)
+        np.divide(distance, dt, out=velocities[1:], where=dt > 0)
         return velocities
     
-    def calculate_acceleration(self, velocities: List[float]) -> List[float]:
+    def calculate_acceleration(self, velocities: np.ndarray) -> np.ndarray:
         """Вычислить ускорение"""
         if len(velocities) < 2:
-            return []
+            return np.empty(0)
             
-        accelerations = [0.0]  # Первая точка имеет ускорение 0
+        dt = np.diff(self.columns['timestamp'][:len(velocities)])
+        dv = np.diff(velocities)
         
-        for i in range(1, len(velocities)):
-            dt = self.data[i]['timestamp'] - self.data[i-1]['timestamp']
-            if dt <= 0:
-                accelerations.append(0.0)
-                continue
-                
-            dv = velocities[i] - velocities[i-1]
-            acceleration = dv / dt
-            accelerations.append(acceleration)
-            
+        # Первая точка имеет ускорение 0
+        accelerations = np.zeros(len(velocities))
+        np.divide(dv, dt, out=accelerations[1:], where=dt > 0)
         return accelerations
     
-    def smooth_data(self, data: List[float], window_size: int = 5) -> List[float]:
+    def smooth_data(self, data: np.ndarray, window_size: int = 5) -> np.ndarray:
         """Сгладить данные с помощью скользящего среднего"""
+        data = np.asarray(data, dtype=np.float64)
         if len(data) < window_size:
             return data
             
         window = np.ones(window_size) / window_size
-        smoothed = np.convolve(data, window, mode='same')
-        return smoothed.tolist()
+        return np.convolve(data, window, mode='same')
     
     def analyze_movement(self) -> Dict:
         """Провести полный анализ движения"""
-        if not self.data:
+        if self.point_count() == 0:
             return {}
             
         # Извлекаем координаты и временные метки
-        timestamps = [point['timestamp'] for point in self.data]
-        x_coords = [point['x'] for point in self.data]
-        y_coords = [point['y'] for point in self.data]
-        
-        # Вычисляем производные
-        velocities = self.calculate_velocity()
-        accelerations = self.calculate_acceleration(velocities)
+        timestamps = self.columns['timestamp']
+        x_coords = self.columns['x']
+        y_coords = self.columns['y']
         
-        # Сглаживаем данные
-        smooth_velocities = self.smooth_data(velocities)
-        smooth_accelerations = self.smooth_data(accelerations)
+        if self.derivative_method == METHOD_MOVING_AVERAGE:
+            # Прежний способ: разности соседних точек и скользящее среднее
+            velocities = self.calculate_velocity()
+            accelerations = self.calculate_acceleration(velocities)
+            smooth_velocities = self.smooth_data(velocities)
+            smooth_accelerations = self.smooth_data(accelerations)
+        else:
+            derivatives = compute_derivatives(timestamps, x_coords, y_coords, self.derivative_method)
+            smooth_velocities = derivatives['speed']
+            smooth_accelerations = derivatives['acceleration']
         
         # Основная статистика
-        total_time = timestamps[-1] - timestamps[0] if timestamps else 0
+        total_time = float(timestamps[-1] - timestamps[0])
         total_distance = self.calculate_total_distance()
         
         self.analysis_results = {
@@ -99,85 +165,195 @@ class DataAnalyzer:
             'accelerations': smooth_accelerations,
             'total_time': total_time,
             'total_distance': total_distance,
-            'max_velocity': max(smooth_velocities) if smooth_velocities else 0,
-            'max_acceleration': max(smooth_accelerations) if smooth_accelerations else 0,
-            'avg_velocity': np.mean(smooth_velocities) if smooth_velocities else 0
+            'max_velocity': float(smooth_velocities.max()) if len(smooth_velocities) else 0,
+            'max_acceleration': float(smooth_accelerations.max()) if len(smooth_accelerations) else 0,
+            'avg_velocity': float(smooth_velocities.mean()) if len(smooth_velocities) else 0,
+            'derivative_method': self.derivative_method,
+            'units': self.units
         }
         
         return self.analysis_results
     
     def calculate_total_distance(self) -> float:
         """Вычислить общее пройденное расстояние"""
-        if len(self.data) < 2:
+        if self.point_count() < 2:
             return 0.0
             
-        total_distance = 0.0
-        for i in range(1, len(self.data)):
-            dx = self.data[i]['x'] - self.data[i-1]['x']
-            dy = self.data[i]['y'] - self.data[i-1]['y']
-            total_distance += np.sqrt(dx**2 + dy**2)
-            
-        return total_distance
+        return float(np.hypot(np.diff(self.columns['x']), np.diff(self.columns['y'])).sum())
     
     def export_analysis_csv(self, filename: str) -> bool:
         """Экспортировать результаты анализа в CSV"""
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                # Заголовки
-                writer.writerow([
-                    'Timestamp', 'X', 'Y', 'Velocity', 'Acceleration'
-                ])
-                
-                # Данные
-                for i, point in enumerate(self.data):
-                    writer.writerow([
-                        point['timestamp'],
-                        point['x'],
-                        point['y'],
-                        self.analysis_results.get('velocities', [0] * len(self.data))[i],
-                        self.analysis_results.get('accelerations', [0] * len(self.data))[i]
-                    ])
-                    
+            count = self.point_count()
+            zeros = np.zeros(count)
+            velocities = self.analysis_results.get('velocities')
+            accelerations = self.analysis_results.get('accelerations')
+            
+            save_csv(filename, ['Timestamp', 'X', 'Y', 'Velocity', 'Acceleration'], [
+                self.columns['timestamp'],
+                self.columns['x'],
+                self.columns['y'],
+                velocities if velocities is not None and len(velocities) == count else zeros,
+                accelerations if accelerations is not None and len(accelerations) == count else zeros
+            ])
             return True
         except Exception as e:
             print(f"Ошибка экспорта CSV: {e}")
             return False
     
-    def create_trajectory_plot(self) -> plt.Figure:
+    def set_zones(self, zones: List[Zone]):
+        """Задать зоны (в тех же единицах, что и траектория)"""
+        self.zones = list(zones)
+        self.spatial_results = {}
+        
+    def analyze_spatial(self, bins: int = SPATIAL_SETTINGS["heatmap_bins"]) -> Dict:
+        """Карта времени пребывания и статистика по зонам"""
+        if self.point_count() == 0:
+            return {}
+            
+        extent = None
+        if self.zones:
+            # Рамка карты охватывает и траекторию, и все зоны
+            points = np.vstack([zone.polygon for zone in self.zones] +
+                               [np.column_stack([self.columns['x'], self.columns['y']])])
+            extent = (points[:, 0].min(), points[:, 0].max(), points[:, 1].min(), points[:, 1].max())
+            
+        self.spatial_results = dwell_heatmap(self.columns, bins, extent)
+        self.spatial_results['zones'] = zone_occupancy(self.columns, self.zones)
+        self.spatial_results['units'] = self.units
+        return self.spatial_results
+    
+    def export_spatial(self, filename: str) -> bool:
+        """Экспорт пространственного анализа: .npz — карта и зоны, иначе CSV по зонам"""
+        try:
+            results = self.spatial_results or self.analyze_spatial()
+            zones = results.get('zones', [])
+            if filename.lower().endswith('.npz'):
+                np.savez_compressed(
+                    filename,
+                    heatmap=results['heatmap'],
+                    x_edges=results['x_edges'],
+                    y_edges=results['y_edges'],
+                    zone_names=np.array([zone['zone'] for zone in zones], dtype=str),
+                    zone_stats=np.array([[zone['time'], zone['share'], zone['points'],
+                                          zone['entries'], zone['exits']] for zone in zones],
+                                        dtype=np.float64).reshape(-1, 5),
+                    units=results['units']
+                )
+            else:
+                save_csv(filename, ['Zone', 'Time', 'Share', 'Points', 'Entries', 'Exits'], [
+                    [zone['zone'] for zone in zones],
+                    [zone['time'] for zone in zones],
+                    [zone['share'] for zone in zones],
+                    [zone['points'] for zone in zones],
+                    [zone['entries'] for zone in zones],
+                    [zone['exits'] for zone in zones]
+                ])
+            return True
+        except Exception as e:
+            print(f"Ошибка экспорта пространственного анализа: {e}")
+            return False
+    
+    def create_heatmap_plot(self) -> "Figure":
+        """Создать карту времени пребывания с контурами зон"""
+        fig, ax = plt.subplots(figsize=(10, 8))
+        
+        results = self.spatial_results
+        if results:
+            x_edges, y_edges = results['x_edges'], results['y_edges']
+            image = ax.imshow(results['heatmap'].T, origin='lower', cmap='inferno',
+                              extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+                              aspect='equal', interpolation='nearest')
+            fig.colorbar(image, ax=ax, label='Время (с)')
+            
+            for zone in self.zones:
+                polygon = np.vstack([zone.polygon, zone.polygon[:1]])
+                ax.plot(polygon[:, 0], polygon[:, 1], 'c-', linewidth=1.5)
+                center = zone.polygon.mean(axis=0)
+                ax.text(center[0], center[1], zone.name, color='cyan', ha='center', va='center')
+                
+            # У изображения ось Y направлена вниз
+            if self.units == 'px':
+                ax.invert_yaxis()
+            unit = UNIT_LABELS.get(self.units, self.units)
+            ax.set_xlabel(f'X координата ({unit})')
+            ax.set_ylabel(f'Y координата ({unit})')
+            ax.set_title('Время пребывания')
+            
+        return fig
+    
+    def analyze_spectrum(self) -> Dict:
+        """Спектры x, y и скорости, доминирующие частоты и спектрограмма скорости"""
+        if self.point_count() == 0:
+            return {}
+        self.spectral_results = analyze_spectrum(self.columns)
+        return self.spectral_results
+    
+    def create_spectrum_plot(self) -> "Figure":
+        """Спектры мощности и спектрограмма скорости"""
+        fig, (ax_power, ax_sliding) = plt.subplots(2, 1, figsize=(10, 8))
+        
+        results = self.spectral_results
+        if results:
+            unit = UNIT_LABELS.get(self.units, self.units)
+            colors = {'x': 'tab:blue', 'y': 'tab:orange', 'speed': 'tab:red'}
+            for name, channel in results['channels'].items():
+                ax_power.semilogy(channel['freqs'][1:], channel['power'][1:], color=colors[name],
+                                  label=f"{name}: {channel['dominant_frequency']:.3f} Гц")
+                if channel['dominant_frequency'] > 0:
+                    ax_power.axvline(channel['dominant_frequency'], color=colors[name],
+                                     linestyle='--', alpha=0.5)
+            ax_power.set_xlabel('Частота (Гц)')
+            ax_power.set_ylabel(f'Мощность ({unit}²/Гц)')
+            ax_power.set_title('Спектр мощности')
+            ax_power.grid(True, alpha=0.3)
+            ax_power.legend()
+            
+            sliding = results['spectrogram']
+            ax_sliding.pcolormesh(sliding['times'], sliding['freqs'],
+                                  10 * np.log10(sliding['power'] + 1e-12), shading='auto', cmap='magma')
+            ax_sliding.set_xlabel('Время (с)')
+            ax_sliding.set_ylabel('Частота (Гц)')
+            ax_sliding.set_title('Спектрограмма скорости')
+            
+        fig.tight_layout()
+        return fig
+    
+    def create_trajectory_plot(self) -> "Figure":
         """Создать график траектории"""
         fig, ax = plt.subplots(figsize=(10, 8))
         
-        if self.data:
-            x_coords = [point['x'] for point in self.data]
-            y_coords = [point['y'] for point in self.data]
+        if self.point_count():
+            x_coords = self.columns['x']
+            y_coords = self.columns['y']
             
-            # Инвертируем Y для корректного отображения (изображение)
-            y_coords_inv = [max(y_coords) - y for y in y_coords]
+            # Инвертируем Y для корректного отображения (изображение);
+            # у откалиброванной плоскости ось Y уже направлена вверх
+            y_coords_inv = y_coords.max() - y_coords if self.units == 'px' else y_coords
             
             ax.plot(x_coords, y_coords_inv, 'b-', alpha=0.7, linewidth=2)
             ax.scatter(x_coords, y_coords_inv, c=range(len(x_coords)), 
                       cmap='viridis', s=30, alpha=0.6)
-            ax.set_xlabel('X координата')
-            ax.set_ylabel('Y координата')
+            unit = UNIT_LABELS.get(self.units, self.units)
+            ax.set_xlabel(f'X координата ({unit})')
+            ax.set_ylabel(f'Y координата ({unit})')
             ax.set_title('Траектория движения объекта')
             ax.grid(True, alpha=0.3)
             ax.set_aspect('equal', adjustable='datalim')
             
         return fig
     
-    def create_velocity_plot(self) -> plt.Figure:
+    def create_velocity_plot(self) -> "Figure":
         """Создать график скорости"""
         fig, ax = plt.subplots(figsize=(10, 6))
         
-        if self.analysis_results.get('velocities'):
+        if len(self.analysis_results.get('velocities', [])):
             timestamps = self.analysis_results['timestamps']
             velocities = self.analysis_results['velocities']
             
             ax.plot(timestamps, velocities, 'r-', linewidth=2)
             ax.set_xlabel('Время (с)')
-            ax.set_ylabel('Скорость (пикс/с)')
+            ax.set_ylabel(f'Скорость ({UNIT_LABELS.get(self.units, self.units)}/с)')
             ax.set_title('Скорость движения объекта')
             ax.grid(True, alpha=0.3)
             
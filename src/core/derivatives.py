@@ -0,0 +1,156 @@
+"""
+Производные траектории: Савицкий–Голей, конечные разности, сглаживающий сплайн
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from utils.constants import DERIVATIVE_SETTINGS
+
+# scipy нужен только выбранному методу
+signal = lazy_import("scipy.signal")
+interpolate = lazy_import("scipy.interpolate")
+
+# Методы
+METHOD_MOVING_AVERAGE = 'moving_average'   # разности + скользящее среднее (DataAnalyzer.smooth_data)
+METHOD_SAVGOL = 'savgol'                   # фильтр Савицкого–Голея на равномерной сетке
+METHOD_FINITE_DIFF = 'finite_diff'         # центральные разности на равномерной сетке
+METHOD_SPLINE = 'spline'                   # сглаживающий сплайн по исходным меткам времени
+
+# make_smoothing_spline требует не меньше 5 точек
+SPLINE_MIN_POINTS = 5
+
+METHODS = (METHOD_SAVGOL, METHOD_FINITE_DIFF, METHOD_SPLINE, METHOD_MOVING_AVERAGE)
+
+METHOD_LABELS = {
+    METHOD_SAVGOL: 'Савицкий–Голей',
+    METHOD_FINITE_DIFF: 'Конечные разности',
+    METHOD_SPLINE: 'Сглаживающий сплайн',
+    METHOD_MOVING_AVERAGE: 'Скользящее среднее'
+}
+
+
+def split_segments(timestamps: np.ndarray,
+                   gap_factor: float = DERIVATIVE_SETTINGS["gap_factor"]) -> List[Tuple[int, int]]:
+    """
+    Разбить траекторию на участки без пропусков
+
+    Пропуск — интервал больше gap_factor медианных интервалов (объект
+    терялся); производные через пропуск не считаются.
+
+    Returns:
+        Список (start, stop) индексов участков
+    """
+    count = len(timestamps)
+    dt = np.diff(timestamps)
+    positive = dt[dt > 0]
+    if len(positive) == 0:
+        return [(0, count)] if count else []
+    breaks = np.flatnonzero(dt > gap_factor * np.median(positive)) + 1
+    bounds = np.concatenate([[0], breaks, [count]])
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _resample_uniform(t: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Значения (строки values) на равномерной сетке с медианным шагом участка"""
+    step = float(np.median(np.diff(t)))
+    count = int(np.floor((t[-1] - t[0]) / step + 1e-9)) + 1
+    grid = t[0] + np.arange(count) * step
+    resampled = np.empty((len(values), count))
+    for row, source in zip(resampled, values):
+        row[:] = np.interp(grid, t, source)
+    return grid, resampled, step
+
+
+def _to_timestamps(t: np.ndarray, grid: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Значения с сетки обратно в исходные метки времени"""
+    return np.vstack([np.interp(t, grid, row) for row in values])
+
+
+def _segment_derivatives(t: np.ndarray, values: np.ndarray, method: str,
+                         settings: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Первая и вторая производные строк values на одном участке
+
+    t строго возрастает; результат — в точках t. Участки короче
+    SPLINE_MIN_POINTS сплайном не сглаживаются — для них конечные разности.
+    """
+    if method == METHOD_SPLINE and len(t) >= SPLINE_MIN_POINTS:
+        first = np.empty_like(values)
+        second = np.empty_like(values)
+        for i, row in enumerate(values):
+            spline = interpolate.make_smoothing_spline(t, row, lam=settings["spline_lam"])
+            first[i] = spline.derivative(1)(t)
+            second[i] = spline.derivative(2)(t)
+        return first, second
+
+    grid, resampled, step = _resample_uniform(t, values)
+    count = resampled.shape[1]
+
+    window = min(settings["window"], count if count % 2 else count - 1)
+    if method == METHOD_SAVGOL and window > settings["polyorder"]:
+        # mode='interp' подгоняет полином к краям, а не дополняет данные — края не искажаются
+        first = signal.savgol_filter(resampled, window, settings["polyorder"], deriv=1,
+                                     delta=step, axis=1, mode='interp')
+        second = signal.savgol_filter(resampled, window, settings["polyorder"], deriv=2,
+                                      delta=step, axis=1, mode='interp')
+    else:
+        edge_order = 2 if count >= 3 else 1
+        first = np.gradient(resampled, step, axis=1, edge_order=edge_order)
+        second = np.gradient(first, step, axis=1, edge_order=edge_order)
+    return _to_timestamps(t, grid, first), _to_timestamps(t, grid, second)
+
+
+def compute_derivatives(timestamps: np.ndarray, x: np.ndarray, y: np.ndarray,
+                        method: str = DERIVATIVE_SETTINGS["method"],
+                        **overrides) -> Dict[str, np.ndarray]:
+    """
+    Скорость и ускорение по траектории с неравномерными метками времени
+
+    Производные считаются от координат (а не сглаживанием уже
+    продифференцированной скорости), отдельно на каждом участке между
+    пропусками. Точки с повторной или убывающей меткой времени получают
+    значения интерполяцией.
+
+    Returns:
+        {'vx', 'vy', 'ax', 'ay', 'speed', 'acceleration'}; acceleration —
+        касательное ускорение (производная модуля скорости)
+    """
+    if method not in METHODS or method == METHOD_MOVING_AVERAGE:
+        raise ValueError(f"Неизвестный метод производных: {method}")
+    settings = dict(DERIVATIVE_SETTINGS)
+    settings.update(overrides)
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.vstack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+    count = len(timestamps)
+    first = np.zeros((2, count))
+    second = np.zeros((2, count))
+
+    # Только строго возрастающие метки времени
+    increasing = np.ones(count, dtype=bool)
+    if count > 1:
+        increasing[1:] = timestamps[1:] > np.maximum.accumulate(timestamps)[:-1]
+    index = np.flatnonzero(increasing)
+    t = timestamps[index]
+    for start, stop in split_segments(t, settings["gap_factor"]):
+        if stop - start < settings["min_segment"]:
+            continue
+        part = index[start:stop]
+        first[:, part], second[:, part] = _segment_derivatives(t[start:stop], values[:, part],
+                                                               method, settings)
+
+    if len(index) < count:
+        for row in (*first, *second):
+            row[~increasing] = np.interp(timestamps[~increasing], t, row[index])
+
+    speed = np.hypot(first[0], first[1])
+    acceleration = np.zeros(count)
+    np.divide(first[0] * second[0] + first[1] * second[1], speed, out=acceleration, where=speed > 0)
+    return {
+        'vx': first[0], 'vy': first[1],
+        'ax': second[0], 'ay': second[1],
+        'speed': speed,
+        'acceleration': acceleration
+    }
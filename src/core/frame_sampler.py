@@ -0,0 +1,98 @@
+"""
+Прореживание кадров: фиксированный шаг, целевая частота и адаптивный режим
+"""
+import math
+from typing import Optional, Tuple, Dict
+
+from utils.constants import SAMPLING_SETTINGS
+
+
+class FrameSampler:
+    """
+    Решает, сколько кадров пропустить до следующего обрабатываемого
+
+    Шаг задаётся явно (stride) или через целевую частоту выборки
+    (target_rate, Гц) относительно FPS видео. В адаптивном режиме шаг
+    уменьшается вдвое, когда скорость объекта (смещение между выборками,
+    делённое на шаг) больше fast_motion_px пикселей за кадр, и возвращается
+    к базовому, когда она меньше slow_motion_px. Скорость не зависит от шага,
+    поэтому при постоянном движении шаг не скачет туда-обратно.
+    """
+
+    def __init__(self, stride: int = SAMPLING_SETTINGS["stride"],
+                 target_rate: float = SAMPLING_SETTINGS["target_rate"],
+                 adaptive: bool = SAMPLING_SETTINGS["adaptive"],
+                 fast_motion_px: float = SAMPLING_SETTINGS["fast_motion_px"],
+                 slow_motion_px: float = SAMPLING_SETTINGS["slow_motion_px"]):
+        self.stride = max(1, int(stride))
+        self.target_rate = target_rate or 0
+        self.adaptive = adaptive
+        self.fast_motion_px = fast_motion_px
+        self.slow_motion_px = slow_motion_px
+
+        self.base_stride = self.stride
+        self.current_stride = self.stride
+        self.last_position: Optional[Tuple[float, float]] = None
+
+    def configure(self, fps: float):
+        """Пересчитать базовый шаг под FPS открытого видео"""
+        if self.target_rate > 0 and fps > 0:
+            self.base_stride = max(1, int(round(fps / self.target_rate)))
+        else:
+            self.base_stride = self.stride
+        self.reset()
+
+    def reset(self):
+        """Сбросить адаптивное состояние"""
+        self.current_stride = self.base_stride
+        self.last_position = None
+
+    def is_enabled(self) -> bool:
+        """Пропускаются ли кадры вообще"""
+        return self.base_stride > 1
+
+    def next_step(self) -> int:
+        """На сколько кадров продвинуться до следующей выборки (1 = следующий кадр)"""
+        return self.current_stride
+
+    def observe(self, position: Optional[Tuple]):
+        """Учесть найденную позицию объекта для адаптивного шага"""
+        if not self.adaptive or self.base_stride <= 1:
+            return
+        if position is None:
+            # Объект потерян — не разгоняемся, пока снова не найдём
+            self.last_position = None
+            return
+
+        x, y = position[0], position[1]
+        if self.last_position is not None:
+            # Текущий шаг — тот, которым пришли к этой выборке: скорость в пикселях за кадр
+            speed = math.hypot(x - self.last_position[0], y - self.last_position[1]) / self.current_stride
+            if speed > self.fast_motion_px:
+                self.current_stride = max(1, self.current_stride // 2)
+            elif speed < self.slow_motion_px:
+                self.current_stride = min(self.base_stride, self.current_stride * 2)
+        self.last_position = (x, y)
+
+    def to_settings(self) -> Dict:
+        """Параметры выборки (для сохранения и сравнения прогонов)"""
+        return {
+            'stride': self.stride,
+            'target_rate': self.target_rate,
+            'adaptive': self.adaptive,
+            'fast_motion_px': self.fast_motion_px,
+            'slow_motion_px': self.slow_motion_px
+        }
+
+    def get_state(self) -> Dict:
+        """Адаптивное состояние для контрольной точки"""
+        return {
+            'current_stride': self.current_stride,
+            'last_position': list(self.last_position) if self.last_position else None
+        }
+
+    def set_state(self, state: Dict):
+        """Восстановить адаптивное состояние"""
+        self.current_stride = state.get('current_stride', self.base_stride)
+        position = state.get('last_position')
+        self.last_position = tuple(position) if position else None
@@ -0,0 +1,248 @@
+"""
+Передача кадров процессам трекинга через общую память
+"""
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.constants import TRACKING_SETTINGS, TRANSPORT_SETTINGS
+
+# Сообщение о завершении для процессов-обработчиков
+_STOP = None
+
+
+class SharedFrameRing:
+    """
+    Кольцо ячеек под кадры в multiprocessing.shared_memory
+
+    Процесс-владелец создаёт блок памяти и декодирует кадры прямо в ячейки;
+    обработчики подключаются к нему по имени (attach) и читают ячейки как
+    обычные массивы NumPy без копирования. По очередям передаются только
+    номера ячеек.
+    """
+
+    def __init__(self, slots: int, shape: Sequence[int], dtype=np.uint8,
+                 name: Optional[str] = None):
+        self.slots = slots
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._array = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, spec: Dict) -> 'SharedFrameRing':
+        """Подключиться к кольцу другого процесса по описанию из spec()"""
+        return cls(spec['slots'], spec['shape'], spec['dtype'], name=spec['name'])
+
+    def spec(self) -> Dict:
+        """Описание кольца для передачи в другой процесс (маленький словарь)"""
+        return {'name': self.shm.name, 'slots': self.slots,
+                'shape': self.shape, 'dtype': self.dtype.str}
+
+    def slot(self, index: int) -> np.ndarray:
+        """Ячейка кольца как массив NumPy (представление, не копия)"""
+        return self._array[index]
+
+    def close(self):
+        """Отключиться от памяти; владелец ещё и освобождает её"""
+        if self.shm is None:
+            return
+        # Пока живы представления на буфер, закрыть память нельзя
+        self._array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _tracking_worker(ring_spec: Dict, settings: Dict, workers: int,
+                     work_queue, free_slots, results):
+    """
+    Процесс-обработчик: трекер над ячейками общей памяти
+
+    Получает (ячейка, кадр), возвращает ячейку в свободные сразу после
+    обработки и отдаёт короткую запись (кадр, x, y, площадь); для кадров
+    без объекта x, y, площадь — None.
+    """
+    from core.object_tracker import ObjectTracker
+    from utils.runtime_config import configure_runtime, MODE_BATCH_WORKER
+
+    configure_runtime(MODE_BATCH_WORKER, workers)
+    ring = SharedFrameRing.attach(ring_spec)
+    tracker = ObjectTracker()
+    tracker.update_settings(settings)
+    tracker.tracking_enabled = True
+    try:
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                break
+            slot, frame_num = item
+            try:
+                position = tracker.process_frame(ring.slot(slot))
+            finally:
+                free_slots.put(slot)
+            if position:
+                results.put((frame_num, float(position[0]), float(position[1]), float(position[2])))
+            else:
+                results.put((frame_num, None, None, None))
+    finally:
+        tracker = None
+        ring.close()
+
+
+class ParallelTracker:
+    """
+    Трекинг одного видео несколькими процессами
+
+    Главный процесс только декодирует — прямо в ячейки общей памяти, — а
+    распознавание идёт в workers процессах. Кадры в очереди не сериализуются,
+    число ячеек ограничивает память и число кадров «в полёте». Результаты
+    приходят не по порядку и пишутся в журнал по возрастанию кадра.
+
+    Кадры распределяются между процессами вперемешку, поэтому пропуск
+    распознавания на неподвижной сцене (skip_stationary) здесь выключен,
+    а адаптивная выборка сводится к постоянному шагу.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, workers: Optional[int] = None,
+                 slots: Optional[int] = None, sampling: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        self.settings = dict(TRACKING_SETTINGS)
+        self.settings.update(settings or {})
+        self.settings['skip_stationary'] = False
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.slots = slots or self.workers * TRANSPORT_SETTINGS["slots_per_worker"]
+        self.sampling = dict(sampling or {}, adaptive=False)
+        self.progress_callback = progress_callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Прервать обработку"""
+        self.cancelled = True
+
+    def run(self, video_path: str, log_path: str) -> Dict:
+        """
+        Обработать видео и записать траекторию в журнал log_path
+
+        Returns:
+            Сводка прогона (кадры, точки, время, процессы)
+        """
+        from core.video_processor import VideoProcessor
+        from core.frame_sampler import FrameSampler
+        from core.trajectory_io import TrajectoryLogWriter
+        from utils.runtime_config import configure_runtime, MODE_HEADLESS
+
+        # Главный процесс только декодирует: потоки OpenCV достаются обработчикам
+        configure_runtime(MODE_HEADLESS)
+        video_processor = VideoProcessor()
+        video_processor.set_sampler(FrameSampler(**self.sampling))
+        if not video_processor.open_video(video_path):
+            raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+        metadata = video_processor.metadata
+        fps = metadata.fps if metadata.fps > 0 else 30.0
+
+        context = multiprocessing.get_context(TRANSPORT_SETTINGS["start_method"])
+        ring = SharedFrameRing(self.slots, (metadata.height, metadata.width, 3))
+        work_queue = context.Queue()
+        free_slots = context.Queue()
+        results = context.Queue()
+        for slot in range(self.slots):
+            free_slots.put(slot)
+
+        processes = [context.Process(target=_tracking_worker, name=f"tracker-{i}", daemon=True,
+                                     args=(ring.spec(), self.settings, self.workers,
+                                           work_queue, free_slots, results))
+                     for i in range(self.workers)]
+        for process in processes:
+            process.start()
+
+        start_time = time.time()
+        pending: Dict[int, tuple] = {}
+        in_flight = deque()       # отправленные, но ещё не записанные кадры — по порядку
+        sampled_frames = 0
+        points = 0
+        log = TrajectoryLogWriter(log_path, settings=self.settings,
+                                  metadata={'video': os.path.abspath(video_path), 'fps': fps})
+
+        def collect(block: bool) -> bool:
+            """Забрать готовые записи; в журнал — только непрерывный префикс по порядку кадров"""
+            nonlocal points
+            try:
+                record = results.get(timeout=TRANSPORT_SETTINGS["poll_interval"]) if block \
+                    else results.get_nowait()
+            except queue.Empty:
+                if block and not all(process.is_alive() for process in processes):
+                    raise RuntimeError("Процесс трекинга завершился с ошибкой")
+                return False
+            pending[record[0]] = record
+            while in_flight and in_flight[0] in pending:
+                frame_num, x, y, area = pending.pop(in_flight.popleft())
+                if x is not None:
+                    log.append(frame_num, frame_num / fps, x, y, area)
+                    points += 1
+            return True
+
+        try:
+            while not self.cancelled:
+                # Свободной ячейки нет — ждём результатов, освобождающих ячейки
+                try:
+                    slot = free_slots.get(timeout=TRANSPORT_SETTINGS["poll_interval"])
+                except queue.Empty:
+                    collect(block=True)
+                    continue
+                if not video_processor.read_sampled_frame_into(ring.slot(slot)):
+                    free_slots.put(slot)
+                    break
+                frame_num = video_processor.frame_index - 1
+                in_flight.append(frame_num)
+                work_queue.put((slot, frame_num))
+                sampled_frames += 1
+                while collect(block=False):
+                    pass
+                if self.progress_callback:
+                    self.progress_callback(frame_num + 1, metadata.frame_count)
+
+            while in_flight:
+                collect(block=True)
+        finally:
+            for _ in processes:
+                work_queue.put(_STOP)
+            for process in processes:
+                process.join(timeout=5.0)
+                if process.is_alive():
+                    process.terminate()
+            log.close()
+            video_processor.close_video()
+            ring.close()
+
+        return {
+            'video': os.path.abspath(video_path),
+            'log_path': os.path.abspath(log_path),
+            'completed': not self.cancelled,
+            'sampled_frames': sampled_frames,
+            'points': points,
+            'fps': fps,
+            'frame_size': [metadata.width, metadata.height],
+            'workers': self.workers,
+            'slots': self.slots,
+            'elapsed': time.time() - start_time
+        }
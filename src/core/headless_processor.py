@@ -0,0 +1,209 @@
+"""
+Обработка видео без GUI с контрольными точками для возобновления
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Optional, Dict, Callable
+
+from core.video_processor import VideoProcessor
+from core.object_tracker import ObjectTracker
+from core.trajectory_io import TrajectoryLogWriter
+from core.frame_sampler import FrameSampler
+from utils.constants import TRACKING_SETTINGS, HEADLESS_SETTINGS
+
+CHECKPOINT_VERSION = 2
+
+
+def load_settings_file(filename: str) -> Dict:
+    """Загрузить настройки трекинга из JSON файла"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Допускаем как плоский словарь, так и {"tracking": {...}}
+    settings = data.get('tracking', data)
+    unknown = set(settings) - set(TRACKING_SETTINGS)
+    if unknown:
+        raise ValueError(f"Неизвестные настройки трекинга: {', '.join(sorted(unknown))}")
+    return settings
+
+
+def settings_fingerprint(settings: Dict) -> str:
+    """Хэш настроек, чтобы не продолжать обработку с другими параметрами"""
+    payload = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+
+def file_fingerprint(path: str) -> Dict:
+    """Идентификация версии файла по пути, размеру и времени изменения"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def save_checkpoint(filename: str, checkpoint: Dict):
+    """Атомарно записать контрольную точку"""
+    tmp_path = filename + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filename)
+
+
+def load_checkpoint(filename: str) -> Optional[Dict]:
+    """Прочитать контрольную точку (None, если её нет или она повреждена)"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        return None
+    return checkpoint
+
+
+class HeadlessProcessor:
+    """
+    Трекинг всего видео без интерфейса
+
+    Временные метки точек считаются по номеру кадра (frame / fps), поэтому
+    результат не зависит от скорости обработки, и возобновлённый прогон
+    даёт тот же журнал траектории, что и непрерывный.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None,
+                 checkpoint_interval: int = HEADLESS_SETTINGS["checkpoint_interval"],
+                 keyframe_interval: int = HEADLESS_SETTINGS["keyframe_interval"],
+                 progress_callback: Optional[Callable[[int, int], None]] = None,
+                 sampling: Optional[Dict] = None):
+        self.video_processor = VideoProcessor()
+        self.video_processor.set_sampler(FrameSampler(**(sampling or {})))
+        self.object_tracker = ObjectTracker()
+        self.settings = dict(TRACKING_SETTINGS)
+        self.settings.update(settings or {})
+        self.object_tracker.update_settings(self.settings)
+        self.checkpoint_interval = checkpoint_interval
+        self.keyframe_interval = keyframe_interval
+        self.progress_callback = progress_callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Прервать обработку (контрольная точка сохранится)"""
+        self.cancelled = True
+
+    def _checkpoint_identity(self, video_path: str, log_path: str) -> Dict:
+        """Данные, по которым проверяется, что контрольная точка относится к этому прогону"""
+        return {
+            'video': file_fingerprint(video_path),
+            'log_path': os.path.abspath(log_path),
+            'settings': settings_fingerprint(self.settings),
+            'sampling': self.video_processor.sampler.to_settings()
+        }
+
+    def _write_checkpoint(self, checkpoint_path: str, identity: Dict, next_frame: int,
+                          sampled_frames: int):
+        """Сохранить прогресс: следующий кадр, счётчик кадров, состояние трекера и длину журнала"""
+        log = self.object_tracker.trajectory_log
+        if log is not None:
+            log.sync()
+        save_checkpoint(checkpoint_path, {
+            'version': CHECKPOINT_VERSION,
+            'identity': identity,
+            'next_frame': next_frame,
+            'sampled_frames': sampled_frames,
+            'log_records': self.object_tracker.get_point_count(),
+            'tracker': self.object_tracker.get_state(),
+            'sampler': self.video_processor.sampler.get_state(),
+            'saved_at': time.time()
+        })
+
+    def _restore(self, checkpoint: Dict, log_path: str) -> int:
+        """Восстановить трекер и журнал из контрольной точки, вернуть следующий кадр"""
+        # Всё, что было записано после контрольной точки, будет обработано заново
+        with TrajectoryLogWriter(log_path, resume=True) as log:
+            log.truncate(checkpoint['log_records'])
+
+        self.object_tracker.set_state(checkpoint['tracker'])
+        self.video_processor.sampler.set_state(checkpoint.get('sampler', {}))
+        self.object_tracker.start_tracking(log_path=log_path, resume=True)
+
+        next_frame = checkpoint['next_frame']
+        if not self.video_processor.seek(next_frame, preroll=self.keyframe_interval):
+            raise RuntimeError(f"Не удалось перейти к кадру {next_frame}")
+        return next_frame
+
+    def run(self, video_path: str, log_path: str, checkpoint_path: Optional[str] = None,
+            resume: bool = True) -> Dict:
+        """
+        Обработать видео и записать траекторию в журнал log_path
+
+        Returns:
+            Словарь со сводкой прогона (кадры, точки, время, кадр возобновления)
+        """
+        if not self.video_processor.open_video(video_path):
+            raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+
+        checkpoint_path = checkpoint_path or log_path + '.checkpoint'
+        identity = self._checkpoint_identity(video_path, log_path)
+        metadata = self.video_processor.metadata
+        fps = metadata.fps if metadata.fps > 0 else 30.0
+
+        start_time = time.time()
+        start_frame = 0
+        sampled_frames = 0
+        checkpoint = load_checkpoint(checkpoint_path) if resume else None
+        try:
+            if (checkpoint and checkpoint.get('identity') == identity
+                    and os.path.exists(log_path)):
+                start_frame = self._restore(checkpoint, log_path)
+                # Журнал содержит точки и прошлых запусков — счёт кадров тоже продолжаем
+                sampled_frames = checkpoint['sampled_frames']
+            else:
+                self.object_tracker.start_tracking(log_path=log_path)
+                self.video_processor.seek(0)
+
+            sampler = self.video_processor.sampler
+            last_checkpoint = start_frame
+            while not self.cancelled:
+                with self.video_processor.profiler.stage('decode'):
+                    frame = self.video_processor.read_sampled_frame()
+                if frame is None:
+                    break
+                sampled_frames += 1
+                frame_num = self.video_processor.frame_index - 1
+
+                position = self.object_tracker.process_frame(frame)
+                sampler.observe(position)
+                if position:
+                    self.object_tracker.add_tracking_point(position, frame_num / fps, frame_num)
+
+                next_frame = frame_num + 1
+                if self.checkpoint_interval and next_frame - last_checkpoint >= self.checkpoint_interval:
+                    self._write_checkpoint(checkpoint_path, identity, next_frame, sampled_frames)
+                    last_checkpoint = next_frame
+                if self.progress_callback:
+                    self.progress_callback(next_frame, metadata.frame_count)
+
+            if self.cancelled:
+                self._write_checkpoint(checkpoint_path, identity, self.video_processor.frame_index,
+                                       sampled_frames)
+            elif os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+        finally:
+            processed_frames = self.video_processor.frame_index - start_frame
+            self.object_tracker.stop_tracking()
+            self.video_processor.close_video()
+
+        return {
+            'video': os.path.abspath(video_path),
+            'sampling': self.video_processor.sampler.to_settings(),
+            'log_path': os.path.abspath(log_path),
+            'completed': not self.cancelled,
+            'resumed_from_frame': start_frame,
+            'processed_frames': processed_frames,
+            'sampled_frames': sampled_frames,
+            'points': self.object_tracker.get_point_count(),
+            'fps': fps,
+            'frame_size': [metadata.width, metadata.height],
+            'elapsed': time.time() - start_time
+        }
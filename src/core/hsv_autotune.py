@@ -0,0 +1,304 @@
+"""
+Автоподбор порогов HSV по отмеченным областям объекта
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.object_tracker import ObjectTracker, frame_to_hsv
+from utils.constants import HSV_AUTOTUNE_SETTINGS, HEADLESS_SETTINGS, TRACKING_SETTINGS
+
+# Рамка (x, y, w, h) в пикселях кадра
+Box = Tuple[int, int, int, int]
+
+# Максимумы каналов HSV в OpenCV (8 бит)
+HSV_LIMITS = (180, 255, 255)
+HSV_KEYS = (('hue_low', 'hue_high'), ('saturation_low', 'saturation_high'), ('value_low', 'value_high'))
+
+# Набор кадров в процессах перебора (заполняется инициализатором пула)
+_worker_frames: Optional[np.ndarray] = None
+_worker_sequence = 0
+_worker_labels: List[Box] = []
+
+
+def click_box(x: float, y: float, radius: int = HSV_AUTOTUNE_SETTINGS["click_radius"]) -> Box:
+    """Квадратная рамка вокруг точки щелчка"""
+    return int(x) - radius, int(y) - radius, 2 * radius + 1, 2 * radius + 1
+
+
+def _clip_box(box: Box, frame_shape: Sequence[int]) -> Optional[Tuple[int, int, int, int]]:
+    """Рамка в пределах кадра как (x0, y0, x1, y1); None, если она вне кадра"""
+    x, y, w, h = box
+    height, width = frame_shape[:2]
+    x0, y0 = max(0, int(x)), max(0, int(y))
+    x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _percentile_from_histogram(histogram: np.ndarray, percent: float) -> int:
+    """Значение канала, ниже которого лежит percent % пикселей"""
+    cumulative = np.cumsum(histogram)
+    return int(np.searchsorted(cumulative, cumulative[-1] * percent / 100.0))
+
+
+def propose_bounds(samples: List[Tuple[np.ndarray, Box]],
+                   percentiles: Tuple[float, float] = HSV_AUTOTUNE_SETTINGS["percentiles"],
+                   margins: Tuple[int, int, int] = HSV_AUTOTUNE_SETTINGS["margins"]) -> Dict:
+    """
+    Начальные пороги HSV по гистограммам отмеченных областей
+
+    Гистограммы каналов всех областей складываются, границы берутся по
+    перцентилям (отбрасывают фон по краям рамки) и расширяются на запас.
+    Диапазон Hue не переходит через 0/180: красный объект на стыке получит
+    широкий диапазон, который сузит перебор.
+
+    Args:
+        samples: пары (кадр BGR, рамка объекта)
+
+    Returns:
+        {'settings': шесть порогов, 'object_area': медианная площадь объекта
+        в областях (пикселей внутри порогов)}
+    """
+    histograms = [np.zeros(limit + 1, dtype=np.int64) for limit in HSV_LIMITS]
+    regions = []
+    for frame, box in samples:
+        bounds = _clip_box(box, frame.shape)
+        if bounds is None:
+            continue
+        x0, y0, x1, y1 = bounds
+        hsv = frame_to_hsv(np.ascontiguousarray(frame[y0:y1, x0:x1]))
+        regions.append(hsv)
+        for channel, histogram in enumerate(histograms):
+            histogram += np.bincount(hsv[..., channel].ravel(), minlength=len(histogram))
+    if not regions:
+        raise ValueError("Ни одна отмеченная область не попадает в кадр")
+
+    settings = {}
+    for (low_key, high_key), histogram, limit, margin in zip(HSV_KEYS, histograms, HSV_LIMITS, margins):
+        settings[low_key] = max(0, _percentile_from_histogram(histogram, percentiles[0]) - margin)
+        settings[high_key] = min(limit, _percentile_from_histogram(histogram, percentiles[1]) + margin)
+
+    lower = np.array([settings[low] for low, _ in HSV_KEYS], dtype=np.uint8)
+    upper = np.array([settings[high] for _, high in HSV_KEYS], dtype=np.uint8)
+    areas = [int(np.count_nonzero(np.all((hsv >= lower) & (hsv <= upper), axis=2))) for hsv in regions]
+    return {'settings': settings, 'object_area': float(np.median(areas))}
+
+
+def candidate_settings(proposal: Dict, options: Optional[Dict] = None) -> List[Dict]:
+    """
+    Наборы настроек для перебора вокруг начальных порогов
+
+    Перебираются расширение Hue, снижение нижних порогов S и V, число
+    итераций морфологии, размытие и минимальная площадь.
+    """
+    options = dict(HSV_AUTOTUNE_SETTINGS, **(options or {}))
+    base = proposal['settings']
+    object_area = max(1.0, proposal['object_area'])
+
+    candidates = []
+    for hue, sv, morph, blur, area_factor in product(options["hue_expand"], options["sv_expand"],
+                                                     options["morph_iters"], options["blur_sizes"],
+                                                     options["min_area_factors"]):
+        settings = dict(base)
+        settings['hue_low'] = max(0, base['hue_low'] - hue)
+        settings['hue_high'] = min(HSV_LIMITS[0], base['hue_high'] + hue)
+        settings['saturation_low'] = max(0, base['saturation_low'] - sv)
+        settings['value_low'] = max(0, base['value_low'] - sv)
+        settings.update(morph_iters=morph, blur_size=blur,
+                        min_area=max(1, int(object_area * area_factor)))
+        candidates.append(settings)
+    return candidates
+
+
+def score_settings(frames: np.ndarray, sequence_count: int, label_boxes: List[Box],
+                   settings: Dict, options: Optional[Dict] = None) -> Dict:
+    """
+    Оценка набора настроек на кэшированных кадрах
+
+    Первые sequence_count кадров — серии по run_length соседних кадров,
+    разнесённые по видео. По ним считаются доля кадров с найденным объектом
+    и рывки: медиана второй разности позиций внутри серии в долях диагонали
+    кадра. Между соседними кадрами настоящее движение почти равномерно,
+    так что вторая разность показывает дрожание распознавания. Серия с
+    пропуском распознавания получает максимальный рывок missing_run_jitter —
+    редкие срабатывания не должны уходить от штрафа.
+
+    Остальные кадры — отмеченные пользователем, по ним считается доля
+    попаданий в отмеченную рамку (с запасом в половину её размера).
+
+    Returns:
+        {'score', 'detection_rate', 'label_hits', 'jitter'}
+    """
+    options = dict(HSV_AUTOTUNE_SETTINGS, **(options or {}))
+    tracker = ObjectTracker()
+    tracker.update_settings(dict(TRACKING_SETTINGS, **settings))
+    # Серии далеко друг от друга — переносить позицию нельзя
+    tracker.update_settings({'skip_stationary': False})
+    tracker.tracking_enabled = True
+
+    positions = np.full((sequence_count, 2), np.nan)
+    for i in range(sequence_count):
+        position = tracker.process_frame(np.asarray(frames[i]))
+        if position:
+            positions[i] = position[:2]
+    found = ~np.isnan(positions[:, 0])
+    detection_rate = float(found.mean()) if sequence_count else 0.0
+
+    run_length = options["run_length"]
+    max_jitter = options["missing_run_jitter"]
+    diagonal = float(np.hypot(frames.shape[2], frames.shape[1]))
+    run_jitter = []
+    for start in range(0, sequence_count - run_length + 1, run_length):
+        run = positions[start:start + run_length]
+        if not found[start:start + run_length].all():
+            run_jitter.append(max_jitter)
+            continue
+        second = run[2:] - 2 * run[1:-1] + run[:-2]
+        run_jitter.append(min(max_jitter, float(np.median(np.hypot(second[:, 0], second[:, 1]))) / diagonal))
+    jitter = float(np.mean(run_jitter)) if run_jitter else max_jitter
+
+    hits = 0
+    for i, (x, y, w, h) in enumerate(label_boxes):
+        tracker.reset_change_detector()
+        position = tracker.process_frame(np.asarray(frames[sequence_count + i]))
+        if position and x - w / 2 <= position[0] <= x + 1.5 * w \
+                and y - h / 2 <= position[1] <= y + 1.5 * h:
+            hits += 1
+    label_hits = hits / len(label_boxes) if label_boxes else 0.0
+
+    score = (detection_rate + options["label_weight"] * label_hits
+             - options["smoothness_weight"] * jitter)
+    return {'score': score, 'detection_rate': detection_rate, 'label_hits': label_hits, 'jitter': jitter}
+
+
+def cache_frames(video_path: str, cache_path: str, extra_frames: List[np.ndarray],
+                 runs: int = HSV_AUTOTUNE_SETTINGS["sample_runs"],
+                 run_length: int = HSV_AUTOTUNE_SETTINGS["run_length"]) -> int:
+    """
+    Записать в .npy серии соседних кадров видео и затем extra_frames
+
+    runs серий по run_length кадров подряд равномерно разнесены по видео.
+    Процессы перебора открывают файл через np.load(mmap_mode='r'), так что
+    кадры не копируются в каждый процесс и видео декодируется один раз.
+
+    Returns:
+        Число кадров в сериях (кратно run_length; отмеченные кадры идут сразу за ними)
+    """
+    from core.video_processor import VideoProcessor
+
+    video_processor = VideoProcessor()
+    if not video_processor.open_video(video_path):
+        raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+    metadata = video_processor.metadata
+
+    shape = (metadata.height, metadata.width, 3)
+    for frame in extra_frames:
+        if frame.shape != shape:
+            raise ValueError("Отмеченный кадр не совпадает по размеру с кадрами видео")
+    cache = np.lib.format.open_memmap(cache_path, mode='w+', dtype=np.uint8,
+                                      shape=(runs * run_length + len(extra_frames),) + shape)
+    last_start = max(0, metadata.frame_count - run_length)
+    sequence_count = 0
+    try:
+        for run in range(runs):
+            start = int(round(run * last_start / max(1, runs - 1)))
+            if not video_processor.seek(start, preroll=HEADLESS_SETTINGS["keyframe_interval"]):
+                break
+            # Неполная серия (конец видео) в набор не попадает
+            if not all(video_processor.read_sampled_frame_into(cache[sequence_count + i])
+                       for i in range(run_length)):
+                break
+            sequence_count += run_length
+    finally:
+        video_processor.close_video()
+    for i, frame in enumerate(extra_frames):
+        cache[sequence_count + i] = frame
+    cache.flush()
+    del cache
+    return sequence_count
+
+
+def _init_worker(cache_path: str, sequence_count: int, label_boxes: List[Box], workers: int):
+    """Инициализатор процесса перебора: потоки OpenCV и кадры из общего файла"""
+    from utils.runtime_config import configure_runtime, MODE_BATCH_WORKER
+
+    global _worker_frames, _worker_sequence, _worker_labels
+    configure_runtime(MODE_BATCH_WORKER, workers)
+    _worker_frames = np.load(cache_path, mmap_mode='r')
+    _worker_sequence = sequence_count
+    _worker_labels = list(label_boxes)
+
+
+def _score_candidate(settings: Dict, options: Optional[Dict]) -> Dict:
+    """Задача пула: оценка одного набора настроек"""
+    return score_settings(_worker_frames, _worker_sequence, _worker_labels, settings, options)
+
+
+class HsvAutoTuner:
+    """
+    Подбор порогов HSV и параметров маски по нескольким отмеченным кадрам
+
+    1. По гистограммам отмеченных областей предлагаются начальные пороги.
+    2. Серии соседних кадров видео и отмеченные кадры кэшируются в .npy.
+    3. Наборы настроек вокруг начальных порогов оцениваются в пуле процессов
+       (доля распознанных кадров, попадание в отмеченные области, плавность).
+
+    Результат применяется к трекеру через ObjectTracker.update_settings.
+    """
+
+    def __init__(self, workers: Optional[int] = None, options: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.options = dict(HSV_AUTOTUNE_SETTINGS, **(options or {}))
+        self.progress_callback = progress_callback
+
+    def tune(self, video_path: str, samples: List[Tuple[np.ndarray, Box]]) -> Dict:
+        """
+        Подобрать настройки по видео и отмеченным областям
+
+        Args:
+            samples: пары (кадр BGR, рамка объекта (x, y, w, h))
+
+        Returns:
+            {'settings': лучшие настройки, 'score': его оценка, 'proposal':
+            начальные пороги, 'candidates': число наборов, 'ranking': пять лучших}
+        """
+        proposal = propose_bounds(samples, self.options["percentiles"], self.options["margins"])
+        candidates = candidate_settings(proposal, self.options)
+        label_boxes = [tuple(int(v) for v in box) for _, box in samples]
+
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, 'frames.npy')
+            sequence_count = cache_frames(video_path, cache_path, [frame for frame, _ in samples],
+                                          self.options["sample_runs"], self.options["run_length"])
+            context = multiprocessing.get_context(self.options["start_method"])
+            workers = min(self.workers, len(candidates))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(cache_path, sequence_count, label_boxes, workers)) as pool:
+                futures = {pool.submit(_score_candidate, settings, self.options): settings
+                           for settings in candidates}
+                for done, future in enumerate(as_completed(futures), 1):
+                    results.append(dict(future.result(), settings=futures[future]))
+                    if self.progress_callback:
+                        self.progress_callback(done, len(candidates))
+
+        results.sort(key=lambda result: result['score'], reverse=True)
+        best = results[0]
+        return {
+            'settings': best['settings'],
+            'score': best['score'],
+            'detection_rate': best['detection_rate'],
+            'label_hits': best['label_hits'],
+            'proposal': proposal['settings'],
+            'candidates': len(candidates),
+            'sampled_frames': sequence_count,
+            'ranking': results[:5]
+        }
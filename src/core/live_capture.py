@@ -0,0 +1,152 @@
+"""
+Захват живого источника (камера, поток, канал) с отбрасыванием устаревших кадров
+"""
+import threading
+import time
+from collections import deque
+from typing import Optional, Tuple, Union, Dict
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+# Число последних измерений задержки для статистики
+LATENCY_WINDOW = 240
+
+
+def parse_source(source: str) -> Union[int, str]:
+    """Индекс камеры ("0") превращается в int, остальное (URL, путь, канал) — как есть"""
+    source = source.strip()
+    return int(source) if source.isdigit() else source
+
+
+class LatestFrameCapture:
+    """
+    Поток захвата, который всегда хранит только самый свежий кадр
+
+    Кадр, который не успели забрать до прихода следующего, считается
+    пропущенным. Потребитель никогда не отстаёт от реального времени больше
+    чем на один кадр.
+    """
+
+    def __init__(self, source: Union[int, str]):
+        self.source = source
+        self.cap = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+        self._condition = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._capture_time = 0.0
+        self._sequence = 0
+        self._consumed_sequence = 0
+
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.ended = False
+
+    def open(self) -> bool:
+        """Открыть источник и запустить поток захвата"""
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            self.cap = None
+            return False
+        # Просим бэкенд не копить кадры во внутреннем буфере (поддерживается не везде)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def get_fps(self) -> float:
+        """FPS источника по данным бэкенда (0, если неизвестен)"""
+        return float(self.cap.get(cv2.CAP_PROP_FPS)) if self.cap else 0.0
+
+    def get_size(self) -> Tuple[int, int]:
+        """Размер кадра источника (ширина, высота)"""
+        if not self.cap:
+            return 0, 0
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _capture_loop(self):
+        """Непрерывно читать кадры, перезаписывая непрочитанный; при выходе освободить источник"""
+        cap = self.cap
+        try:
+            while self.running:
+                ret, frame = cap.read()
+                capture_time = time.perf_counter()
+                if not ret:
+                    with self._condition:
+                        self.ended = True
+                        self._condition.notify_all()
+                    break
+
+                with self._condition:
+                    if self._sequence > self._consumed_sequence:
+                        self.dropped_frames += 1
+                    self._frame = frame
+                    self._capture_time = capture_time
+                    self._sequence += 1
+                    self.captured_frames += 1
+                    self._condition.notify_all()
+        finally:
+            # Источник освобождает только этот поток: на медленном сетевом потоке
+            # read() может блокироваться дольше, чем release() ждёт завершения
+            cap.release()
+
+    def read(self, timeout: float = 1.0) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Дождаться кадра, которого потребитель ещё не видел
+
+        Returns:
+            (кадр, время захвата по perf_counter) или None по таймауту / концу потока
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._sequence > self._consumed_sequence or self.ended or not self.running,
+                    timeout=timeout):
+                return None
+            if self._sequence <= self._consumed_sequence:
+                return None
+            self._consumed_sequence = self._sequence
+            return self._frame, self._capture_time
+
+    def release(self):
+        """Остановить захват и освободить источник"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.thread:
+            # Если поток ещё ждёт в read(), он освободит источник сам, когда read() вернётся
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.cap = None
+
+
+class LatencyStats:
+    """Скользящая статистика задержки захват → позиция"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float):
+        """Добавить измерение в секундах"""
+        with self._lock:
+            self.samples.append(latency)
+
+    def summary(self) -> Dict:
+        """Средняя и p95 задержка в миллисекундах"""
+        with self._lock:
+            samples = np.array(self.samples)
+        if len(samples) == 0:
+            return {'mean_ms': 0.0, 'p95_ms': 0.0, 'last_ms': 0.0}
+        return {
+            'mean_ms': float(samples.mean() * 1000),
+            'p95_ms': float(np.percentile(samples, 95) * 1000),
+            'last_ms': float(samples[-1] * 1000)
+        }
@@ -1,11 +1,63 @@
 """
 Модуль для трекинга объектов по цвету
 """
-import cv2
 import numpy as np
 from typing import Optional, Tuple, List, Dict
-import json
-import time
+import os
+
+from utils.lazy_import import lazy_import
+from core.trajectory_io import (
+    records_to_columns, columns_to_records, save_json, save_npz, TrajectoryLogWriter, TrajectoryLogReader,
+    FLAG_CARRIED
+)
+from utils.constants import TRAJECTORY_LOG_SETTINGS
+from utils.buffer_pool import BufferPool
+from utils.profiler import get_profiler
+from utils.runtime_config import opencl_enabled, disable_opencl
+
+cv2 = lazy_import("cv2")
+
+# Размер миниатюры области объекта для детектора изменений
+CHANGE_THUMBNAIL_SIZE = (16, 16)
+# Насколько расширять рамку объекта при сравнении (доля от размера)
+CHANGE_BOX_MARGIN = 0.5
+# Ядро морфологических операций
+MORPH_KERNEL_SIZE = (5, 5)
+
+
+def draw_position_marker(frame: np.ndarray, position: Optional[Tuple[float, float, float]]) -> np.ndarray:
+    """Маркер центра объекта с координатами и площадью (рисуется прямо в frame)"""
+    if position is None:
+        return frame
+        
+    # Координаты хранятся с субпиксельной точностью, округляем только для рисования
+    x_exact, y_exact, area = position
+    x, y = int(round(x_exact)), int(round(y_exact))
+    
+    # Рисуем круг в центре объекта
+    cv2.circle(frame, (x, y), 8, (0, 255, 0), -1)
+    cv2.circle(frame, (x, y), 12, (0, 255, 0), 2)
+    
+    # Рисуем крест
+    cv2.line(frame, (x-15, y), (x+15, y), (0, 255, 0), 2)
+    cv2.line(frame, (x, y-15), (x, y+15), (0, 255, 0), 2)
+    
+    # Добавляем информацию
+    info_text = f"({x_exact:.1f}, {y_exact:.1f})"
+    cv2.putText(frame, info_text, (x+20, y-10), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    
+    # Рисуем площадь
+    area_text = f"Area: {area:.0f}"
+    cv2.putText(frame, area_text, (x+20, y+15), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    
+    return frame
+
+
+def frame_to_hsv(frame: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+    """Перевести кадр BGR в HSV (в dst, если буфер передан)"""
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=dst)
 
 
 class ObjectTracker:
@@ -16,6 +68,10 @@ class ObjectTracker:
         self.tracking_data = []
         self.current_position = None
         self.tracking_history = []
+        self.point_count = 0
+        self.trajectory_log: Optional[TrajectoryLogWriter] = None
+        self.trajectory_log_path: Optional[str] = None
+        self.memory_points = TRAJECTORY_LOG_SETTINGS["memory_points"]
         self.settings = {
             'hue_low': 0,
             'hue_high': 180,
@@ -26,58 +82,127 @@ class ObjectTracker:
             'min_area': 100,
             'max_area': 50000,
             'blur_size': 5,
-            'morph_iters': 2
+            'morph_iters': 2,
+            'skip_stationary': False,
+            'change_threshold': 6.0,
+            'max_carried_frames': 150
         }
+        # Детектор изменений: рамка и миниатюра последнего полного распознавания
+        self.last_bbox: Optional[Tuple[int, int, int, int]] = None
+        self.reference_thumbnail: Optional[np.ndarray] = None
+        self.carried_frames = 0
+        self.last_detection_carried = False
+        
+        # Буферы кадра (пересоздаются только при смене разрешения)
+        self.buffers = BufferPool()
+        self.profiler = get_profiler()
+        self.kernel = np.ones(MORPH_KERNEL_SIZE, np.uint8)
+        self._rebuild_bounds()
         
     def update_settings(self, new_settings: Dict):
         """Обновить настройки трекинга"""
         self.settings.update(new_settings)
+        self._rebuild_bounds()
+        # Новые параметры распознавания — прежний эталон больше не годится
+        self.reset_change_detector()
         
-    def process_frame(self, frame: np.ndarray) -> Optional[Tuple[int, int, float]]:
+    def _rebuild_bounds(self):
+        """Пересчитать границы HSV после изменения настроек"""
+        self.lower_bound = np.array([
+            self.settings['hue_low'],
+            self.settings['saturation_low'],
+            self.settings['value_low']
+        ], dtype=np.uint8)
+        self.upper_bound = np.array([
+            self.settings['hue_high'],
+            self.settings['saturation_high'],
+            self.settings['value_high']
+        ], dtype=np.uint8)
+        blur_size = self.settings['blur_size']
+        self.blur_ksize = (blur_size, blur_size) if blur_size > 0 else None
+        
+    def reset_change_detector(self):
+        """Сбросить эталон детектора изменений (следующий кадр обработается полностью)"""
+        self.last_bbox = None
+        self.reference_thumbnail = None
+        self.carried_frames = 0
+        self.last_detection_carried = False
+        
+    def _region_thumbnail(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
+        """Миниатюра в оттенках серого для расширенной рамки объекта"""
+        x, y, w, h = bbox
+        margin_x = int(w * CHANGE_BOX_MARGIN) + 1
+        margin_y = int(h * CHANGE_BOX_MARGIN) + 1
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        
+        # Сначала уменьшаем, потом переводим в серый — так дешевле
+        width, height = CHANGE_THUMBNAIL_SIZE
+        thumbnail = cv2.resize(frame[y0:y1, x0:x1], CHANGE_THUMBNAIL_SIZE,
+                               dst=self.buffers.get('thumbnail_bgr', (height, width, 3)),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY,
+                            dst=self.buffers.get('thumbnail_gray', (height, width)))
+        
+    def _scene_unchanged(self, frame: np.ndarray) -> bool:
+        """Проверить, что область объекта не изменилась с последнего распознавания"""
+        if (not self.settings['skip_stationary'] or self.current_position is None
+                or self.reference_thumbnail is None):
+            return False
+        # Периодически распознаём полностью, чтобы не копить ошибку
+        if self.carried_frames >= self.settings['max_carried_frames']:
+            return False
+        
+        thumbnail = self._region_thumbnail(frame, self.last_bbox)
+        if thumbnail is None:
+            return False
+        difference = cv2.absdiff(thumbnail, self.reference_thumbnail,
+                                 dst=self.buffers.get('thumbnail_diff', thumbnail.shape))
+        return cv2.mean(difference)[0] < self.settings['change_threshold']
+        
+    def process_frame(self, frame: np.ndarray,
+                      hsv: Optional[np.ndarray] = None) -> Optional[Tuple[float, float, float]]:
         """
         Обработать кадр и найти объект
         
+        Args:
+            frame: кадр BGR
+            hsv: тот же кадр, уже переведённый в HSV (frame_to_hsv) — когда
+                один кадр обрабатывают несколько трекеров, перевод делается один раз
+        
         Returns:
-            Tuple (x, y, area) или None если объект не найден
+            Tuple (x, y, area) с субпиксельными координатами или None если объект не найден
         """
         if not self.tracking_enabled:
             return None
             
         try:
-            # Конвертируем в HSV
-            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            profiler = self.profiler
             
-            # Создаем маску по заданному диапазону
-            lower_bound = np.array([
-                self.settings['hue_low'],
-                self.settings['saturation_low'], 
-                self.settings['value_low']
-            ])
-            upper_bound = np.array([
-                self.settings['hue_high'],
-                self.settings['saturation_high'],
-                self.settings['value_high']
-            ])
+            # Сцена вокруг объекта не изменилась — переносим прошлое распознавание
+            with profiler.stage('tracker.change_detect'):
+                unchanged = self._scene_unchanged(frame)
+            if unchanged:
+                self.carried_frames += 1
+                self.last_detection_carried = True
+                return self.current_position
+            self.last_detection_carried = False
+            self.carried_frames = 0
             
-            mask = cv2.inRange(hsv, lower_bound, upper_bound)
-            
-            # Морфологические операции для улучшения маски
-            kernel = np.ones((5, 5), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, 
-                                  iterations=self.settings['morph_iters'])
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, 
-                                  iterations=self.settings['morph_iters'])
-            
-            # Размытие для сглаживания
-            if self.settings['blur_size'] > 0:
-                mask = cv2.GaussianBlur(mask, (self.settings['blur_size'], 
-                                             self.settings['blur_size']), 0)
+            mask = self._build_mask_umat(frame) if hsv is None and opencl_enabled() else None
+            if mask is None:
+                mask = self._build_mask(frame, hsv)
             
             # Находим контуры
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, 
-                                         cv2.CHAIN_APPROX_SIMPLE)
+            with profiler.stage('tracker.findContours'):
+                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, 
+                                             cv2.CHAIN_APPROX_SIMPLE)
             
             if not contours:
+                self.reset_change_detector()
                 return None
                 
             # Находим самый большой контур
@@ -87,91 +212,266 @@ class ObjectTracker:
             # Проверяем площадь
             if (area < self.settings['min_area'] or 
                 area > self.settings['max_area']):
+                self.reset_change_detector()
                 return None
                 
-            # Вычисляем центр масс
-            M = cv2.moments(largest_contour)
-            if M["m00"] == 0:
+            # Вычисляем центр масс (взвешенный по маске внутри рамки объекта)
+            bbox = cv2.boundingRect(largest_contour)
+            with profiler.stage('tracker.centroid'):
+                centroid = self._blob_centroid(mask, largest_contour, bbox)
+            if centroid is None:
+                self.reset_change_detector()
                 return None
                 
-            x = int(M["m10"] / M["m00"])
-            y = int(M["m01"] / M["m00"])
-            
+            x, y = centroid
             self.current_position = (x, y, area)
+            if self.settings['skip_stationary']:
+                self.last_bbox = bbox
+                thumbnail = self._region_thumbnail(frame, self.last_bbox)
+                if thumbnail is None:
+                    self.reference_thumbnail = None
+                else:
+                    # Миниатюра живёт в общем буфере — эталон храним отдельно
+                    if self.reference_thumbnail is None:
+                        self.reference_thumbnail = thumbnail.copy()
+                    else:
+                        np.copyto(self.reference_thumbnail, thumbnail)
             return self.current_position
             
         except Exception as e:
             print(f"Ошибка обработки кадра: {e}")
             return None
     
-    def draw_tracking_info(self, frame: np.ndarray, position: Tuple[int, int, float]) -> np.ndarray:
-        """Нарисовать информацию о трекинге на кадре"""
-        if position is None:
-            return frame
-            
-        x, y, area = position
+    def _blob_centroid(self, mask: np.ndarray, contour: np.ndarray,
+                       bbox: Tuple[int, int, int, int]) -> Optional[Tuple[float, float]]:
+        """
+        Субпиксельный центр объекта по моментам маски в рамке объекта
         
-        # Рисуем круг в центре объекта
-        cv2.circle(frame, (x, y), 8, (0, 255, 0), -1)
-        cv2.circle(frame, (x, y), 12, (0, 255, 0), 2)
+        Значения маски служат весами (после размытия края получают
+        промежуточные веса), а залитый контур отсекает соседние пятна,
+        попавшие в ту же рамку. Считается только по небольшой области,
+        буферы берутся из общего пула трекера.
+        """
+        x, y, w, h = bbox
+        height, width = mask.shape[:2]
+        fill = self.buffers.get('blob_fill', (height, width))[:h, :w]
+        weights = self.buffers.get('blob_weights', (height, width))[:h, :w]
         
-        # Рисуем крест
-        cv2.line(frame, (x-15, y), (x+15, y), (0, 255, 0), 2)
-        cv2.line(frame, (x, y-15), (x, y+15), (0, 255, 0), 2)
+        fill.fill(0)
+        cv2.drawContours(fill, [contour], -1, 255, -1, offset=(-x, -y))
+        cv2.bitwise_and(mask[y:y + h, x:x + w], fill, dst=weights)
         
-        # Добавляем информацию
-        info_text = f"({x}, {y})"
-        cv2.putText(frame, info_text, (x+20, y-10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        M = cv2.moments(weights)
+        if M["m00"] == 0:
+            return None
+        return x + M["m10"] / M["m00"], y + M["m01"] / M["m00"]
+    
+    def _build_mask(self, frame: np.ndarray, hsv: Optional[np.ndarray] = None) -> np.ndarray:
+        """Маска объекта на CPU; промежуточные изображения пишутся в буферы трекера"""
+        profiler = self.profiler
+        height, width = frame.shape[:2]
+        mask = self.buffers.get('mask', (height, width))
+        spare = self.buffers.get('mask_spare', (height, width))
         
-        # Рисуем площадь
-        area_text = f"Area: {area:.0f}"
-        cv2.putText(frame, area_text, (x+20, y+15), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        # Конвертируем в HSV (если кадр не переведён заранее)
+        if hsv is None:
+            with profiler.stage('tracker.cvtColor'):
+                hsv = frame_to_hsv(frame, self.buffers.get('hsv', (height, width, 3)))
         
-        return frame
+        # Создаем маску по заданному диапазону
+        with profiler.stage('tracker.inRange'):
+            cv2.inRange(hsv, self.lower_bound, self.upper_bound, dst=mask)
+        
+        # Морфологические операции для улучшения маски (попеременно между двумя буферами)
+        with profiler.stage('tracker.morphology'):
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=spare,
+                             iterations=self.settings['morph_iters'])
+            cv2.morphologyEx(spare, cv2.MORPH_CLOSE, self.kernel, dst=mask,
+                             iterations=self.settings['morph_iters'])
+        
+        # Размытие для сглаживания
+        if self.blur_ksize:
+            with profiler.stage('tracker.blur'):
+                cv2.GaussianBlur(mask, self.blur_ksize, 0, dst=spare)
+            mask = spare
+        return mask
+    
+    def _build_mask_umat(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Маска объекта через прозрачный API UMat (OpenCL)
+        
+        При любой ошибке OpenCL выключается для всего процесса, и кадр
+        обрабатывается на CPU (возвращается None).
+        """
+        profiler = self.profiler
+        try:
+            with profiler.stage('tracker.umat_upload'):
+                source = cv2.UMat(frame)
+            with profiler.stage('tracker.cvtColor'):
+                hsv = cv2.cvtColor(source, cv2.COLOR_BGR2HSV)
+            with profiler.stage('tracker.inRange'):
+                mask = cv2.inRange(hsv, self.lower_bound, self.upper_bound)
+            with profiler.stage('tracker.morphology'):
+                mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel,
+                                        iterations=self.settings['morph_iters'])
+                mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel,
+                                        iterations=self.settings['morph_iters'])
+            if self.blur_ksize:
+                with profiler.stage('tracker.blur'):
+                    mask = cv2.GaussianBlur(mask, self.blur_ksize, 0)
+            
+            # Контуры ищутся на CPU — забираем маску из памяти устройства
+            with profiler.stage('tracker.umat_download'):
+                return mask.get()
+        except Exception as e:
+            print(f"Ошибка OpenCL, обработка переключена на CPU: {e}")
+            disable_opencl()
+            return None
+    
+    def draw_tracking_info(self, frame: np.ndarray, position: Tuple[float, float, float]) -> np.ndarray:
+        """Нарисовать информацию о трекинге на кадре"""
+        return draw_position_marker(frame, position)
     
-    def start_tracking(self):
-        """Начать трекинг"""
+    def get_state(self) -> Dict:
+        """Состояние трекера для сохранения в контрольной точке"""
+        return {
+            'settings': dict(self.settings),
+            'current_position': list(self.current_position) if self.current_position else None,
+            'tracking_enabled': self.tracking_enabled,
+            'change_detector': {
+                'bbox': list(self.last_bbox) if self.last_bbox else None,
+                'thumbnail': (self.reference_thumbnail.tolist()
+                              if self.reference_thumbnail is not None else None),
+                'carried_frames': self.carried_frames
+            }
+        }
+        
+    def set_state(self, state: Dict):
+        """Восстановить состояние трекера из контрольной точки"""
+        self.update_settings(state.get('settings', {}))
+        position = state.get('current_position')
+        self.current_position = tuple(position) if position else None
+        self.tracking_enabled = state.get('tracking_enabled', self.tracking_enabled)
+        
+        detector = state.get('change_detector') or {}
+        if detector.get('bbox') and detector.get('thumbnail') is not None:
+            self.last_bbox = tuple(detector['bbox'])
+            self.reference_thumbnail = np.array(detector['thumbnail'], dtype=np.uint8)
+            self.carried_frames = detector.get('carried_frames', 0)
+        
+    def start_tracking(self, log_path: Optional[str] = None, resume: bool = False):
+        """
+        Начать трекинг
+        
+        Если указан log_path, точки по мере поступления пишутся в журнал
+        траектории на диске, а в памяти остаются только последние memory_points.
+        С resume=True запись продолжается в существующий журнал (после сбоя).
+        """
+        self.close_trajectory_log()
         self.tracking_enabled = True
         self.tracking_data = []
         self.tracking_history = []
+        self.point_count = 0
+        self.trajectory_log_path = None
+        if not resume:
+            self.reset_change_detector()
+        
+        if log_path:
+            try:
+                self.trajectory_log = TrajectoryLogWriter(
+                    log_path,
+                    settings=self.settings,
+                    chunk_size=TRAJECTORY_LOG_SETTINGS["chunk_size"],
+                    fsync_every=TRAJECTORY_LOG_SETTINGS["fsync_every"],
+                    fsync_interval=TRAJECTORY_LOG_SETTINGS["fsync_interval"],
+                    resume=resume
+                )
+            except Exception as e:
+                print(f"Ошибка открытия журнала траектории: {e}")
+                return
+            self.trajectory_log_path = log_path
+            self.point_count = self.trajectory_log.record_count
+            
+            if self.point_count:
+                # Восстанавливаем хвост истории из журнала
+                tail = TrajectoryLogReader(log_path).read_columns(
+                    max(0, self.point_count - self.memory_points))
+                self.tracking_data = columns_to_records(tail)
+                self.tracking_history = list(zip(tail['x'].tolist(), tail['y'].tolist()))
         
     def stop_tracking(self):
         """Остановить трекинг"""
         self.tracking_enabled = False
+        self.close_trajectory_log()
         
-    def add_tracking_point(self, position: Tuple[int, int, float], timestamp: float):
-        """Добавить точку трекинга в историю"""
+    def close_trajectory_log(self):
+        """Закрыть журнал траектории (файл остаётся доступным для чтения)"""
+        if self.trajectory_log:
+            self.trajectory_log.close()
+            self.trajectory_log = None
+        
+    def add_tracking_point(self, position: Tuple[float, float, float], timestamp: float,
+                           frame_num: int = -1):
+        """Добавить точку трекинга в историю (с флагом переноса, если кадр не распознавался)"""
         if position:
             x, y, area = position
+            flags = FLAG_CARRIED if self.last_detection_carried else 0
             self.tracking_data.append({
                 'timestamp': timestamp,
                 'x': x,
                 'y': y,
-                'area': area
+                'area': area,
+                'frame': frame_num,
+                'flags': flags
             })
             self.tracking_history.append((x, y))
+            self.point_count += 1
+            
+            if self.trajectory_log:
+                self.trajectory_log.append(frame_num, timestamp, x, y, area, flags)
+                # Полные данные на диске, в памяти держим только хвост
+                if len(self.tracking_data) > 2 * self.memory_points:
+                    del self.tracking_data[:-self.memory_points]
+                    del self.tracking_history[:-self.memory_points]
     
     def get_tracking_data(self) -> List[Dict]:
-        """Получить все данные трекинга"""
+        """Получить данные трекинга, находящиеся в памяти"""
         return self.tracking_data.copy()
     
+    def get_recent_points(self, count: int) -> List[Dict]:
+        """Получить последние count точек без копирования всей истории"""
+        return self.tracking_data[-count:]
+    
+    def get_point_count(self) -> int:
+        """Общее количество точек трекинга (включая записанные на диск)"""
+        return self.point_count
+    
+    def get_tracking_columns(self) -> Dict[str, np.ndarray]:
+        """Получить все данные трекинга в виде колонок numpy"""
+        if self.trajectory_log_path:
+            if self.trajectory_log:
+                self.trajectory_log.flush()
+            return TrajectoryLogReader(self.trajectory_log_path).read_columns()
+        return records_to_columns(self.tracking_data)
+    
     def clear_tracking_data(self):
         """Очистить данные трекинга"""
+        self.close_trajectory_log()
+        self.trajectory_log_path = None
         self.tracking_data = []
         self.tracking_history = []
+        self.point_count = 0
         self.current_position = None
+        self.reset_change_detector()
     
     def export_data(self, filename: str) -> bool:
-        """Экспортировать данные в JSON файл"""
+        """Экспортировать данные в файл (JSON или колоночный NPZ — по расширению)"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'settings': self.settings,
-                    'tracking_data': self.tracking_data,
-                    'timestamp': time.time()
-                }, f, indent=2, ensure_ascii=False)
+            columns = self.get_tracking_columns()
+            if os.path.splitext(filename)[1].lower() == '.npz':
+                save_npz(filename, columns, self.settings)
+            else:
+                save_json(filename, columns, self.settings)
             return True
         except Exception as e:
             print(f"Ошибка экспорта: {e}")
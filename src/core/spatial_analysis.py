@@ -0,0 +1,166 @@
+"""
+Пространственный анализ траектории: карта времени пребывания и зоны
+"""
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from utils.constants import SPATIAL_SETTINGS
+
+cv2 = lazy_import("cv2")
+
+# Дробные биты координат вершин для cv2.fillPoly (субпиксельные границы зон)
+POLYGON_SHIFT = 4
+
+
+class Zone:
+    """Именованная многоугольная зона в координатах траектории (пиксели или метры)"""
+
+    def __init__(self, name: str, polygon: Sequence[Sequence[float]]):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(self.polygon) < 3:
+            raise ValueError(f"Зона '{name}': нужно не менее 3 вершин")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Zone':
+        return cls(data['name'], data['polygon'])
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'polygon': self.polygon.tolist()}
+
+
+def load_zones(filename: str) -> List[Zone]:
+    """Загрузить зоны из JSON: список {"name": ..., "polygon": [[x, y], ...]}"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [Zone.from_dict(item) for item in data.get('zones', data)]
+
+
+def save_zones(filename: str, zones: List[Zone]):
+    """Сохранить зоны в JSON"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({'zones': [zone.to_dict() for zone in zones]}, f, ensure_ascii=False, indent=2)
+
+
+def dwell_times(timestamps: np.ndarray,
+                max_gap: float = SPATIAL_SETTINGS["max_gap_seconds"]) -> np.ndarray:
+    """
+    Время, приписываемое каждой точке: интервал до следующей точки
+
+    Интервалы длиннее max_gap (объект терялся) не засчитываются, последняя
+    точка получает 0.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    dwell = np.zeros(len(timestamps))
+    if len(timestamps) > 1:
+        dt = np.diff(timestamps)
+        dwell[:-1] = np.where((dt > 0) & (dt <= max_gap), dt, 0.0)
+    return dwell
+
+
+def dwell_heatmap(columns: Dict[str, np.ndarray], bins: int = SPATIAL_SETTINGS["heatmap_bins"],
+                  extent: Optional[Tuple[float, float, float, float]] = None,
+                  max_gap: float = SPATIAL_SETTINGS["max_gap_seconds"]) -> Dict:
+    """
+    Карта времени пребывания одним вызовом np.histogram2d
+
+    Args:
+        extent: (x_min, x_max, y_min, y_max); по умолчанию — рамка траектории
+
+    Returns:
+        {'heatmap': секунды [bins_x, bins_y], 'x_edges', 'y_edges'}
+    """
+    x = np.asarray(columns['x'], dtype=np.float64)
+    y = np.asarray(columns['y'], dtype=np.float64)
+    if extent is None and len(x):
+        extent = (float(x.min()), float(x.max()), float(y.min()), float(y.max()))
+    if extent is None:
+        extent = (0.0, 1.0, 0.0, 1.0)
+    x_min, x_max, y_min, y_max = extent
+    # Вырожденная рамка (объект стоял на месте) — расширяем, иначе histogram2d падает
+    if x_max <= x_min:
+        x_min, x_max = x_min - 0.5, x_min + 0.5
+    if y_max <= y_min:
+        y_min, y_max = y_min - 0.5, y_min + 0.5
+
+    heatmap, x_edges, y_edges = np.histogram2d(
+        x, y, bins=bins, range=[[x_min, x_max], [y_min, y_max]],
+        weights=dwell_times(columns['timestamp'], max_gap)
+    )
+    return {'heatmap': heatmap, 'x_edges': x_edges, 'y_edges': y_edges}
+
+
+class ZoneMap:
+    """
+    Растровая карта зон для поиска зоны точки индексированием массива
+
+    Многоугольники один раз заливаются cv2.fillPoly в сетку меток
+    (0 — вне зон, i + 1 — зона i), после чего зона каждой точки — это
+    просто labels[row, col] для всех точек сразу. При пересечении зон
+    точка относится к зоне, указанной в списке позже.
+    """
+
+    def __init__(self, zones: List[Zone],
+                 resolution: int = SPATIAL_SETTINGS["zone_grid_resolution"]):
+        if len(zones) >= np.iinfo(np.uint16).max:
+            raise ValueError("Слишком много зон")
+        self.zones = zones
+        points = np.vstack([zone.polygon for zone in zones])
+        self.origin = points.min(axis=0)
+        span = points.max(axis=0) - self.origin
+        self.cell_size = max(float(span.max()) / resolution, 1e-9)
+
+        width, height = (np.ceil(span / self.cell_size).astype(int) + 1)
+        self.labels = np.zeros((height, width), dtype=np.uint16)
+        scale = 1 << POLYGON_SHIFT
+        for index, zone in enumerate(zones):
+            grid = np.round((zone.polygon - self.origin) / self.cell_size * scale).astype(np.int32)
+            cv2.fillPoly(self.labels, [grid], index + 1, shift=POLYGON_SHIFT)
+
+    def lookup(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Номер зоны (i + 1) для каждой точки, 0 — вне зон"""
+        col = np.floor((np.asarray(x, dtype=np.float64) - self.origin[0]) / self.cell_size + 0.5)
+        row = np.floor((np.asarray(y, dtype=np.float64) - self.origin[1]) / self.cell_size + 0.5)
+        height, width = self.labels.shape
+        inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+
+        result = np.zeros(len(col), dtype=np.uint16)
+        result[inside] = self.labels[row[inside].astype(np.intp), col[inside].astype(np.intp)]
+        return result
+
+
+def zone_occupancy(columns: Dict[str, np.ndarray], zones: List[Zone],
+                   max_gap: float = SPATIAL_SETTINGS["max_gap_seconds"],
+                   zone_map: Optional[ZoneMap] = None) -> List[Dict]:
+    """
+    Время в зонах, доля времени, число точек, входы и выходы
+
+    Вход — переход точки траектории из-за пределов зоны внутрь,
+    выход — обратно; всё считается через bincount без цикла по точкам.
+    """
+    if not zones:
+        return []
+    zone_map = zone_map or ZoneMap(zones)
+    labels = zone_map.lookup(columns['x'], columns['y']).astype(np.intp)
+    count = len(zones) + 1
+
+    dwell = dwell_times(columns['timestamp'], max_gap)
+    time_in = np.bincount(labels, weights=dwell, minlength=count)
+    points_in = np.bincount(labels, minlength=count)
+
+    changed = np.flatnonzero(labels[1:] != labels[:-1])
+    entries = np.bincount(labels[1:][changed], minlength=count)
+    exits = np.bincount(labels[:-1][changed], minlength=count)
+    total_time = float(dwell.sum())
+
+    return [{
+        'zone': zone.name,
+        'time': float(time_in[i + 1]),
+        'share': float(time_in[i + 1] / total_time) if total_time > 0 else 0.0,
+        'points': int(points_in[i + 1]),
+        'entries': int(entries[i + 1]),
+        'exits': int(exits[i + 1])
+    } for i, zone in enumerate(zones)]
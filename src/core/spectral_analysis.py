@@ -0,0 +1,146 @@
+"""
+Частотный анализ движения: спектры, доминирующая частота, спектрограмма
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from utils.constants import SPECTRAL_SETTINGS
+
+signal = lazy_import("scipy.signal")
+
+METHOD_WELCH = 'welch'
+METHOD_FFT = 'fft'
+
+# Каналы, для которых считаются спектры
+CHANNELS = ('x', 'y', 'speed')
+
+
+def resample_uniform(timestamps: np.ndarray, columns: Dict[str, np.ndarray],
+                     rate: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray], float]:
+    """
+    Перенести колонки на равномерную сетку времени (np.interp, без цикла по точкам)
+
+    Args:
+        rate: частота сетки, Гц; по умолчанию — по медианному интервалу
+
+    Returns:
+        (сетка времени, колонки на сетке, частота)
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if rate is None:
+        dt = np.diff(timestamps)
+        dt = dt[dt > 0]
+        rate = 1.0 / float(np.median(dt)) if len(dt) else 1.0
+    count = int(np.floor((timestamps[-1] - timestamps[0]) * rate + 1e-9)) + 1
+    grid = timestamps[0] + np.arange(count) / rate
+    # np.interp требует возрастающих меток: повторы и шаги назад убираем
+    # (сравнение с накопленным максимумом, а не только с предыдущей точкой)
+    keep = np.ones(len(timestamps), dtype=bool)
+    keep[1:] = timestamps[1:] > np.maximum.accumulate(timestamps)[:-1]
+    resampled = {name: np.interp(grid, timestamps[keep], np.asarray(values, dtype=np.float64)[keep])
+                 for name, values in columns.items()}
+    return grid, resampled, rate
+
+
+def _segment_length(count: int, rate: float, seconds: float) -> int:
+    """Длина сегмента Уэлча/спектрограммы в отсчётах (не длиннее сигнала)"""
+    return int(max(8, min(count, round(seconds * rate))))
+
+
+def power_spectrum(values: np.ndarray, rate: float, method: str = SPECTRAL_SETTINGS["method"],
+                   segment_seconds: float = SPECTRAL_SETTINGS["segment_seconds"]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Спектральная плотность мощности сигнала на равномерной сетке
+
+    welch — усреднение по перекрывающимся сегментам (меньше шум оценки),
+    fft — один периодограммный спектр по всему сигналу с окном Ханна
+    (лучше разрешение по частоте). Среднее значение вычитается.
+
+    Returns:
+        (частоты, мощность)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == METHOD_WELCH:
+        nperseg = _segment_length(len(values), rate, segment_seconds)
+        return signal.welch(values, fs=rate, nperseg=nperseg,
+                            noverlap=int(nperseg * SPECTRAL_SETTINGS["overlap"]), detrend='constant')
+    if method == METHOD_FFT:
+        window = np.hanning(len(values))
+        spectrum = np.fft.rfft((values - values.mean()) * window)
+        power = np.abs(spectrum) ** 2 / (rate * np.sum(window ** 2))
+        power[1:-1] *= 2   # односторонний спектр
+        return np.fft.rfftfreq(len(values), 1.0 / rate), power
+    raise ValueError(f"Неизвестный метод спектра: {method}")
+
+
+def dominant_frequency(freqs: np.ndarray, power: np.ndarray,
+                       min_frequency: float = SPECTRAL_SETTINGS["min_frequency"]) -> Tuple[float, float]:
+    """
+    Частота максимума спектра (без постоянной составляющей)
+
+    Положение пика уточняется параболой по трём соседним отсчётам, так что
+    частота не ограничена шагом сетки частот.
+
+    Returns:
+        (частота, Гц; мощность в пике)
+    """
+    candidates = np.flatnonzero(freqs >= max(min_frequency, freqs[1] if len(freqs) > 1 else 0))
+    if len(candidates) == 0:
+        return 0.0, 0.0
+    peak = candidates[np.argmax(power[candidates])]
+    frequency = float(freqs[peak])
+    if 0 < peak < len(power) - 1:
+        left, center, right = power[peak - 1], power[peak], power[peak + 1]
+        denominator = left - 2 * center + right
+        if denominator != 0:
+            frequency += 0.5 * (left - right) / denominator * float(freqs[1] - freqs[0])
+    return frequency, float(power[peak])
+
+
+def spectrogram(values: np.ndarray, rate: float,
+                segment_seconds: float = SPECTRAL_SETTINGS["spectrogram_seconds"]) -> Dict[str, np.ndarray]:
+    """Скользящий спектр: {'freqs', 'times', 'power' [частоты, окна]}"""
+    values = np.asarray(values, dtype=np.float64)
+    nperseg = _segment_length(len(values), rate, segment_seconds)
+    freqs, times, power = signal.spectrogram(values, fs=rate, nperseg=nperseg,
+                                             noverlap=int(nperseg * SPECTRAL_SETTINGS["overlap"]),
+                                             detrend='constant')
+    return {'freqs': freqs, 'times': times, 'power': power}
+
+
+def analyze_spectrum(columns: Dict[str, np.ndarray], method: str = SPECTRAL_SETTINGS["method"],
+                     spectrogram_channel: str = 'speed') -> Dict:
+    """
+    Спектры x, y и модуля скорости, доминирующие частоты и спектрограмма
+
+    Скорость считается центральными разностями уже на равномерной сетке.
+    """
+    timestamps = np.asarray(columns['timestamp'], dtype=np.float64)
+    if len(timestamps) < 8 or timestamps[-1] <= timestamps[0]:
+        return {}
+
+    grid, uniform, rate = resample_uniform(timestamps, {'x': columns['x'], 'y': columns['y']})
+    if len(grid) < 8:
+        return {}
+    uniform['speed'] = np.hypot(np.gradient(uniform['x'], 1.0 / rate),
+                                np.gradient(uniform['y'], 1.0 / rate))
+
+    results = {'rate': rate, 'method': method, 'samples': len(grid), 'channels': {}}
+    for name in CHANNELS:
+        freqs, power = power_spectrum(uniform[name], rate, method)
+        frequency, peak_power = dominant_frequency(freqs, power)
+        results['channels'][name] = {
+            'freqs': freqs,
+            'power': power,
+            'dominant_frequency': frequency,
+            'dominant_period': 1.0 / frequency if frequency > 0 else 0.0,
+            'dominant_power': peak_power
+        }
+
+    sliding = spectrogram(uniform[spectrogram_channel], rate)
+    sliding['times'] = sliding['times'] + grid[0]
+    sliding['channel'] = spectrogram_channel
+    results['spectrogram'] = sliding
+    return results
@@ -0,0 +1,199 @@
+"""
+Сравнение настроек трекинга за одно декодирование видео
+"""
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.video_processor import VideoProcessor
+from core.frame_sampler import FrameSampler
+from core.object_tracker import ObjectTracker, frame_to_hsv
+from core.trajectory_io import LOG_EXTENSION
+from utils.buffer_pool import BufferPool
+from utils.constants import TRACKING_SETTINGS
+
+
+class TrackerFanout:
+    """
+    Несколько трекеров с разными настройками на одном потоке кадров
+
+    Каждый кадр декодируется один раз и один раз переводится в HSV; затем
+    кадр и HSV раздаются всем трекерам (ObjectTracker.process_frame(frame, hsv)).
+    У каждого трекера своя траектория — в памяти или в журнале
+    <output_dir>/<имя>.traj.
+
+    Все трекеры должны видеть одни и те же кадры, поэтому адаптивная
+    выборка здесь сводится к постоянному шагу.
+    """
+
+    def __init__(self, configs: Dict[str, Dict], sampling: Optional[Dict] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        if len(configs) < 2:
+            raise ValueError("Для сравнения нужно не меньше двух наборов настроек")
+        self.video_processor = VideoProcessor()
+        self.video_processor.set_sampler(FrameSampler(**dict(sampling or {}, adaptive=False)))
+        self.trackers: Dict[str, ObjectTracker] = {}
+        for name, settings in configs.items():
+            tracker = ObjectTracker()
+            tracker.update_settings(dict(TRACKING_SETTINGS, **settings))
+            self.trackers[name] = tracker
+        self.buffers = BufferPool()
+        self.progress_callback = progress_callback
+        self.cancelled = False
+        self.sampled_frames = 0
+
+    def cancel(self):
+        """Прервать обработку"""
+        self.cancelled = True
+
+    def run(self, video_path: str, output_dir: Optional[str] = None) -> Dict:
+        """
+        Обработать видео всеми трекерами за один проход
+
+        Returns:
+            Сводка: общие данные прогона, точки и доля распознанных кадров
+            по каждому набору настроек и сравнение с первым набором
+        """
+        video_processor = self.video_processor
+        if not video_processor.open_video(video_path):
+            raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+        metadata = video_processor.metadata
+        fps = metadata.fps if metadata.fps > 0 else 30.0
+
+        log_paths = {}
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            log_paths = {name: os.path.join(output_dir, name + LOG_EXTENSION) for name in self.trackers}
+        for name, tracker in self.trackers.items():
+            tracker.start_tracking(log_path=log_paths.get(name))
+
+        start_time = time.time()
+        self.sampled_frames = 0
+        try:
+            while not self.cancelled:
+                with video_processor.profiler.stage('decode'):
+                    frame = video_processor.read_sampled_frame()
+                if frame is None:
+                    break
+                self.sampled_frames += 1
+                frame_num = video_processor.frame_index - 1
+
+                hsv = frame_to_hsv(frame, self.buffers.get('hsv', frame.shape))
+                for tracker in self.trackers.values():
+                    position = tracker.process_frame(frame, hsv)
+                    if position:
+                        tracker.add_tracking_point(position, frame_num / fps, frame_num)
+
+                if self.progress_callback:
+                    self.progress_callback(frame_num + 1, metadata.frame_count)
+        finally:
+            for tracker in self.trackers.values():
+                tracker.stop_tracking()
+            video_processor.close_video()
+
+        columns = {name: self.columns(name) for name in self.trackers}
+        configs = {}
+        for name, tracker in self.trackers.items():
+            configs[name] = {
+                'points': tracker.get_point_count(),
+                'detection_rate': detection_rate(columns[name], self.sampled_frames),
+                'settings': dict(tracker.settings)
+            }
+            if name in log_paths:
+                configs[name]['log_path'] = os.path.abspath(log_paths[name])
+
+        return {
+            'video': os.path.abspath(video_path),
+            'completed': not self.cancelled,
+            'sampled_frames': self.sampled_frames,
+            'fps': fps,
+            'frame_size': [metadata.width, metadata.height],
+            'elapsed': time.time() - start_time,
+            'configs': configs,
+            'comparison': compare_configs(columns, self.sampled_frames)
+        }
+
+    def columns(self, name: str) -> Dict[str, np.ndarray]:
+        """Траектория трекера name в виде колонок"""
+        return self.trackers[name].get_tracking_columns()
+
+
+def detection_rate(columns: Dict[str, np.ndarray], sampled_frames: int) -> float:
+    """Доля обработанных кадров, на которых объект найден"""
+    if sampled_frames <= 0:
+        return 0.0
+    return len(np.unique(columns['frame'])) / sampled_frames
+
+
+def compare_trajectories(reference: Dict[str, np.ndarray], candidate: Dict[str, np.ndarray],
+                         sampled_frames: int) -> Dict:
+    """
+    Расхождение двух траекторий одного видео по общим кадрам
+
+    Returns:
+        Число общих кадров и кадров только у одной из траекторий, разница
+        доли распознанных кадров и расстояния между позициями (px)
+    """
+    _, ref_index, cand_index = np.intersect1d(reference['frame'], candidate['frame'],
+                                              assume_unique=True, return_indices=True)
+    common = len(ref_index)
+    result = {
+        'common_frames': common,
+        'only_reference': len(reference['frame']) - common,
+        'only_candidate': len(candidate['frame']) - common,
+        'detection_rate_delta': (detection_rate(candidate, sampled_frames)
+                                 - detection_rate(reference, sampled_frames))
+    }
+    if common:
+        distance = np.hypot(candidate['x'][cand_index] - reference['x'][ref_index],
+                            candidate['y'][cand_index] - reference['y'][ref_index])
+        ref_area = reference['area'][ref_index]
+        area_ratio = candidate['area'][cand_index][ref_area > 0] / ref_area[ref_area > 0]
+        result.update({
+            'distance_mean': float(distance.mean()),
+            'distance_median': float(np.median(distance)),
+            'distance_p95': float(np.percentile(distance, 95)),
+            'distance_max': float(distance.max()),
+            'area_ratio_median': float(np.median(area_ratio)) if len(area_ratio) else 0.0
+        })
+    return result
+
+
+def compare_configs(columns: Dict[str, Dict[str, np.ndarray]], sampled_frames: int,
+                    reference: Optional[str] = None) -> Dict[str, Dict]:
+    """Сравнить каждую траекторию с опорной (по умолчанию — с первой)"""
+    names = list(columns)
+    reference = reference or names[0]
+    return {name: compare_trajectories(columns[reference], columns[name], sampled_frames)
+            for name in names if name != reference}
+
+
+def side_by_side(columns: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """
+    Позиции всех траекторий по кадрам в одной таблице
+
+    Строки — объединение кадров всех траекторий; где объект не найден,
+    стоит NaN. Колонки: frame, timestamp, <имя>_x, <имя>_y, <имя>_area.
+    """
+    frames = np.unique(np.concatenate([np.asarray(c['frame'], dtype=np.int64)
+                                       for c in columns.values()]))
+    table = {'frame': frames, 'timestamp': np.full(len(frames), np.nan)}
+    for name, trajectory in columns.items():
+        rows = np.searchsorted(frames, trajectory['frame'])
+        table['timestamp'][rows] = trajectory['timestamp']
+        for column in ('x', 'y', 'area'):
+            values = np.full(len(frames), np.nan)
+            values[rows] = trajectory[column]
+            table[f'{name}_{column}'] = values
+    return table
+
+
+def config_names(paths: List[str]) -> List[str]:
+    """Имена наборов настроек по именам файлов (с номером при совпадении)"""
+    names = []
+    for i, path in enumerate(paths):
+        name = os.path.splitext(os.path.basename(path))[0]
+        names.append(name if name not in names else f"{name}_{i + 1}")
+    return names
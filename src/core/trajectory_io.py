@@ -0,0 +1,453 @@
+"""
+Чтение и запись траекторий в колоночном виде (NPZ, JSON, CSV)
+и потоковый журнал траектории (.traj), который пишется во время трекинга
+"""
+import csv
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+# Колонки траектории и их типы (порядок важен для CSV)
+COLUMN_DTYPES = {
+    'timestamp': np.float64,
+    'x': np.float64,
+    'y': np.float64,
+    'area': np.float64,
+    'frame': np.int64,
+    'flags': np.uint32,
+}
+
+# Запись журнала траектории фиксированного размера (48 байт)
+LOG_RECORD_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('timestamp', '<f8'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('area', '<f8'),
+    ('flags', '<u4'),     # битовые флаги точки
+    ('reserved', '<u4'),
+])
+LOG_MAGIC = b'VMATRAJ\x01'
+
+# Флаги точки траектории
+FLAG_CARRIED = 1 << 0     # позиция перенесена с предыдущего кадра (сцена не менялась)
+
+LOG_HEADER_SIZE = 4096
+
+NPZ_FORMAT_VERSION = 1
+NPZ_META_NAME = 'meta.json'
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def records_to_columns(records: List[Dict]) -> Dict[str, np.ndarray]:
+    """Преобразовать список точек (словарей) в колонки numpy"""
+    if not records:
+        return empty_columns()
+
+    names = [name for name in COLUMN_DTYPES if name in records[0]]
+    return {
+        name: np.fromiter((point[name] for point in records),
+                          dtype=COLUMN_DTYPES[name], count=len(records))
+        for name in names
+    }
+
+
+def columns_to_records(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Преобразовать колонки обратно в список словарей"""
+    names = list(columns)
+    values = [columns[name].tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def empty_columns() -> Dict[str, np.ndarray]:
+    """Пустые колонки траектории"""
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+
+def column_length(columns: Dict[str, np.ndarray]) -> int:
+    """Число точек в колонках"""
+    if not columns:
+        return 0
+    return len(next(iter(columns.values())))
+
+
+class TrajectoryNpzWriter:
+    """
+    Потоковая запись траектории в NPZ по блокам
+
+    Каждый блок (аналог row group в Parquet) хранится как отдельный набор
+    массивов ``chunk_000000/<колонка>.npy``, поэтому запись идёт порциями
+    фиксированного размера и память не растёт вместе с длиной траектории.
+    """
+
+    def __init__(self, filename: str, settings: Optional[Dict] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, compress: bool = False):
+        self.filename = filename
+        self.settings = settings or {}
+        self.chunk_size = chunk_size
+        self.columns = list(COLUMN_DTYPES)
+        self.total_rows = 0
+        self.chunk_count = 0
+
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        self._zip = zipfile.ZipFile(filename, 'w', compression=compression, allowZip64=True)
+        self._buffer = {name: np.empty(chunk_size, dtype=dtype)
+                        for name, dtype in COLUMN_DTYPES.items()}
+        self._buffered = 0
+        # Как и у журнала: точки могут дописываться из потока обработки
+        self._lock = threading.RLock()
+
+    def append(self, timestamp: float, x: float, y: float, area: float,
+               frame: int = -1, flags: int = 0):
+        """Добавить одну точку"""
+        with self._lock:
+            i = self._buffered
+            self._buffer['timestamp'][i] = timestamp
+            self._buffer['x'][i] = x
+            self._buffer['y'][i] = y
+            self._buffer['area'][i] = area
+            self._buffer['frame'][i] = frame
+            self._buffer['flags'][i] = flags
+            self._buffered += 1
+            if self._buffered == self.chunk_size:
+                self.flush()
+
+    def write_columns(self, columns: Dict[str, np.ndarray]):
+        """Записать сразу набор колонок (разбивается на блоки)"""
+        self.flush()
+        length = column_length(columns)
+        for start in range(0, length, self.chunk_size):
+            stop = min(start + self.chunk_size, length)
+            self._write_chunk({name: np.asarray(columns[name][start:stop],
+                                                dtype=COLUMN_DTYPES[name])
+                               for name in self.columns if name in columns})
+
+    def flush(self):
+        """Записать накопленный блок на диск"""
+        with self._lock:
+            if self._buffered == 0:
+                return
+            self._write_chunk({name: self._buffer[name][:self._buffered] for name in self.columns})
+            self._buffered = 0
+
+    def _write_chunk(self, chunk: Dict[str, np.ndarray]):
+        """Записать один блок колонок"""
+        prefix = f"chunk_{self.chunk_count:06d}"
+        for name, array in chunk.items():
+            with self._zip.open(f"{prefix}/{name}.npy", 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+        self.total_rows += column_length(chunk)
+        self.chunk_count += 1
+
+    def close(self):
+        """Дописать метаданные и закрыть файл"""
+        with self._lock:
+            if self._zip is None:
+                return
+            self.flush()
+            meta = {
+                'format_version': NPZ_FORMAT_VERSION,
+                'columns': self.columns,
+                'rows': self.total_rows,
+                'chunks': self.chunk_count,
+                'settings': self.settings,
+                'timestamp': time.time()
+            }
+            self._zip.writestr(NPZ_META_NAME, json.dumps(meta, ensure_ascii=False))
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def save_npz(filename: str, columns: Dict[str, np.ndarray], settings: Optional[Dict] = None,
+             chunk_size: int = DEFAULT_CHUNK_SIZE, compress: bool = False):
+    """Сохранить колонки траектории в NPZ"""
+    with TrajectoryNpzWriter(filename, settings, chunk_size, compress) as writer:
+        writer.write_columns(columns)
+
+
+def iter_npz_chunks(filename: str) -> Iterable[Dict[str, np.ndarray]]:
+    """Последовательно читать блоки NPZ, не загружая файл целиком"""
+    with zipfile.ZipFile(filename, 'r') as zf:
+        chunks = {}
+        for name in zf.namelist():
+            if not name.endswith('.npy') or '/' not in name:
+                continue
+            prefix, column = name[:-len('.npy')].split('/', 1)
+            chunks.setdefault(prefix, []).append(column)
+
+        for prefix in sorted(chunks):
+            chunk = {}
+            for column in chunks[prefix]:
+                with zf.open(f"{prefix}/{column}.npy") as f:
+                    chunk[column] = np.lib.format.read_array(f, allow_pickle=False)
+            yield chunk
+
+
+def load_npz(filename: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Загрузить траекторию из NPZ: (колонки, метаданные)"""
+    with zipfile.ZipFile(filename, 'r') as zf:
+        meta = json.loads(zf.read(NPZ_META_NAME)) if NPZ_META_NAME in zf.namelist() else {}
+
+    parts = {}
+    for chunk in iter_npz_chunks(filename):
+        for name, array in chunk.items():
+            parts.setdefault(name, []).append(array)
+
+    if not parts:
+        return empty_columns(), meta
+    columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+    return columns, meta
+
+
+def save_json(filename: str, columns: Dict[str, np.ndarray], settings: Optional[Dict] = None):
+    """Сохранить траекторию в компактный JSON (формат ObjectTracker.export_data)"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump({
+            'settings': settings or {},
+            'tracking_data': columns_to_records(columns),
+            'timestamp': time.time()
+        }, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_json(filename: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Загрузить траекторию из JSON: (колонки, настройки)"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    return records_to_columns(payload.get('tracking_data', [])), payload.get('settings', {})
+
+
+def save_csv(filename: str, headers: List[str], columns: List[np.ndarray]):
+    """Записать колонки в CSV одной операцией writerows"""
+    with open(filename, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(zip(*[np.asarray(column).tolist() for column in columns]))
+
+
+def load_trajectory(filename: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Загрузить траекторию из файла любого поддерживаемого формата: (колонки, настройки)"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.npz':
+        columns, meta = load_npz(filename)
+        return columns, meta.get('settings', {})
+    if ext == LOG_EXTENSION:
+        reader = TrajectoryLogReader(filename)
+        return reader.read_columns(), reader.header.get('settings', {})
+    if ext == '.json':
+        return load_json(filename)
+    raise ValueError(f"Неподдерживаемый формат траектории: {ext}")
+
+
+LOG_EXTENSION = '.traj'
+
+
+def _log_records_to_columns(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """Колонки из структурированного массива записей журнала"""
+    return {name: np.ascontiguousarray(records[name]) for name in COLUMN_DTYPES}
+
+
+def _encode_log_header(header: Dict) -> bytes:
+    """Заголовок журнала: сигнатура, длина JSON, JSON, дополнение нулями"""
+    payload = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    prefix_size = len(LOG_MAGIC) + 4
+    if prefix_size + len(payload) > LOG_HEADER_SIZE:
+        raise ValueError("Заголовок журнала траектории слишком велик")
+    data = LOG_MAGIC + len(payload).to_bytes(4, 'little') + payload
+    return data + b'\0' * (LOG_HEADER_SIZE - len(data))
+
+
+def _decode_log_header(data: bytes) -> Dict:
+    """Разобрать заголовок журнала"""
+    if len(data) < LOG_HEADER_SIZE or not data.startswith(LOG_MAGIC):
+        raise ValueError("Файл не является журналом траектории")
+    start = len(LOG_MAGIC) + 4
+    length = int.from_bytes(data[len(LOG_MAGIC):start], 'little')
+    return json.loads(data[start:start + length].decode('utf-8'))
+
+
+class TrajectoryLogWriter:
+    """
+    Журнал траектории только на дозапись
+
+    Точки копятся в буфере и сбрасываются на диск блоками по chunk_size
+    записей. fsync выполняется не на каждый блок, а раз в fsync_every блоков
+    или раз в fsync_interval секунд. Записи имеют фиксированный размер,
+    поэтому журнал можно читать, пока он пишется, а после сбоя достаточно
+    отбросить недописанный хвост и продолжить запись.
+    """
+
+    def __init__(self, filename: str, settings: Optional[Dict] = None,
+                 chunk_size: int = 256, fsync_every: int = 8, fsync_interval: float = 2.0,
+                 resume: bool = False, metadata: Optional[Dict] = None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._buffer = np.zeros(chunk_size, dtype=LOG_RECORD_DTYPE)
+        self._buffered = 0
+        self._unsynced_chunks = 0
+        self._last_sync = time.monotonic()
+        # Запись идёт из потока обработки, чтение/сброс — из GUI
+        self._lock = threading.RLock()
+
+        if resume and os.path.exists(filename):
+            self._file = open(filename, 'r+b')
+            self.header = _decode_log_header(self._file.read(LOG_HEADER_SIZE))
+            self.records_on_disk = self._recover_tail()
+        else:
+            directory = os.path.dirname(os.path.abspath(filename))
+            os.makedirs(directory, exist_ok=True)
+            self.header = {
+                'format_version': 1,
+                'record_size': LOG_RECORD_DTYPE.itemsize,
+                'settings': settings or {},
+                'created': time.time()
+            }
+            self.header.update(metadata or {})
+            self._file = open(filename, 'w+b')
+            self._file.write(_encode_log_header(self.header))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.records_on_disk = 0
+
+    def _recover_tail(self) -> int:
+        """Отбросить недописанную запись в конце файла после сбоя"""
+        size = os.fstat(self._file.fileno()).st_size
+        count = max(0, size - LOG_HEADER_SIZE) // LOG_RECORD_DTYPE.itemsize
+        valid_size = LOG_HEADER_SIZE + count * LOG_RECORD_DTYPE.itemsize
+        if valid_size != size:
+            self._file.truncate(valid_size)
+        self._file.seek(valid_size)
+        return count
+
+    @property
+    def record_count(self) -> int:
+        """Число записанных точек (включая ещё не сброшенные на диск)"""
+        return self.records_on_disk + self._buffered
+
+    def append(self, frame: int, timestamp: float, x: float, y: float, area: float,
+               flags: int = 0):
+        """Добавить точку в журнал"""
+        with self._lock:
+            self._buffer[self._buffered] = (frame, timestamp, x, y, area, flags, 0)
+            self._buffered += 1
+            if self._buffered == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Сбросить буфер в файл (fsync — по расписанию)"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self._buffered:
+                self._file.write(self._buffer[:self._buffered].tobytes())
+                self._file.flush()
+                self.records_on_disk += self._buffered
+                self._buffered = 0
+                self._unsynced_chunks += 1
+
+            if (self._unsynced_chunks >= self.fsync_every or
+                    (self._unsynced_chunks and
+                     time.monotonic() - self._last_sync >= self.fsync_interval)):
+                self.sync()
+
+    def sync(self):
+        """Сбросить буфер и гарантировать запись на диск"""
+        with self._lock:
+            if self._file is None:
+                return
+            if self._buffered:
+                self._file.write(self._buffer[:self._buffered].tobytes())
+                self.records_on_disk += self._buffered
+                self._buffered = 0
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced_chunks = 0
+            self._last_sync = time.monotonic()
+
+    def truncate(self, record_count: int):
+        """Обрезать журнал до record_count записей (например, до контрольной точки)"""
+        with self._lock:
+            self.sync()
+            record_count = min(record_count, self.records_on_disk)
+            self._file.truncate(LOG_HEADER_SIZE + record_count * LOG_RECORD_DTYPE.itemsize)
+            self._file.seek(0, os.SEEK_END)
+            self.records_on_disk = record_count
+            self.sync()
+
+    def close(self):
+        """Закрыть журнал"""
+        with self._lock:
+            if self._file is None:
+                return
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TrajectoryLogReader:
+    """Чтение журнала траектории, в том числе пока он ещё пишется"""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self.header = _decode_log_header(f.read(LOG_HEADER_SIZE))
+        self._position = 0
+
+    def record_count(self) -> int:
+        """Число полностью записанных точек на данный момент"""
+        size = os.path.getsize(self.filename)
+        return max(0, size - LOG_HEADER_SIZE) // LOG_RECORD_DTYPE.itemsize
+
+    def read_records(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Прочитать записи [start, stop) как структурированный массив"""
+        count = self.record_count()
+        stop = count if stop is None else min(stop, count)
+        if stop <= start:
+            return np.empty(0, dtype=LOG_RECORD_DTYPE)
+        with open(self.filename, 'rb') as f:
+            f.seek(LOG_HEADER_SIZE + start * LOG_RECORD_DTYPE.itemsize)
+            return np.fromfile(f, dtype=LOG_RECORD_DTYPE, count=stop - start)
+
+    def read_columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Прочитать записи [start, stop) в виде колонок"""
+        return _log_records_to_columns(self.read_records(start, stop))
+
+    def memmap(self) -> np.ndarray:
+        """Отобразить записи в память без чтения файла целиком"""
+        count = self.record_count()
+        if count == 0:
+            return np.empty(0, dtype=LOG_RECORD_DTYPE)
+        return np.memmap(self.filename, dtype=LOG_RECORD_DTYPE, mode='r',
+                         offset=LOG_HEADER_SIZE, shape=(count,))
+
+    def read_new(self) -> Dict[str, np.ndarray]:
+        """Прочитать точки, появившиеся с прошлого вызова (режим tail -f)"""
+        count = self.record_count()
+        columns = self.read_columns(self._position, count)
+        self._position = count
+        return columns
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterable[Dict[str, np.ndarray]]:
+        """Последовательно читать журнал блоками колонок"""
+        count = self.record_count()
+        for start in range(0, count, chunk_size):
+            yield self.read_columns(start, min(start + chunk_size, count))
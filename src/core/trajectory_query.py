@@ -0,0 +1,143 @@
+"""
+Запросы к траектории по времени, номеру кадра и положению
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from core.trajectory_io import column_length
+
+# Пространственный индекс нужен только для поиска ближайших точек
+spatial = lazy_import("scipy.spatial")
+
+
+class TrajectoryQuery:
+    """
+    Индекс по траектории для быстрых выборок
+
+    Временные окна и кадры ищутся двоичным поиском по отсортированным
+    колонкам, а выборка возвращается срезами без копирования. Накопленные
+    суммы пути дают длину и среднюю скорость любого окна за O(log n).
+    KD-дерево для поиска по координатам строится при первом запросе.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        timestamps = np.asarray(columns['timestamp'], dtype=np.float64)
+        if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+            # Журнал пишется по порядку, но траектория из файла может быть перемешана
+            order = np.argsort(timestamps, kind='stable')
+            columns = {name: np.asarray(values)[order] for name, values in columns.items()}
+        else:
+            columns = {name: np.asarray(values) for name, values in columns.items()}
+
+        self.columns = columns
+        self.timestamps = np.asarray(columns['timestamp'], dtype=np.float64)
+        self.count = column_length(columns)
+
+        # cumulative[i] — путь от первой точки до точки i
+        self.cumulative = np.zeros(self.count)
+        if self.count > 1:
+            np.cumsum(np.hypot(np.diff(columns['x']), np.diff(columns['y'])), out=self.cumulative[1:])
+
+        self._tree = None
+
+    # === ВРЕМЯ И КАДРЫ ===
+
+    def index_range(self, start_time: Optional[float] = None,
+                    end_time: Optional[float] = None) -> Tuple[int, int]:
+        """Индексы [start, stop) точек с start_time <= t <= end_time"""
+        start = 0 if start_time is None else int(np.searchsorted(self.timestamps, start_time, 'left'))
+        stop = self.count if end_time is None else int(np.searchsorted(self.timestamps, end_time, 'right'))
+        return start, max(start, stop)
+
+    def window(self, start_time: Optional[float] = None,
+               end_time: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Колонки точек временного окна (срезы, без копирования)"""
+        start, stop = self.index_range(start_time, end_time)
+        return {name: values[start:stop] for name, values in self.columns.items()}
+
+    def at_time(self, timestamp: float) -> Optional[int]:
+        """Индекс точки, ближайшей по времени к timestamp"""
+        if self.count == 0:
+            return None
+        index = int(np.searchsorted(self.timestamps, timestamp))
+        if index == self.count or (index > 0 and
+                                   timestamp - self.timestamps[index - 1] <= self.timestamps[index] - timestamp):
+            index -= 1
+        return index
+
+    def at_frame(self, frame: int) -> Optional[int]:
+        """Индекс точки кадра frame (None, если на этом кадре объект не найден)"""
+        frames = self.columns.get('frame')
+        if frames is None or self.count == 0:
+            return None
+        index = int(np.searchsorted(frames, frame))
+        if index < self.count and frames[index] == frame:
+            return index
+        return None
+
+    def point(self, index: int) -> Dict:
+        """Одна точка траектории в виде словаря"""
+        return {name: values[index].item() for name, values in self.columns.items()}
+
+    # === ПОИСК ПО ПОЛОЖЕНИЮ ===
+
+    def _spatial_index(self):
+        """KD-дерево по (x, y), строится один раз"""
+        if self._tree is None:
+            points = np.column_stack([self.columns['x'], self.columns['y']])
+            self._tree = spatial.cKDTree(points)
+        return self._tree
+
+    def nearest(self, x: float, y: float, k: int = 1,
+                max_distance: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k ближайших к (x, y) точек траектории
+
+        Returns:
+            (индексы, расстояния); точки дальше max_distance не возвращаются
+        """
+        if self.count == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        k = min(k, self.count)
+        distances, indices = self._spatial_index().query((x, y), k=k, distance_upper_bound=max_distance)
+        distances = np.atleast_1d(distances)
+        indices = np.atleast_1d(indices)
+        found = np.isfinite(distances)
+        return indices[found], distances[found]
+
+    def within(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Индексы всех точек в радиусе radius от (x, y), по времени"""
+        if self.count == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.asarray(self._spatial_index().query_ball_point((x, y), radius), dtype=np.intp))
+
+    # === СТАТИСТИКА ОКНА ===
+
+    def window_stats(self, start_time: Optional[float] = None,
+                     end_time: Optional[float] = None) -> Dict:
+        """
+        Путь, длительность, средняя скорость и смещение за окно
+
+        Всё считается по накопленным суммам и концам окна, поэтому не
+        зависит от числа точек в окне.
+        """
+        start, stop = self.index_range(start_time, end_time)
+        if stop - start == 0:
+            return {'points': 0, 'duration': 0.0, 'distance': 0.0,
+                    'mean_speed': 0.0, 'displacement': 0.0}
+
+        last = stop - 1
+        duration = float(self.timestamps[last] - self.timestamps[start])
+        distance = float(self.cumulative[last] - self.cumulative[start])
+        x, y = self.columns['x'], self.columns['y']
+        return {
+            'points': stop - start,
+            'start_time': float(self.timestamps[start]),
+            'end_time': float(self.timestamps[last]),
+            'duration': duration,
+            'distance': distance,
+            'mean_speed': distance / duration if duration > 0 else 0.0,
+            'displacement': float(np.hypot(x[last] - x[start], y[last] - y[start]))
+        }
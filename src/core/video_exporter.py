@@ -0,0 +1,310 @@
+"""
+Экспорт видео с разметкой трекинга (маркер, след, скорость)
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.lazy_import import lazy_import
+from utils.constants import EXPORT_SETTINGS
+from utils.profiler import get_profiler
+from core.video_processor import VideoProcessor
+from core.object_tracker import draw_position_marker
+
+cv2 = lazy_import("cv2")
+
+
+class BackgroundVideoWriter:
+    """
+    cv2.VideoWriter в отдельном потоке
+
+    Кадры не копируются: поток отрисовки берёт свободный буфер через
+    acquire(), рисует в нём и отдаёт через submit(); после кодирования
+    буфер возвращается в пул. Пул ограничен queue_size + 1 буферами,
+    поэтому при медленном кодировщике отрисовка ждёт, а память не растёт.
+    """
+
+    def __init__(self, path: str, fps: float, frame_size: Tuple[int, int],
+                 fourcc: Optional[str] = None,
+                 queue_size: int = EXPORT_SETTINGS["queue_size"]):
+        extension = os.path.splitext(path)[1].lower()
+        fourcc = fourcc or EXPORT_SETTINGS["fourcc"].get(extension, "mp4v")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        width, height = frame_size
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+        if not self.writer.isOpened():
+            raise RuntimeError(f"Не удалось открыть кодировщик {fourcc} для {path}")
+
+        self.free_buffers: "queue.Queue[np.ndarray]" = queue.Queue()
+        for _ in range(queue_size + 1):
+            self.free_buffers.put(np.empty((height, width, 3), dtype=np.uint8))
+        self.pending: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=queue_size)
+
+        self.frames_written = 0
+        self.error: Optional[Exception] = None
+        self.profiler = get_profiler()
+        self.thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self.thread.start()
+
+    def _check(self):
+        """Пробросить ошибку кодировщика в поток отрисовки"""
+        if self.error is not None:
+            raise RuntimeError(f"Ошибка записи видео: {self.error}")
+
+    def acquire(self) -> np.ndarray:
+        """Свободный буфер кадра (ждёт, если все буферы в очереди к кодировщику)"""
+        self._check()
+        with self.profiler.stage('export.wait_encoder'):
+            return self.free_buffers.get()
+
+    def release(self, buffer: np.ndarray):
+        """Вернуть неиспользованный буфер"""
+        self.free_buffers.put(buffer)
+
+    def submit(self, buffer: np.ndarray):
+        """Отдать готовый кадр на кодирование"""
+        self._check()
+        self.pending.put(buffer)
+
+    def _run(self):
+        """Цикл потока кодирования"""
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            try:
+                if self.error is None:
+                    self.writer.write(buffer)
+                    self.frames_written += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                self.free_buffers.put(buffer)
+
+    def close(self):
+        """
+        Дождаться записи всех кадров и закрыть файл
+
+        Ошибку кодировщика close() не пробрасывает — иначе она заменила бы
+        исключение, с которым уже завершается цикл отрисовки. После
+        успешного цикла её проверяет _check().
+        """
+        if self.thread is None:
+            return
+        self.pending.put(None)
+        self.thread.join()
+        self.thread = None
+        self.writer.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is None:
+            self._check()
+
+
+class TrailLayer:
+    """
+    След траектории в постоянном слое
+
+    Каждая новая точка дорисовывает в слой один отрезок, а на кадр слой
+    переносится по маске только в пределах рамки, занятой следом, —
+    ломаная целиком на каждом кадре не перерисовывается.
+    """
+
+    def __init__(self, width: int, height: int,
+                 color: Tuple[int, int, int] = EXPORT_SETTINGS["trail_color"],
+                 thickness: int = EXPORT_SETTINGS["trail_thickness"]):
+        self.width = width
+        self.height = height
+        self.color = tuple(color)
+        self.thickness = thickness
+        self.layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        self.last_point: Optional[Tuple[int, int]] = None
+        self.bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def reset(self):
+        """Стереть след"""
+        self.layer[:] = 0
+        self.mask[:] = 0
+        self.last_point = None
+        self.bounds = None
+
+    def break_trail(self):
+        """Следующая точка начнёт новый отрезок следа (объект пропадал)"""
+        self.last_point = None
+
+    def add_point(self, x: float, y: float):
+        """Продолжить след до точки (x, y)"""
+        point = (int(round(x)), int(round(y)))
+        if self.last_point is not None and point != self.last_point:
+            cv2.line(self.layer, self.last_point, point, self.color, self.thickness)
+            cv2.line(self.mask, self.last_point, point, 255, self.thickness)
+            self._extend_bounds(self.last_point, point)
+        self.last_point = point
+
+    def _extend_bounds(self, start: Tuple[int, int], end: Tuple[int, int]):
+        """Расширить рамку следа на новый отрезок (с запасом на толщину линии)"""
+        margin = self.thickness + 1
+        x0 = max(0, min(start[0], end[0]) - margin)
+        y0 = max(0, min(start[1], end[1]) - margin)
+        x1 = min(self.width, max(start[0], end[0]) + margin + 1)
+        y1 = min(self.height, max(start[1], end[1]) + margin + 1)
+        if self.bounds is not None:
+            bx0, by0, bx1, by1 = self.bounds
+            x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+        if x1 > x0 and y1 > y0:
+            self.bounds = (x0, y0, x1, y1)
+
+    def composite(self, frame: np.ndarray) -> np.ndarray:
+        """Наложить след на кадр (на месте)"""
+        if self.bounds is None:
+            return frame
+        x0, y0, x1, y1 = self.bounds
+        cv2.copyTo(self.layer[y0:y1, x0:x1], self.mask[y0:y1, x0:x1], frame[y0:y1, x0:x1])
+        return frame
+
+
+def point_speeds(columns: Dict[str, np.ndarray], calibration=None,
+                 frame_size: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, str]:
+    """
+    Скорость в каждой точке траектории (по предыдущей точке)
+
+    Returns:
+        (скорости, единицы) — в единицах профиля калибровки, если он задан
+    """
+    x, y = columns['x'], columns['y']
+    units = 'px'
+    if calibration is not None:
+        x, y = calibration.to_world(x, y, frame_size)
+        units = calibration.units
+
+    speeds = np.zeros(len(x), dtype=np.float64)
+    if len(x) > 1:
+        dt = np.diff(columns['timestamp'])
+        distance = np.hypot(np.diff(x), np.diff(y))
+        valid = dt > 0
+        speeds[1:][valid] = distance[valid] / dt[valid]
+    return speeds, units
+
+
+class VideoExporter:
+    """
+    Видео с разметкой по готовой траектории
+
+    Видео декодируется заново прямо в буферы кодировщика, разметка
+    рисуется поверх, а кодирование идёт в BackgroundVideoWriter
+    параллельно с декодированием следующих кадров.
+    """
+
+    def __init__(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+                 fourcc: Optional[str] = None,
+                 queue_size: int = EXPORT_SETTINGS["queue_size"],
+                 trail_gap_seconds: float = EXPORT_SETTINGS["trail_gap_seconds"]):
+        self.progress_callback = progress_callback
+        self.fourcc = fourcc
+        self.queue_size = queue_size
+        self.trail_gap_seconds = trail_gap_seconds
+        self.profiler = get_profiler()
+        self.cancelled = False
+
+    def cancel(self):
+        """Прервать экспорт (уже записанные кадры сохранятся)"""
+        self.cancelled = True
+
+    @staticmethod
+    def _point_frames(columns: Dict[str, np.ndarray], fps: float) -> np.ndarray:
+        """Номера кадров точек (для старых данных без колонки frame — по времени)"""
+        frames = columns.get('frame')
+        if frames is not None and len(frames) and frames.min() >= 0:
+            return np.asarray(frames, dtype=np.int64)
+        timestamps = np.asarray(columns['timestamp'], dtype=np.float64)
+        if len(timestamps) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.round((timestamps - timestamps[0]) * fps).astype(np.int64)
+
+    def export(self, video_path: str, output_path: str, columns: Dict[str, np.ndarray],
+               calibration=None) -> Dict:
+        """
+        Записать output_path: исходное видео с маркером, следом и скоростью
+
+        Returns:
+            Сводка экспорта (кадры, время, единицы скорости)
+        """
+        video_processor = VideoProcessor()
+        if not video_processor.open_video(video_path):
+            raise RuntimeError(f"Не удалось открыть видео: {video_path}")
+
+        metadata = video_processor.metadata
+        fps = metadata.fps if metadata.fps > 0 else 30.0
+        width, height = metadata.width, metadata.height
+
+        point_frames = self._point_frames(columns, fps)
+        speeds, units = point_speeds(columns, calibration, (width, height))
+        xs, ys, areas = columns['x'], columns['y'], columns['area']
+        timestamps = columns['timestamp']
+        trail = TrailLayer(width, height)
+
+        start_time = time.time()
+        frame_num = 0
+        next_point = 0
+        last_time = None
+        writer = BackgroundVideoWriter(output_path, fps, (width, height),
+                                       self.fourcc, self.queue_size)
+        try:
+            while not self.cancelled:
+                buffer = writer.acquire()
+                with self.profiler.stage('export.decode'):
+                    ok = video_processor.read_sampled_frame_into(buffer)
+                if not ok:
+                    writer.release(buffer)
+                    break
+
+                with self.profiler.stage('export.render'):
+                    # Все точки до текущего кадра включительно продолжают след
+                    position = None
+                    while next_point < len(point_frames) and point_frames[next_point] <= frame_num:
+                        i = next_point
+                        if last_time is not None and timestamps[i] - last_time > self.trail_gap_seconds:
+                            trail.break_trail()
+                        trail.add_point(xs[i], ys[i])
+                        last_time = timestamps[i]
+                        if point_frames[i] == frame_num:
+                            position = (xs[i], ys[i], areas[i])
+                        next_point += 1
+
+                    trail.composite(buffer)
+                    if position is not None:
+                        draw_position_marker(buffer, position)
+                        cv2.putText(buffer, f"Speed: {speeds[next_point - 1]:.1f} {units}/s",
+                                    (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+                writer.submit(buffer)
+                frame_num += 1
+                if self.progress_callback:
+                    self.progress_callback(frame_num, metadata.frame_count)
+        finally:
+            writer.close()
+            video_processor.close_video()
+        # Сюда доходим, только если сам цикл не упал: теперь можно сообщить об ошибке кодировщика
+        writer._check()
+
+        return {
+            'video': os.path.abspath(video_path),
+            'output': os.path.abspath(output_path),
+            'completed': not self.cancelled,
+            'frames': writer.frames_written,
+            'points': len(point_frames),
+            'speed_units': f"{units}/s",
+            'elapsed': time.time() - start_time
+        }
@@ -0,0 +1,204 @@
+"""
+Метаданные видео: однократное чтение свойств файла и их кэширование
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict
+
+from utils.constants import METADATA_CACHE_SETTINGS
+from utils.lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+
+
+@dataclass(frozen=True)
+class VideoMetadata:
+    """Свойства видео, прочитанные один раз при открытии файла"""
+    path: str
+    fps: float
+    frame_count: int
+    width: int
+    height: int
+    mtime: float = 0.0
+    size: int = 0
+
+    @property
+    def duration(self) -> float:
+        """Длительность видео в секундах"""
+        return self.frame_count / self.fps if self.fps > 0 else 0
+
+    @property
+    def frame_interval(self) -> float:
+        """Интервал между кадрами в секундах"""
+        return 1.0 / self.fps if self.fps > 0 else 0.033
+
+    @classmethod
+    def from_capture(cls, cap, path: str, mtime: float = 0.0, size: int = 0) -> "VideoMetadata":
+        """Прочитать свойства из уже открытого cv2.VideoCapture"""
+        return cls(
+            path=path,
+            fps=float(cap.get(cv2.CAP_PROP_FPS)),
+            frame_count=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            mtime=mtime,
+            size=size
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "VideoMetadata":
+        """Создать метаданные из словаря (например, из дискового кэша)"""
+        return cls(
+            path=data['path'],
+            fps=float(data['fps']),
+            frame_count=int(data['frame_count']),
+            width=int(data['width']),
+            height=int(data['height']),
+            mtime=float(data.get('mtime', 0.0)),
+            size=int(data.get('size', 0))
+        )
+
+    def to_dict(self) -> Dict:
+        """Словарь для сохранения в кэш"""
+        return asdict(self)
+
+    def to_properties(self) -> Dict:
+        """Словарь свойств в формате FileHandler.get_video_properties"""
+        return {
+            'fps': self.fps,
+            'frame_count': self.frame_count,
+            'width': self.width,
+            'height': self.height,
+            'duration': self.duration
+        }
+
+    def matches_file(self, mtime: float, size: int) -> bool:
+        """Проверить, что метаданные соответствуют текущей версии файла"""
+        return self.mtime == mtime and self.size == size
+
+
+class MetadataCache:
+    """Кэш метаданных видео в памяти и (опционально) на диске"""
+
+    def __init__(self, disk_cache_path: Optional[str] = None, max_entries: int = 1000):
+        self.disk_cache_path = disk_cache_path
+        self.max_entries = max_entries
+        self._entries: Dict[str, VideoMetadata] = {}
+        self._disk_loaded = False
+        self._lock = threading.Lock()
+
+    def get(self, path: str, mtime: float, size: int) -> Optional[VideoMetadata]:
+        """Получить метаданные, если файл не изменился с момента записи"""
+        with self._lock:
+            self._load_disk_cache()
+            metadata = self._entries.get(path)
+        if metadata is not None and metadata.matches_file(mtime, size):
+            return metadata
+        return None
+
+    def put(self, metadata: VideoMetadata):
+        """Сохранить метаданные в кэш"""
+        with self._lock:
+            self._load_disk_cache()
+            self._entries.pop(metadata.path, None)
+            self._entries[metadata.path] = metadata
+            while len(self._entries) > self.max_entries:
+                # Удаляем самую старую запись
+                self._entries.pop(next(iter(self._entries)))
+            self._save_disk_cache()
+
+    def clear(self):
+        """Очистить кэш в памяти"""
+        with self._lock:
+            self._entries.clear()
+            self._disk_loaded = False
+
+    def _load_disk_cache(self):
+        """Загрузить дисковый кэш один раз"""
+        if self._disk_loaded or not self.disk_cache_path:
+            self._disk_loaded = True
+            return
+        self._disk_loaded = True
+
+        try:
+            with open(self.disk_cache_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            for data in entries:
+                metadata = VideoMetadata.from_dict(data)
+                self._entries.setdefault(metadata.path, metadata)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Ошибка чтения кэша метаданных: {e}")
+
+    def _save_disk_cache(self):
+        """Записать кэш на диск атомарно"""
+        if not self.disk_cache_path:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.disk_cache_path), exist_ok=True)
+            tmp_path = self.disk_cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump([m.to_dict() for m in self._entries.values()], f, ensure_ascii=False)
+            os.replace(tmp_path, self.disk_cache_path)
+        except Exception as e:
+            print(f"Ошибка записи кэша метаданных: {e}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_metadata_cache() -> Optional[MetadataCache]:
+    """Общий кэш метаданных приложения (None, если кэш выключен)"""
+    global _default_cache
+    if not METADATA_CACHE_SETTINGS["memory_cache"]:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            disk_path = (METADATA_CACHE_SETTINGS["disk_cache_path"]
+                         if METADATA_CACHE_SETTINGS["disk_cache"] else None)
+            _default_cache = MetadataCache(disk_path, METADATA_CACHE_SETTINGS["max_entries"])
+        return _default_cache
+
+
+def probe_video(video_path: str, cap=None) -> Optional[VideoMetadata]:
+    """
+    Получить метаданные видео
+
+    Сначала проверяется кэш (ключ: путь + mtime + размер). Если передан уже
+    открытый cap, свойства читаются из него, и файл повторно не открывается.
+    """
+    path = os.path.abspath(video_path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    cache = get_metadata_cache()
+    if cache is not None:
+        metadata = cache.get(path, stat.st_mtime, stat.st_size)
+        if metadata is not None:
+            return metadata
+
+    own_capture = cap is None
+    try:
+        if own_capture:
+            cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            return None
+        metadata = VideoMetadata.from_capture(cap, path, stat.st_mtime, stat.st_size)
+    except Exception as e:
+        print(f"Ошибка чтения свойств видео: {e}")
+        return None
+    finally:
+        if own_capture and cap is not None:
+            cap.release()
+
+    if cache is not None:
+        cache.put(metadata)
+    return metadata
@@ -1,23 +1,40 @@
 """
 Модуль для обработки видео
 """
-import cv2
 import numpy as np
-from typing import Optional, Tuple, Callable
+from typing import Optional, Tuple, Callable, Union, Dict
 import threading
 import time
 
+from utils.lazy_import import lazy_import
+from core.video_metadata import VideoMetadata, probe_video
+from core.live_capture import LatestFrameCapture, LatencyStats
+from core.frame_sampler import FrameSampler
+from utils.profiler import get_profiler
+
+cv2 = lazy_import("cv2")
+
 
 class VideoProcessor:
     """Класс для работы с видео"""
     
     def __init__(self):
         self.cap = None
+        self.metadata: Optional[VideoMetadata] = None
+        self.frame_index = 0
         self.current_frame = None
         self.playing = False
         self.processing = False
         self.frame_callbacks = []
         self.processing_thread = None
+        self.sampler = FrameSampler()
+        self.profiler = get_profiler()
+        
+        # Живой источник (камера / поток)
+        self.live_capture: Optional[LatestFrameCapture] = None
+        self.live_latency = LatencyStats()
+        self.current_capture_time = 0.0
+        self.processed_live_frames = 0
         
     def open_video(self, video_path: str) -> bool:
         """Открыть видео файл"""
@@ -25,10 +42,61 @@ class VideoProcessor:
         
         self.cap = cv2.VideoCapture(video_path)
         if not self.cap.isOpened():
+            self.cap = None
             return False
+        
+        # Свойства читаем один раз из уже открытого capture (или из кэша)
+        self.metadata = probe_video(video_path, cap=self.cap)
+        if self.metadata is None:
+            self.metadata = VideoMetadata.from_capture(self.cap, video_path)
+        self.frame_index = 0
+        self.sampler.configure(self.metadata.fps)
             
         return True
     
+    def open_stream(self, source: Union[int, str]) -> bool:
+        """
+        Открыть живой источник: индекс камеры, URL потока или канал
+        
+        В этом режиме обрабатывается только самый свежий кадр, а кадры,
+        которые не успели обработать, отбрасываются.
+        """
+        self.close_video()
+        
+        capture = LatestFrameCapture(source)
+        if not capture.open():
+            return False
+            
+        self.live_capture = capture
+        width, height = capture.get_size()
+        self.metadata = VideoMetadata(path=str(source), fps=capture.get_fps(),
+                                      frame_count=0, width=width, height=height)
+        self.live_latency = LatencyStats()
+        self.processed_live_frames = 0
+        self.frame_index = 0
+        return True
+    
+    def is_live(self) -> bool:
+        """Открыт ли живой источник"""
+        return self.live_capture is not None
+    
+    def mark_position_ready(self):
+        """Отметить, что позиция для текущего кадра вычислена (для замера задержки)"""
+        if self.live_capture is not None and self.current_capture_time:
+            self.live_latency.add(time.perf_counter() - self.current_capture_time)
+    
+    def get_live_stats(self) -> Dict:
+        """Статистика живого источника: задержка захват → позиция и пропущенные кадры"""
+        if self.live_capture is None:
+            return {}
+        stats = self.live_latency.summary()
+        stats.update({
+            'captured_frames': self.live_capture.captured_frames,
+            'processed_frames': self.processed_live_frames,
+            'dropped_frames': self.live_capture.dropped_frames
+        })
+        return stats
+    
     def close_video(self):
         """Закрыть видео"""
         self.stop_playback()
@@ -36,62 +104,177 @@ class VideoProcessor:
         if self.cap:
             self.cap.release()
             self.cap = None
+        
+        if self.live_capture:
+            self.live_capture.release()
+            self.live_capture = None
             
+        self.metadata = None
+        self.frame_index = 0
         self.current_frame = None
     
     def get_frame(self, frame_num: Optional[int] = None) -> Optional[np.ndarray]:
         """Получить конкретный кадр"""
+        if self.live_capture is not None:
+            item = self.live_capture.read()
+            if item is None:
+                return None
+            self.current_frame, self.current_capture_time = item
+            self.frame_index += 1
+            return self.current_frame
+            
         if not self.cap:
             return None
             
         if frame_num is not None:
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+            self.frame_index = frame_num
             
         ret, frame = self.cap.read()
         if ret:
+            self.frame_index += 1
             self.current_frame = frame
             return frame
         return None
     
+    def set_sampler(self, sampler: FrameSampler):
+        """Задать правило прореживания кадров"""
+        self.sampler = sampler
+        if self.metadata:
+            self.sampler.configure(self.metadata.fps)
+    
+    def read_sampled_frame(self) -> Optional[np.ndarray]:
+        """
+        Прочитать следующий кадр выборки
+        
+        Пропускаемые кадры только захватываются через grab() без retrieve(),
+        поэтому они не декодируются в BGR и не копируются.
+        """
+        if not self.cap:
+            return self.get_frame()
+            
+        for _ in range(self.sampler.next_step() - 1):
+            if not self.cap.grab():
+                return None
+            self.frame_index += 1
+        return self.get_frame()
+    
+    def read_sampled_frame_into(self, buffer: np.ndarray) -> bool:
+        """
+        Прочитать следующий кадр выборки прямо в buffer (без промежуточной копии)
+        
+        buffer должен иметь форму кадра (height, width, 3) и тип uint8 —
+        например, ячейка кольцевого буфера в общей памяти.
+        """
+        if not self.cap:
+            return False
+            
+        for _ in range(self.sampler.next_step() - 1):
+            if not self.cap.grab():
+                return False
+            self.frame_index += 1
+        ret, frame = self.cap.read(buffer)
+        if not ret:
+            return False
+        if frame.ctypes.data != buffer.ctypes.data:
+            # Декодер выделил новый массив (другой размер кадра или тип)
+            np.copyto(buffer, frame)
+        self.frame_index += 1
+        return True
+    
+    def seek(self, frame_num: int, preroll: int = 0) -> bool:
+        """
+        Перейти к кадру frame_num так, чтобы следующий read() вернул именно его
+        
+        Позиционирование выполняется на кадр frame_num - preroll (ближайший
+        ключевой кадр при известном интервале ключевых кадров), после чего
+        оставшиеся кадры пропускаются через grab() без декодирования в BGR.
+        Так результат совпадает с последовательным чтением даже на
+        контейнерах с неточным позиционированием.
+        """
+        if not self.cap:
+            return False
+            
+        start = max(0, frame_num - max(0, preroll))
+        if start == 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        elif not self.cap.set(cv2.CAP_PROP_POS_FRAMES, start):
+            return False
+        self.frame_index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if self.frame_index > frame_num:
+            # Контейнер не умеет точное позиционирование — читаем с начала
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.frame_index = 0
+            
+        while self.frame_index < frame_num:
+            if not self.cap.grab():
+                return False
+            self.frame_index += 1
+        return True
+    
     def get_current_frame_number(self) -> int:
         """Получить номер текущего кадра"""
         if not self.cap:
             return 0
-        return int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        return self.frame_index
     
     def get_total_frames(self) -> int:
         """Получить общее количество кадров"""
-        if not self.cap:
+        if not self.metadata:
             return 0
-        return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return self.metadata.frame_count
     
     def get_fps(self) -> float:
         """Получить FPS видео"""
-        if not self.cap:
+        if not self.metadata:
             return 0
-        return self.cap.get(cv2.CAP_PROP_FPS)
+        return self.metadata.fps
+    
+    def get_metadata(self) -> Optional[VideoMetadata]:
+        """Получить метаданные открытого видео"""
+        return self.metadata
     
     def add_frame_callback(self, callback: Callable):
         """Добавить callback при получении нового кадра"""
         self.frame_callbacks.append(callback)
     
+    def _live_loop(self):
+        """Цикл обработки живого источника: без задержек, только свежие кадры"""
+        while self.playing and self.live_capture is not None:
+            item = self.live_capture.read(timeout=0.5)
+            if item is None:
+                if self.live_capture.ended:
+                    self.playing = False
+                    break
+                continue
+                
+            frame, self.current_capture_time = item
+            self.frame_index += 1
+            self.processed_live_frames += 1
+            self.current_frame = frame
+            
+            for callback in self.frame_callbacks:
+                callback(frame)
+    
     def _processing_loop(self):
         """Основной цикл обработки видео"""
-        frame_delay = 1.0 / self.get_fps() if self.get_fps() > 0 else 0.033
+        frame_interval = self.metadata.frame_interval if self.metadata else 0.033
         
         while self.playing and self.cap:
             start_time = time.time()
             
-            ret, frame = self.cap.read()
-            if not ret:
+            # При прореживании кадр «длится» столько, сколько кадров пропущено
+            frame_delay = frame_interval * self.sampler.next_step()
+            with self.profiler.stage('decode'):
+                frame = self.read_sampled_frame()
+            if frame is None:
                 self.playing = False
                 break
-                
-            self.current_frame = frame
             
             # Вызываем все зарегистрированные callback'и
-            for callback in self.frame_callbacks:
-                callback(frame)
+            with self.profiler.stage('frame_callbacks'):
+                for callback in self.frame_callbacks:
+                    callback(frame)
             
             # Поддерживаем правильную скорость воспроизведения
             processing_time = time.time() - start_time
@@ -100,11 +283,12 @@ class VideoProcessor:
     
     def start_playback(self):
         """Начать воспроизведение"""
-        if not self.cap or self.playing:
+        if not self.is_opened() or self.playing:
             return
             
         self.playing = True
-        self.processing_thread = threading.Thread(target=self._processing_loop)
+        target = self._live_loop if self.live_capture is not None else self._processing_loop
+        self.processing_thread = threading.Thread(target=target)
         self.processing_thread.daemon = True
         self.processing_thread.start()
     
@@ -121,4 +305,6 @@ class VideoProcessor:
     
     def is_opened(self) -> bool:
         """Проверить, открыто ли видео"""
+        if self.live_capture is not None:
+            return not self.live_capture.ended
         return self.cap is not None and self.cap.isOpened()
\ No newline at end of file
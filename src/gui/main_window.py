@@ -4,21 +4,34 @@
 import customtkinter as ctk
 import tkinter as tk
 from typing import Optional, Callable
-import cv2
-from PIL import Image, ImageTk
 import numpy as np
 import time
 from tkinter import filedialog
+import os
+import threading
 
-from utils.constants import COLORS, UI_SETTINGS, APP_SETTINGS
+from utils.constants import (COLORS, UI_SETTINGS, APP_SETTINGS, TRAJECTORY_LOG_SETTINGS,
+                             PROFILER_SETTINGS, CALIBRATION_SETTINGS)
+from utils.lazy_import import lazy_import
 from utils.file_handlers import FileHandler
+from utils.buffer_pool import BufferPool
+from utils.profiler import get_profiler
 from core.video_processor import VideoProcessor
+from core.live_capture import parse_source
+from core.frame_sampler import FrameSampler
 from core.object_tracker import ObjectTracker
 from core.data_analyzer import DataAnalyzer
+from core.calibration import load_profile
+from core.video_exporter import VideoExporter
+from core.hsv_autotune import HsvAutoTuner, click_box
 from gui.video_controls import VideoControls
 from gui.tracking_panel import TrackingPanel
 from gui.results_panel import ResultsPanel
 
+# OpenCV и PIL нужны только после открытия видео
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+
 
 class MainWindow:
     """Главное окно приложения"""
@@ -28,12 +41,21 @@ class MainWindow:
         self.video_processor = VideoProcessor()
         self.object_tracker = ObjectTracker()
         self.data_analyzer = DataAnalyzer()
+        self.calibration_profile = None
+        
+        # Автоподбор HSV: отмеченные области (кадр, рамка) и начало перетаскивания
+        self.hsv_samples = []
+        self.hsv_marking = False
+        self.hsv_drag_start = None
         
         self.current_video_path = None
         self.is_playing = False
         self.is_tracking = False
         self.video_frame = None
         self.start_time = 0
+        # Буферы отображения: кадр с разметкой и уменьшенная RGB-копия
+        self.display_buffers = BufferPool()
+        self.profiler = get_profiler()
         
         self.setup_ui()
         self.setup_bindings()
@@ -95,14 +117,16 @@ class MainWindow:
             self.open_video,
             self.play_video,
             self.pause_video,
-            self.reset_analysis
+            self.reset_analysis,
+            self.open_stream
         )
         
         # Панель настроек трекинга
         self.tracking_panel = TrackingPanel(
             self.sidebar_frame,
             self.toggle_tracking,
-            self.apply_tracking_settings
+            self.apply_tracking_settings,
+            self.start_hsv_autotune
         )
         
     def setup_video_area(self):
@@ -164,6 +188,27 @@ class MainWindow:
         )
         self.export_btn.pack(side="left", padx=5)
         
+        self.export_video_btn = ctk.CTkButton(
+            btn_frame,
+            text="🎬 Видео с разметкой",
+            command=self.export_annotated_video,
+            height=UI_SETTINGS["button_height"],
+            state="disabled",
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        )
+        self.export_video_btn.pack(side="left", padx=5)
+        
+        self.calibration_btn = ctk.CTkButton(
+            btn_frame,
+            text="📐 Калибровка",
+            command=self.load_calibration,
+            height=UI_SETTINGS["button_height"],
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        )
+        self.calibration_btn.pack(side="left", padx=5)
+        
     def setup_results_panel(self):
         """Настройка панели результатов (изначально скрыта)"""
         self.results_frame = ctk.CTkFrame(self.content_frame, fg_color=COLORS["bg_dark"])
@@ -192,23 +237,51 @@ class MainWindow:
         )
         self.tracking_status_label.pack(side="right", padx=UI_SETTINGS["padding_medium"])
         
+        # Статистика живого источника (задержка, пропуски кадров)
+        self.live_stats_label = ctk.CTkLabel(
+            self.status_frame,
+            text="",
+            text_color=COLORS["text_secondary"]
+        )
+        self.live_stats_label.pack(side="right", padx=UI_SETTINGS["padding_medium"])
+        
+        # Профиль этапов обработки кадра (F9 — вкл/выкл, F10 — сохранить в JSON)
+        self.profile_label = ctk.CTkLabel(
+            self.status_frame,
+            text="",
+            text_color=COLORS["text_secondary"]
+        )
+        self.profile_label.pack(side="right", padx=UI_SETTINGS["padding_medium"])
+        
     def setup_bindings(self):
         """Настройка привязок событий"""
         # Регистрируем callback для обновления видео
         self.video_processor.add_frame_callback(self.process_video_frame)
         
+        # Профилирование этапов обработки
+        self.parent.bind("<F9>", self.toggle_profiling)
+        self.parent.bind("<F10>", self.dump_profile)
+        if self.profiler.enabled:
+            self.schedule_profile_stats()
+        
     def process_video_frame(self, frame: np.ndarray):
         """Обработать кадр видео с трекингом"""
         try:
-            display_frame = frame.copy()
+            display_frame = frame
             current_time = time.time() - self.start_time
             
             # Применяем трекинг если включен
             if self.is_tracking:
                 position = self.object_tracker.process_frame(frame)
+                self.video_processor.mark_position_ready()
+                self.video_processor.sampler.observe(position)
                 if position:
-                    self.object_tracker.add_tracking_point(position, current_time)
-                    display_frame = self.object_tracker.draw_tracking_info(display_frame, position)
+                    frame_num = self.video_processor.frame_index - 1
+                    self.object_tracker.add_tracking_point(position, current_time, frame_num)
+                    # Разметку рисуем в копии, исходный кадр не трогаем
+                    with self.profiler.stage('overlay'):
+                        display_frame = self.display_buffers.copy_of('overlay', frame)
+                        display_frame = self.object_tracker.draw_tracking_info(display_frame, position)
                     
                     # Обновляем статистику
                     self.update_tracking_stats(position, current_time)
@@ -216,13 +289,11 @@ class MainWindow:
             # Обновляем отображение
             self.update_video_display(display_frame)
             
-            # Обновляем прогресс
-            if self.video_processor.is_opened():
-                current_frame = self.video_processor.get_current_frame_number()
-                total_frames = self.video_processor.get_total_frames()
-                if total_frames > 0:
-                    progress = current_frame / total_frames
-                    self.progress_bar.set(progress)
+            # Обновляем прогресс (простые атрибуты, без запросов к capture)
+            metadata = self.video_processor.metadata
+            if metadata is not None and metadata.frame_count > 0:
+                progress = self.video_processor.frame_index / metadata.frame_count
+                self.progress_bar.set(progress)
                     
         except Exception as e:
             print(f"Ошибка обработки видео: {e}")
@@ -230,12 +301,6 @@ class MainWindow:
     def update_video_display(self, frame: np.ndarray):
         """Обновить отображение видео в интерфейсе"""
         try:
-            # Конвертируем BGR в RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Конвертируем в PIL
-            img = Image.fromarray(rgb_frame)
-            
             # === Получаем размеры контейнера, а не метки (метка может быть ещё не готова) ===
             container_width = self.video_container.winfo_width() - 4  # с учётом padx
             container_height = self.video_container.winfo_height() - 4
@@ -244,11 +309,25 @@ class MainWindow:
             if container_width < 10 or container_height < 10:
                 container_width, container_height = 640, 480  # fallback
 
-            # Масштабируем с сохранением пропорций (опционально)
-            img = img.resize((container_width, container_height), Image.Resampling.LANCZOS)
+            # Сначала масштабируем, потом меняем порядок каналов — обе операции в буферы
+            size = (container_width, container_height)
+            interpolation = (cv2.INTER_AREA if container_width < frame.shape[1]
+                             else cv2.INTER_LINEAR)
+            with self.profiler.stage('display.resize'):
+                scaled = cv2.resize(
+                    frame, size, interpolation=interpolation,
+                    dst=self.display_buffers.get('scaled', (container_height, container_width, 3)))
+                rgb_frame = cv2.cvtColor(
+                    scaled, cv2.COLOR_BGR2RGB,
+                    dst=self.display_buffers.get('rgb', (container_height, container_width, 3)))
+            
+            # Конвертируем в PIL (копия размером с окно, а не с исходный кадр)
+            with self.profiler.stage('display.pil'):
+                img = Image.fromarray(rgb_frame)
             
-            ctk_image = ctk.CTkImage(light_image=img, dark_image=img, size=(container_width, container_height))
-            self.video_label.configure(image=ctk_image, text="")
+            with self.profiler.stage('display.ctk'):
+                ctk_image = ctk.CTkImage(light_image=img, dark_image=img, size=(container_width, container_height))
+                self.video_label.configure(image=ctk_image, text="")
             
             # Сохраняем ссылку, чтобы избежать уничтожения garbage collector'ом
             self.current_video_image = ctk_image
@@ -259,15 +338,14 @@ class MainWindow:
             
     def update_tracking_stats(self, position: tuple, current_time: float):
         """Обновить статистику трекинга"""
-        data = self.object_tracker.get_tracking_data()
-        point_count = len(data)
+        point_count = self.object_tracker.get_point_count()
         current_velocity = self.calculate_current_velocity()
         
         self.tracking_panel.update_stats(point_count, current_time, position, current_velocity)
         
     def calculate_current_velocity(self) -> float:
         """Вычислить текущую скорость"""
-        data = self.object_tracker.get_tracking_data()
+        data = self.object_tracker.get_recent_points(2)
         if len(data) < 2:
             return 0.0
             
@@ -297,10 +375,77 @@ class MainWindow:
                 self.video_controls.enable_controls()
                 self.analyze_btn.configure(state="normal")
                 self.export_btn.configure(state="normal")
+                self.export_video_btn.configure(state="normal")
                 self.update_status(f"Видео загружено: {file_path}")
             else:
                 self.update_status("Ошибка загрузки видео", is_error=True)
                 
+    def open_stream(self):
+        """Подключить камеру или поток"""
+        dialog = ctk.CTkInputDialog(
+            text="Индекс камеры (0, 1, ...), URL потока или путь к каналу:",
+            title="Живой источник"
+        )
+        source = dialog.get_input()
+        if not source:
+            return
+            
+        self.current_video_path = None
+        if self.video_processor.open_stream(parse_source(source)):
+            metadata = self.video_processor.metadata
+            self.video_controls.update_stream_info(source, metadata.width, metadata.height)
+            self.video_controls.enable_controls()
+            self.analyze_btn.configure(state="normal")
+            self.export_btn.configure(state="normal")
+            self.update_status(f"Источник подключен: {source}")
+            self.schedule_live_stats()
+        else:
+            self.update_status(f"Не удалось подключить источник: {source}", is_error=True)
+            
+    def schedule_live_stats(self):
+        """Периодически обновлять статистику живого источника"""
+        stats = self.video_processor.get_live_stats()
+        if not stats:
+            self.live_stats_label.configure(text="")
+            return
+            
+        self.live_stats_label.configure(
+            text=f"Задержка: {stats['mean_ms']:.0f} мс (p95 {stats['p95_ms']:.0f}) | "
+                 f"пропущено кадров: {stats['dropped_frames']}"
+        )
+        self.parent.after(500, self.schedule_live_stats)
+                
+    def toggle_profiling(self, event=None):
+        """Включить или выключить замер этапов обработки кадра"""
+        enabled = not self.profiler.enabled
+        self.profiler.set_enabled(enabled)
+        if enabled:
+            self.profiler.reset()
+            self.update_status("Профилирование включено (F10 — сохранить)")
+            self.schedule_profile_stats()
+        else:
+            self.profile_label.configure(text="")
+            self.update_status("Профилирование выключено")
+            
+    def schedule_profile_stats(self):
+        """Периодически показывать самые медленные этапы в статус-баре"""
+        if not self.profiler.enabled:
+            return
+        self.profile_label.configure(text=self.profiler.format_status())
+        self.parent.after(PROFILER_SETTINGS["status_interval_ms"], self.schedule_profile_stats)
+        
+    def dump_profile(self, event=None):
+        """Сохранить статистику этапов в JSON"""
+        filename = os.path.join(PROFILER_SETTINGS["directory"],
+                                f"profile_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        extra = {'video': self.current_video_path}
+        if self.video_processor.metadata is not None:
+            extra['metadata'] = self.video_processor.metadata.to_dict()
+        if self.profiler.dump(filename, extra):
+            self.update_status(f"Профиль сохранен: {filename}")
+        else:
+            self.update_status("Ошибка сохранения профиля", is_error=True)
+                
     def play_video(self):
         """Воспроизвести видео"""
         if self.video_processor.is_opened():
@@ -322,7 +467,7 @@ class MainWindow:
         self.is_tracking = is_tracking
         
         if self.is_tracking:
-            self.object_tracker.start_tracking()
+            self.object_tracker.start_tracking(log_path=self.new_trajectory_log_path())
             self.start_time = time.time()
             self.tracking_status_label.configure(text="Трекинг: включен", 
                                                text_color=COLORS["success"])
@@ -333,34 +478,168 @@ class MainWindow:
                                                text_color=COLORS["text_secondary"])
             self.update_status("Трекинг остановлен")
             
+    def new_trajectory_log_path(self) -> Optional[str]:
+        """Путь к журналу траектории для нового сеанса трекинга"""
+        if not TRAJECTORY_LOG_SETTINGS["enabled"]:
+            return None
+        name = "session"
+        if self.current_video_path:
+            name = os.path.splitext(os.path.basename(self.current_video_path))[0]
+        filename = f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.traj"
+        return os.path.join(TRAJECTORY_LOG_SETTINGS["directory"], filename)
+            
     def apply_tracking_settings(self, settings: dict):
         """Применить настройки трекинга"""
         if settings:
+            # Параметры выборки относятся к видео, а не к трекеру
+            sample_rate = settings.pop('sample_rate', 0)
+            adaptive = settings.pop('adaptive_sampling', False)
+            self.video_processor.set_sampler(FrameSampler(target_rate=sample_rate, adaptive=adaptive))
             self.object_tracker.update_settings(settings)
             self.update_status("Настройки трекинга применены")
         else:
             self.update_status("Ошибка: проверьте значения настроек", is_error=True)
             
+    def start_hsv_autotune(self):
+        """
+        Автоподбор порогов HSV
+        
+        Первое нажатие включает отметку объекта на видео (щелчок или рамка
+        на нескольких кадрах), второе — запускает перебор настроек в фоне.
+        """
+        if not self.current_video_path:
+            self.update_status("Автоподбор работает по открытому видео файлу", is_error=True)
+            return
+        if not self.hsv_marking:
+            self.pause_video()
+            self.hsv_samples = []
+            self.hsv_marking = True
+            self.video_label.bind("<ButtonPress-1>", self.on_video_press)
+            self.video_label.bind("<ButtonRelease-1>", self.on_video_release)
+            self.tracking_panel.set_autotune_state(marked=0)
+            self.update_status("Отметьте объект щелчком или рамкой на нескольких кадрах, "
+                               "затем нажмите «Подобрать»")
+            return
+        
+        self.finish_hsv_marking()
+        if not self.hsv_samples:
+            self.update_status("Автоподбор отменён: объект не отмечен")
+            return
+        
+        samples = self.hsv_samples
+        video_path = self.current_video_path
+        
+        def report(current, total):
+            self.parent.after(0, lambda: self.progress_bar.set(current / total))
+        
+        def run():
+            try:
+                result = HsvAutoTuner(progress_callback=report).tune(video_path, samples)
+                self.parent.after(0, lambda: self.apply_hsv_autotune(result))
+            except Exception as e:
+                error = f"Ошибка автоподбора: {e}"
+                self.parent.after(0, lambda: self.update_status(error, is_error=True))
+            finally:
+                self.parent.after(0, lambda: self.tracking_panel.set_autotune_state())
+        
+        self.tracking_panel.set_autotune_state(busy=True)
+        self.update_status(f"Подбор настроек по {len(samples)} отмеченным областям...")
+        threading.Thread(target=run, name="hsv-autotune", daemon=True).start()
+        
+    def finish_hsv_marking(self):
+        """Выключить отметку объекта на видео"""
+        self.hsv_marking = False
+        self.hsv_drag_start = None
+        self.video_label.unbind("<ButtonPress-1>")
+        self.video_label.unbind("<ButtonRelease-1>")
+        
+    def display_to_frame(self, x: int, y: int, frame: np.ndarray) -> tuple:
+        """Координаты на изображении в окне → координаты кадра (кадр растянут на всю метку)"""
+        label_width = max(1, self.video_label.winfo_width())
+        label_height = max(1, self.video_label.winfo_height())
+        height, width = frame.shape[:2]
+        return x * width / label_width, y * height / label_height
+        
+    def on_video_press(self, event):
+        """Начало отметки объекта"""
+        self.hsv_drag_start = (event.x, event.y)
+        
+    def on_video_release(self, event):
+        """Конец отметки: короткий щелчок — квадрат вокруг точки, перетаскивание — рамка"""
+        frame = self.video_processor.current_frame
+        if frame is None or self.hsv_drag_start is None:
+            return
+        x0, y0 = self.display_to_frame(*self.hsv_drag_start, frame)
+        x1, y1 = self.display_to_frame(event.x, event.y, frame)
+        self.hsv_drag_start = None
+        if abs(x1 - x0) < 5 and abs(y1 - y0) < 5:
+            box = click_box(x1, y1)
+        else:
+            box = (int(min(x0, x1)), int(min(y0, y1)), int(abs(x1 - x0)), int(abs(y1 - y0)))
+        
+        self.hsv_samples.append((frame.copy(), box))
+        self.tracking_panel.set_autotune_state(marked=len(self.hsv_samples))
+        self.update_status(f"Отмечено областей: {len(self.hsv_samples)} — перейдите к другому кадру "
+                           "или нажмите «Подобрать»")
+        
+    def apply_hsv_autotune(self, result: dict):
+        """Применить подобранные настройки к трекеру и показать их в панели"""
+        self.object_tracker.update_settings(result['settings'])
+        self.tracking_panel.set_settings(result['settings'])
+        self.progress_bar.set(0)
+        self.update_status(f"Настройки подобраны: распознано {result['detection_rate']:.0%} кадров, "
+                           f"попаданий в отметки {result['label_hits']:.0%} "
+                           f"({result['candidates']} вариантов)")
+        
     def start_analysis(self):
         """Начать анализ движения"""
-        tracking_data = self.object_tracker.get_tracking_data()
-        if not tracking_data:
+        tracking_columns = self.object_tracker.get_tracking_columns()
+        point_count = len(tracking_columns['timestamp'])
+        if point_count == 0:
             self.update_status("Нет данных для анализа", is_error=True)
             return
             
         self.update_status("Анализ движения начат")
         
+        metadata = self.video_processor.metadata
+        frame_size = (metadata.width, metadata.height) if metadata is not None else None
+        
         # Загружаем данные в анализатор
-        self.data_analyzer.load_data(tracking_data)
+        self.data_analyzer.set_calibration(self.calibration_profile, frame_size)
+        self.data_analyzer.load_columns(tracking_columns)
         results = self.data_analyzer.analyze_movement()
         
         # Показываем панель результатов
         self.show_results_panel()
         
         # Обновляем графики
-        self.results_panel.update_plots(tracking_data)
+        self.results_panel.update_plots(tracking_columns, self.calibration_profile, frame_size)
         
-        self.update_status(f"Анализ завершен: {len(tracking_data)} точек")
+        self.update_status(f"Анализ завершен: {point_count} точек")
+        
+    def load_calibration(self):
+        """Выбрать профиль калибровки камеры (повторный выбор без файла — сброс)"""
+        os.makedirs(CALIBRATION_SETTINGS["directory"], exist_ok=True)
+        filename = filedialog.askopenfilename(
+            title="Профиль калибровки камеры",
+            initialdir=CALIBRATION_SETTINGS["directory"],
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            self.calibration_profile = None
+            self.calibration_btn.configure(text="📐 Калибровка")
+            self.update_status("Калибровка сброшена: анализ в пикселях")
+            return
+        
+        try:
+            self.calibration_profile = load_profile(filename)
+        except Exception as e:
+            self.update_status(f"Ошибка загрузки калибровки: {e}", is_error=True)
+            return
+        
+        self.calibration_btn.configure(text=f"📐 {self.calibration_profile.name}")
+        self.update_status(f"Калибровка: {self.calibration_profile.name} "
+                           f"({self.calibration_profile.units})")
         
     def show_results_panel(self):
         """Показать панель результатов"""
@@ -414,7 +693,7 @@ class MainWindow:
             # Экспорт сырых данных
             raw_file = filedialog.asksaveasfilename(
                 defaultextension=".json",
-                filetypes=[("JSON files", "*.json")]
+                filetypes=[("JSON files", "*.json"), ("NumPy columnar", "*.npz")]
             )
             if raw_file and self.object_tracker.export_data(raw_file):
                 self.update_status(f"Данные экспортированы в {raw_file}")
@@ -430,10 +709,50 @@ class MainWindow:
         except Exception as e:
             self.update_status(f"Ошибка экспорта: {str(e)}", is_error=True)
         
+    def export_annotated_video(self):
+        """Записать видео с маркером, следом и скоростью (в фоновом потоке)"""
+        if not self.current_video_path:
+            return
+        columns = self.object_tracker.get_tracking_columns()
+        if len(columns['timestamp']) == 0:
+            self.update_status("Нет данных трекинга для разметки", is_error=True)
+            return
+        output_file = filedialog.asksaveasfilename(
+            defaultextension=".mp4",
+            filetypes=[("MP4 video", "*.mp4"), ("AVI video", "*.avi")]
+        )
+        if not output_file:
+            return
+        
+        def report(current, total):
+            if total > 0 and current % 25 == 0:
+                self.parent.after(0, lambda: self.progress_bar.set(current / total))
+        
+        def run():
+            try:
+                exporter = VideoExporter(progress_callback=report)
+                summary = exporter.export(self.current_video_path, output_file, columns,
+                                          self.calibration_profile)
+                message = f"Видео с разметкой сохранено: {output_file} ({summary['frames']} кадров)"
+                self.parent.after(0, lambda: self.update_status(message))
+            except Exception as e:
+                error = f"Ошибка экспорта видео: {e}"
+                self.parent.after(0, lambda: self.update_status(error, is_error=True))
+            finally:
+                self.parent.after(0, lambda: self.export_video_btn.configure(state="normal"))
+        
+        self.export_video_btn.configure(state="disabled")
+        self.update_status("Экспорт видео с разметкой...")
+        threading.Thread(target=run, name="annotated-export", daemon=True).start()
+        
     def reset_analysis(self):
         """Сбросить анализ"""
         self.video_processor.close_video()
         self.object_tracker.clear_tracking_data()
+        if self.hsv_marking:
+            self.finish_hsv_marking()
+            self.tracking_panel.set_autotune_state()
+        self.hsv_samples = []
         self.current_video_path = None
         self.is_playing = False
         self.is_tracking = False
@@ -445,6 +764,7 @@ class MainWindow:
         self.tracking_panel.clear_stats()
         self.analyze_btn.configure(state="disabled")
         self.export_btn.configure(state="disabled")
+        self.export_video_btn.configure(state="disabled")
         self.tracking_status_label.configure(text="Трекинг: выключен")
         self.progress_bar.set(0)
         
@@ -465,4 +785,5 @@ class MainWindow:
     def on_closing(self):
         """Обработка закрытия приложения"""
         self.video_processor.close_video()
+        self.object_tracker.close_trajectory_log()
         print("Приложение закрыто")
\ No newline at end of file
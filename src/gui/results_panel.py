@@ -3,16 +3,22 @@
 """
 import customtkinter as ctk
 import tkinter as tk
-from typing import Optional, Callable
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+from typing import Optional, Callable, TYPE_CHECKING
 import numpy as np
-import io
-from PIL import Image
+from tkinter import filedialog
 
 from utils.constants import COLORS, UI_SETTINGS
-from core.data_analyzer import DataAnalyzer
+from utils.lazy_import import lazy_import
+from core.data_analyzer import DataAnalyzer, UNIT_LABELS
+from core.spatial_analysis import load_zones
+from core.derivatives import METHOD_LABELS
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+# matplotlib загружается только при первом построении графиков
+plt = lazy_import("matplotlib.pyplot")
+backend_tkagg = lazy_import("matplotlib.backends.backend_tkagg")
 
 
 class ResultsPanel:
@@ -39,9 +45,59 @@ class ResultsPanel:
         )
         title_label.pack(pady=UI_SETTINGS["padding_medium"])
         
+        # Выбор временного диапазона
+        self.setup_zoom_bar()
+        
         # Вкладки для разных типов графиков
         self.setup_tabs()
         
+    def setup_zoom_bar(self):
+        """Поля диапазона времени для приближения графиков"""
+        zoom_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        zoom_frame.pack(fill="x", padx=UI_SETTINGS["padding_medium"])
+        
+        ctk.CTkLabel(zoom_frame, text="Время с", text_color=COLORS["text"]).pack(side="left")
+        self.zoom_start_entry = ctk.CTkEntry(zoom_frame, width=80, height=UI_SETTINGS["input_height"])
+        self.zoom_start_entry.pack(side="left", padx=5)
+        
+        ctk.CTkLabel(zoom_frame, text="по", text_color=COLORS["text"]).pack(side="left")
+        self.zoom_end_entry = ctk.CTkEntry(zoom_frame, width=80, height=UI_SETTINGS["input_height"])
+        self.zoom_end_entry.pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            zoom_frame,
+            text="Показать",
+            command=self.apply_zoom,
+            width=90,
+            height=UI_SETTINGS["input_height"],
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        ).pack(side="left", padx=5)
+        
+        ctk.CTkButton(
+            zoom_frame,
+            text="Весь диапазон",
+            command=self.reset_zoom,
+            width=110,
+            height=UI_SETTINGS["input_height"],
+            fg_color=COLORS["bg_lighter"],
+            hover_color=COLORS["secondary"]
+        ).pack(side="left", padx=5)
+        
+        self.zoom_label = ctk.CTkLabel(zoom_frame, text="", text_color=COLORS["text_secondary"])
+        self.zoom_label.pack(side="left", padx=10)
+        
+        # Метод расчёта скорости и ускорения
+        self.method_menu = ctk.CTkOptionMenu(
+            zoom_frame,
+            values=list(METHOD_LABELS.values()),
+            command=self.on_method_change,
+            height=UI_SETTINGS["input_height"]
+        )
+        self.method_menu.set(METHOD_LABELS[self.data_analyzer.derivative_method])
+        self.method_menu.pack(side="right")
+        ctk.CTkLabel(zoom_frame, text="Производные:", text_color=COLORS["text"]).pack(side="right", padx=5)
+        
     def setup_tabs(self):
         """Настройка вкладок с графиками"""
         self.tabview = ctk.CTkTabview(self.main_frame, fg_color=COLORS["bg_light"])
@@ -52,12 +108,16 @@ class ResultsPanel:
         self.tabview.add("Траектория")
         self.tabview.add("Скорость")
         self.tabview.add("Ускорение")
+        self.tabview.add("Карта")
+        self.tabview.add("Спектр")
         self.tabview.add("Статистика")
         
         # Настраиваем каждую вкладку
         self.setup_trajectory_tab()
         self.setup_velocity_tab()
         self.setup_acceleration_tab()
+        self.setup_heatmap_tab()
+        self.setup_spectrum_tab()
         self.setup_stats_tab()
         
     def setup_trajectory_tab(self):
@@ -114,6 +174,68 @@ class ResultsPanel:
         
         self.acceleration_canvas = None
         
+    def setup_heatmap_tab(self):
+        """Настройка вкладки карты пребывания и зон"""
+        tab = self.tabview.tab("Карта")
+        
+        btn_frame = ctk.CTkFrame(tab, fg_color="transparent")
+        btn_frame.pack(fill="x", padx=10, pady=(10, 0))
+        
+        ctk.CTkButton(
+            btn_frame,
+            text="Загрузить зоны",
+            command=self.load_zones,
+            height=UI_SETTINGS["input_height"],
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        ).pack(side="left", padx=(0, 5))
+        
+        ctk.CTkButton(
+            btn_frame,
+            text="Экспорт карты и зон",
+            command=self.export_spatial,
+            height=UI_SETTINGS["input_height"],
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        ).pack(side="left", padx=5)
+        
+        self.zones_label = ctk.CTkLabel(
+            btn_frame,
+            text="Зоны не заданы",
+            text_color=COLORS["text_secondary"]
+        )
+        self.zones_label.pack(side="left", padx=10)
+        
+        plot_frame = ctk.CTkFrame(tab, fg_color=COLORS["bg_light"])
+        plot_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.heatmap_placeholder = ctk.CTkLabel(
+            plot_frame,
+            text="Карта времени пребывания появится после анализа",
+            font=ctk.CTkFont(size=14),
+            text_color=COLORS["text_secondary"]
+        )
+        self.heatmap_placeholder.pack(expand=True)
+        
+        self.heatmap_canvas = None
+        
+    def setup_spectrum_tab(self):
+        """Настройка вкладки частотного анализа"""
+        tab = self.tabview.tab("Спектр")
+        
+        plot_frame = ctk.CTkFrame(tab, fg_color=COLORS["bg_light"])
+        plot_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.spectrum_placeholder = ctk.CTkLabel(
+            plot_frame,
+            text="Спектр движения появится после анализа",
+            font=ctk.CTkFont(size=14),
+            text_color=COLORS["text_secondary"]
+        )
+        self.spectrum_placeholder.pack(expand=True)
+        
+        self.spectrum_canvas = None
+        
     def setup_stats_tab(self):
         """Настройка вкладки статистики"""
         tab = self.tabview.tab("Статистика")
@@ -133,19 +255,25 @@ class ResultsPanel:
         self.stats_text.insert("1.0", "Статистика появится после анализа данных...")
         self.stats_text.configure(state="disabled")
         
-    def update_plots(self, tracking_data: list):
-        """Обновить все графики на основе данных трекинга"""
-        if not tracking_data:
+    def update_plots(self, tracking_data, calibration=None, frame_size=None):
+        """Обновить все графики на основе данных трекинга (список точек или колонки)"""
+        # Загружаем данные в анализатор (в единицах профиля калибровки, если он задан)
+        self.data_analyzer.set_calibration(calibration, frame_size)
+        if isinstance(tracking_data, dict):
+            self.data_analyzer.load_columns(tracking_data)
+        else:
+            self.data_analyzer.load_data(tracking_data or [])
+        if self.data_analyzer.point_count() == 0:
             return
             
-        # Загружаем данные в анализатор
-        self.data_analyzer.load_data(tracking_data)
         analysis_results = self.data_analyzer.analyze_movement()
         
         # Обновляем графики
         self.update_trajectory_plot()
         self.update_velocity_plot()
         self.update_acceleration_plot()
+        self.update_heatmap_plot()
+        self.update_spectrum_plot()
         self.update_stats_text(analysis_results)
         
     def update_trajectory_plot(self):
@@ -160,6 +288,53 @@ class ResultsPanel:
         if fig and self.tabview.tab("Скорость").winfo_exists():
             self._embed_plot(fig, "Скорость", self.velocity_placeholder, self.velocity_canvas)
         
+    def update_heatmap_plot(self):
+        """Пересчитать и обновить карту пребывания"""
+        if not self.data_analyzer.analyze_spatial():
+            return
+        fig = self.data_analyzer.create_heatmap_plot()
+        if fig and self.tabview.tab("Карта").winfo_exists():
+            self._embed_plot(fig, "Карта", self.heatmap_placeholder, self.heatmap_canvas)
+        
+    def update_spectrum_plot(self):
+        """Пересчитать и обновить спектры"""
+        if not self.data_analyzer.analyze_spectrum():
+            return
+        fig = self.data_analyzer.create_spectrum_plot()
+        if fig and self.tabview.tab("Спектр").winfo_exists():
+            self._embed_plot(fig, "Спектр", self.spectrum_placeholder, self.spectrum_canvas)
+        
+    def load_zones(self):
+        """Загрузить зоны из JSON и пересчитать карту"""
+        filename = filedialog.askopenfilename(
+            title="Зоны (многоугольники)",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            zones = load_zones(filename)
+        except Exception as e:
+            self.zones_label.configure(text=f"Ошибка загрузки зон: {e}", text_color=COLORS["error"])
+            return
+        
+        self.data_analyzer.set_zones(zones)
+        self.zones_label.configure(text=f"Зон: {len(zones)}", text_color=COLORS["text_secondary"])
+        if self.data_analyzer.point_count():
+            self.update_heatmap_plot()
+            self.update_stats_text(self.data_analyzer.analysis_results)
+        
+    def export_spatial(self):
+        """Сохранить карту пребывания и статистику зон"""
+        if self.data_analyzer.point_count() == 0:
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV по зонам", "*.csv"), ("Карта и зоны (NumPy)", "*.npz")]
+        )
+        if filename and not self.data_analyzer.export_spatial(filename):
+            self.zones_label.configure(text="Ошибка экспорта", text_color=COLORS["error"])
+        
     def update_acceleration_plot(self):
         """Обновить график ускорения"""
         # Создаем график ускорения
@@ -167,9 +342,9 @@ class ResultsPanel:
         if fig and self.tabview.tab("Ускорение").winfo_exists():
             self._embed_plot(fig, "Ускорение", self.acceleration_placeholder, self.acceleration_canvas)
         
-    def _create_acceleration_plot(self) -> Optional[Figure]:
+    def _create_acceleration_plot(self) -> Optional["Figure"]:
         """Создать график ускорения"""
-        if not self.data_analyzer.analysis_results.get('accelerations'):
+        if not len(self.data_analyzer.analysis_results.get('accelerations', [])):
             return None
             
         fig, ax = plt.subplots(figsize=(8, 5))
@@ -181,7 +356,8 @@ class ResultsPanel:
         
         ax.plot(timestamps, accelerations, 'g-', linewidth=2, label='Ускорение')
         ax.set_xlabel('Время (с)', color='white')
-        ax.set_ylabel('Ускорение (пикс/с²)', color='white')
+        unit = UNIT_LABELS.get(self.data_analyzer.units, self.data_analyzer.units)
+        ax.set_ylabel(f'Ускорение ({unit}/с²)', color='white')
         ax.set_title('Ускорение движения объекта', color='white')
         ax.grid(True, alpha=0.3)
         ax.legend()
@@ -194,7 +370,96 @@ class ResultsPanel:
         fig.tight_layout()
         return fig
         
-    def _embed_plot(self, fig: Figure, tab_name: str, placeholder, canvas_var):
+    def on_method_change(self, label: str):
+        """Пересчитать скорость и ускорение выбранным методом"""
+        method = next(key for key, value in METHOD_LABELS.items() if value == label)
+        self.data_analyzer.set_derivative_method(method)
+        if self.data_analyzer.point_count() == 0:
+            return
+        analysis_results = self.data_analyzer.analyze_movement()
+        self.update_velocity_plot()
+        self.update_acceleration_plot()
+        self.update_stats_text(analysis_results)
+        
+    def apply_zoom(self):
+        """Приблизить графики к диапазону из полей ввода (пустое поле — без границы)"""
+        try:
+            start = self.zoom_start_entry.get().strip()
+            end = self.zoom_end_entry.get().strip()
+            start_time = float(start) if start else None
+            end_time = float(end) if end else None
+        except ValueError:
+            self.zoom_label.configure(text="Время задаётся в секундах", text_color=COLORS["error"])
+            return
+        self.zoom_to_range(start_time, end_time)
+        
+    def zoom_to_range(self, start_time: Optional[float], end_time: Optional[float]):
+        """
+        Показать на графиках только диапазон времени
+        
+        Точки окна находятся двоичным поиском, статистика окна — по
+        накопленным суммам, а графики не перестраиваются: меняются только
+        границы осей.
+        """
+        if self.data_analyzer.point_count() == 0:
+            return
+        query = self.data_analyzer.query()
+        start, stop = query.index_range(start_time, end_time)
+        if stop - start == 0:
+            self.zoom_label.configure(text="В диапазоне нет точек", text_color=COLORS["warning"])
+            return
+        
+        t0, t1 = query.timestamps[start], query.timestamps[stop - 1]
+        results = self.data_analyzer.analysis_results
+        for canvas, key in ((self.velocity_canvas, 'velocities'),
+                            (self.acceleration_canvas, 'accelerations')):
+            values = results.get(key)
+            if canvas is None or values is None or not len(values):
+                continue
+            ax = canvas.figure.axes[0]
+            window = values[start:stop]
+            low, high = float(window.min()), float(window.max())
+            margin = (high - low) * 0.05 or 1.0
+            if t1 > t0:
+                ax.set_xlim(t0, t1)
+            ax.set_ylim(low - margin, high + margin)
+            canvas.draw_idle()
+            
+        if self.trajectory_canvas is not None:
+            columns = self.data_analyzer.columns
+            x = columns['x'][start:stop]
+            y = columns['y'][start:stop]
+            if self.data_analyzer.units == 'px':
+                # На графике траектории ось Y изображения перевёрнута
+                y = columns['y'].max() - y
+            ax = self.trajectory_canvas.figure.axes[0]
+            margin = max(float(x.max() - x.min()), float(y.max() - y.min())) * 0.05 or 1.0
+            ax.set_xlim(float(x.min()) - margin, float(x.max()) + margin)
+            ax.set_ylim(float(y.min()) - margin, float(y.max()) + margin)
+            self.trajectory_canvas.draw_idle()
+            
+        stats = query.window_stats(start_time, end_time)
+        unit = self.data_analyzer.units
+        self.zoom_label.configure(
+            text=(f"{stats['points']} точек, {stats['duration']:.2f} с, "
+                  f"путь {stats['distance']:.2f} {unit}, средняя скорость {stats['mean_speed']:.2f} {unit}/с"),
+            text_color=COLORS["text_secondary"]
+        )
+        
+    def reset_zoom(self):
+        """Вернуть полный диапазон на всех графиках"""
+        for canvas in (self.trajectory_canvas, self.velocity_canvas, self.acceleration_canvas):
+            if canvas is None:
+                continue
+            ax = canvas.figure.axes[0]
+            ax.relim()
+            ax.autoscale()
+            canvas.draw_idle()
+        self.zoom_start_entry.delete(0, "end")
+        self.zoom_end_entry.delete(0, "end")
+        self.zoom_label.configure(text="")
+        
+    def _embed_plot(self, fig: "Figure", tab_name: str, placeholder, canvas_var):
         """Встроить график matplotlib в интерфейс"""
         try:
             # Удаляем старый canvas если есть
@@ -206,7 +471,7 @@ class ResultsPanel:
             
             # Создаем новый canvas
             tab = self.tabview.tab(tab_name)
-            canvas = FigureCanvasTkAgg(fig, tab)
+            canvas = backend_tkagg.FigureCanvasTkAgg(fig, tab)
             canvas.draw()
             
             # Получаем tkinter виджет и размещаем его
@@ -221,6 +486,10 @@ class ResultsPanel:
                 self.velocity_canvas = canvas
             elif tab_name == "Ускорение":
                 self.acceleration_canvas = canvas
+            elif tab_name == "Карта":
+                self.heatmap_canvas = canvas
+            elif tab_name == "Спектр":
+                self.spectrum_canvas = canvas
                 
             # Сохраняем figure для предотвращения сборки мусора
             self.current_figures.append(fig)
@@ -241,13 +510,31 @@ class ResultsPanel:
         self.stats_text.configure(state="normal")
         self.stats_text.delete("1.0", "end")
         
+        unit = analysis_results.get('units', 'px')
         stats_text = "=== СТАТИСТИКА АНАЛИЗА ===\n\n"
         stats_text += f"Общее время: {analysis_results['total_time']:.2f} с\n"
-        stats_text += f"Общее расстояние: {analysis_results['total_distance']:.2f} px\n"
-        stats_text += f"Макс. скорость: {analysis_results['max_velocity']:.2f} px/с\n"
-        stats_text += f"Макс. ускорение: {analysis_results['max_acceleration']:.2f} px/с²\n"
-        stats_text += f"Средняя скорость: {analysis_results['avg_velocity']:.2f} px/с\n"
+        stats_text += f"Общее расстояние: {analysis_results['total_distance']:.2f} {unit}\n"
+        stats_text += f"Макс. скорость: {analysis_results['max_velocity']:.2f} {unit}/с\n"
+        stats_text += f"Макс. ускорение: {analysis_results['max_acceleration']:.2f} {unit}/с²\n"
+        stats_text += f"Средняя скорость: {analysis_results['avg_velocity']:.2f} {unit}/с\n"
         stats_text += f"Количество точек: {len(analysis_results['timestamps'])}\n"
+        method = analysis_results.get('derivative_method')
+        if method:
+            stats_text += f"Метод производных: {METHOD_LABELS.get(method, method)}\n"
+        
+        spectrum = self.data_analyzer.spectral_results
+        if spectrum:
+            stats_text += "\n=== ЧАСТОТЫ ===\n\n"
+            for name, channel in spectrum['channels'].items():
+                stats_text += (f"{name}: {channel['dominant_frequency']:.3f} Гц "
+                               f"(период {channel['dominant_period']:.2f} с)\n")
+        
+        zones = self.data_analyzer.spatial_results.get('zones', [])
+        if zones:
+            stats_text += "\n=== ЗОНЫ ===\n\n"
+        for zone in zones:
+            stats_text += (f"{zone['zone']}: {zone['time']:.2f} с ({zone['share']:.0%}), "
+                           f"входов {zone['entries']}, выходов {zone['exits']}\n")
         
         self.stats_text.insert("1.0", stats_text)
         self.stats_text.configure(state="disabled")
@@ -263,6 +550,8 @@ class ResultsPanel:
         self.trajectory_placeholder.pack(expand=True)
         self.velocity_placeholder.pack(expand=True)
         self.acceleration_placeholder.pack(expand=True)
+        self.heatmap_placeholder.pack(expand=True)
+        self.spectrum_placeholder.pack(expand=True)
         
         # Очищаем текстовую статистику
         self.stats_text.configure(state="normal")
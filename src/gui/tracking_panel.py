@@ -2,7 +2,7 @@
 Панель настроек трекинга
 """
 import customtkinter as ctk
-from typing import Dict, Callable
+from typing import Dict, Callable, Optional
 from utils.constants import COLORS, UI_SETTINGS
 
 
@@ -10,10 +10,12 @@ class TrackingPanel:
     """Панель настроек трекинга и статистики"""
     
     def __init__(self, parent, toggle_tracking_callback: Callable, 
-                 apply_settings_callback: Callable):
+                 apply_settings_callback: Callable,
+                 autotune_callback: Optional[Callable] = None):
         self.parent = parent
         self.toggle_tracking_callback = toggle_tracking_callback
         self.apply_settings_callback = apply_settings_callback
+        self.autotune_callback = autotune_callback
         self.is_tracking = False
         
         self.setup_ui()
@@ -56,6 +58,18 @@ class TrackingPanel:
         )
         self.apply_btn.pack(fill="x", pady=UI_SETTINGS["padding_small"])
         
+        # Автоподбор порогов по отмеченному объекту
+        if self.autotune_callback:
+            self.autotune_btn = ctk.CTkButton(
+                self.main_frame,
+                text="🎨 Автоподбор HSV",
+                command=self.autotune_callback,
+                height=UI_SETTINGS["button_height"],
+                fg_color=COLORS["primary"],
+                hover_color=COLORS["secondary"]
+            )
+            self.autotune_btn.pack(fill="x", pady=UI_SETTINGS["padding_small"])
+        
         # Статистика трекинга
         self.setup_stats_section()
         
@@ -103,6 +117,21 @@ class TrackingPanel:
         self.val_high.insert(0, "255")
         self.val_high.pack(side="left", padx=2)
         
+        # Прореживание кадров
+        rate_frame = ctk.CTkFrame(color_frame, fg_color="transparent")
+        rate_frame.pack(fill="x", pady=2)
+        
+        ctk.CTkLabel(rate_frame, text="Выборка, Гц:", width=120).pack(side="left")
+        self.sample_rate = ctk.CTkEntry(rate_frame, width=60, placeholder_text="0")
+        self.sample_rate.insert(0, "0")
+        self.sample_rate.pack(side="left", padx=2)
+        self.adaptive_sampling = ctk.CTkCheckBox(rate_frame, text="адапт.", width=60)
+        self.adaptive_sampling.pack(side="left", padx=2)
+        
+        # Перенос позиции, пока объект неподвижен
+        self.skip_stationary = ctk.CTkCheckBox(color_frame, text="Не распознавать неподвижный объект")
+        self.skip_stationary.pack(anchor="w", pady=2)
+        
     def setup_stats_section(self):
         """Настройка раздела статистики"""
         stats_frame = ctk.CTkFrame(self.main_frame, fg_color=COLORS["bg_light"])
@@ -143,7 +172,10 @@ class TrackingPanel:
                 'saturation_low': int(self.sat_low.get() or 100),
                 'saturation_high': int(self.sat_high.get() or 255),
                 'value_low': int(self.val_low.get() or 100),
-                'value_high': int(self.val_high.get() or 255)
+                'value_high': int(self.val_high.get() or 255),
+                'skip_stationary': bool(self.skip_stationary.get()),
+                'sample_rate': float(self.sample_rate.get() or 0),
+                'adaptive_sampling': bool(self.adaptive_sampling.get())
             }
             self.apply_settings_callback(settings)
         except ValueError:
@@ -159,11 +191,40 @@ class TrackingPanel:
                 'saturation_low': int(self.sat_low.get() or 100),
                 'saturation_high': int(self.sat_high.get() or 255),
                 'value_low': int(self.val_low.get() or 100),
-                'value_high': int(self.val_high.get() or 255)
+                'value_high': int(self.val_high.get() or 255),
+                'skip_stationary': bool(self.skip_stationary.get())
             }
         except ValueError:
             return {}
             
+    def set_settings(self, settings: Dict):
+        """Показать в полях пороги HSV (например, после автоподбора)"""
+        entries = {
+            'hue_low': self.hue_low, 'hue_high': self.hue_high,
+            'saturation_low': self.sat_low, 'saturation_high': self.sat_high,
+            'value_low': self.val_low, 'value_high': self.val_high
+        }
+        for key, entry in entries.items():
+            if key in settings:
+                entry.delete(0, "end")
+                entry.insert(0, str(int(settings[key])))
+                
+    def set_autotune_state(self, marked: Optional[int] = None, busy: bool = False):
+        """
+        Состояние кнопки автоподбора
+        
+        marked — число отмеченных областей (None — отметка не идёт),
+        busy — идёт перебор настроек.
+        """
+        if not self.autotune_callback:
+            return
+        if busy:
+            self.autotune_btn.configure(text="⏳ Подбор настроек...", state="disabled")
+        elif marked is None:
+            self.autotune_btn.configure(text="🎨 Автоподбор HSV", state="normal")
+        else:
+            self.autotune_btn.configure(text=f"✅ Подобрать (отмечено: {marked})", state="normal")
+            
     def update_stats(self, point_count: int, current_time: float, 
                     current_position: tuple, current_velocity: float):
         """Обновить статистику трекинга"""
@@ -175,7 +236,7 @@ class TrackingPanel:
             if point_count > 0:
                 stats_text += f"Время: {current_time:.1f}с\n"
                 if current_position:
-                    stats_text += f"Позиция: ({current_position[0]}, {current_position[1]})\n"
+                    stats_text += f"Позиция: ({current_position[0]:.1f}, {current_position[1]:.1f})\n"
                 stats_text += f"Скорость: {current_velocity:.1f} px/s"
             else:
                 stats_text += "Трекинг не активен\n\n"
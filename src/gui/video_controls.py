@@ -11,9 +11,11 @@ class VideoControls:
     """Панель управления видео"""
     
     def __init__(self, parent, open_video_callback: Callable, play_callback: Callable, 
-                 pause_callback: Callable, reset_callback: Callable):
+                 pause_callback: Callable, reset_callback: Callable,
+                 open_stream_callback: Optional[Callable] = None):
         self.parent = parent
         self.open_video_callback = open_video_callback
+        self.open_stream_callback = open_stream_callback
         self.play_callback = play_callback
         self.pause_callback = pause_callback
         self.reset_callback = reset_callback
@@ -47,6 +49,18 @@ class VideoControls:
         )
         self.open_btn.pack(fill="x", pady=UI_SETTINGS["padding_small"])
         
+        # Кнопка подключения камеры / потока
+        if self.open_stream_callback:
+            self.stream_btn = ctk.CTkButton(
+                self.main_frame,
+                text="📷 Камера / поток",
+                command=self.open_stream_callback,
+                height=UI_SETTINGS["button_height"],
+                fg_color=COLORS["primary"],
+                hover_color=COLORS["secondary"]
+            )
+            self.stream_btn.pack(fill="x", pady=UI_SETTINGS["padding_small"])
+        
         # Информация о видео
         self.video_info_label = ctk.CTkLabel(
             self.main_frame,
@@ -107,6 +121,14 @@ class VideoControls:
         else:
             self.video_info_label.configure(text="Видео не загружено")
             
+    def update_stream_info(self, source: str, width: int, height: int):
+        """Показать информацию о живом источнике"""
+        self.current_video_path = None
+        info_text = f"Источник: {source}\n"
+        info_text += f"Размер: {width}x{height}\n"
+        info_text += "Режим: реальное время"
+        self.video_info_label.configure(text=info_text)
+            
     def enable_controls(self):
         """Активировать элементы управления"""
         self.play_btn.configure(state="normal")
@@ -10,10 +10,14 @@ sys.path.insert(0, os.path.dirname(__file__))
 import customtkinter as ctk
 from gui.main_window import MainWindow
 from utils.constants import setup_theme, APP_SETTINGS
+from utils.runtime_config import configure_runtime, MODE_GUI
 
 
 def main():
     """Запуск главного окна приложения"""
+    # Потоки OpenCV (применятся при первой загрузке cv2)
+    configure_runtime(MODE_GUI)
+    
     # Настройка темы
     setup_theme()
     
@@ -0,0 +1,507 @@
+"""
+Локальный сервис трекинга с HTTP/JSON API
+
+Сервер слушает только loopback-интерфейс и принимает запросы только с
+заголовком Host на loopback-адрес и без заголовка Origin — страница в
+браузере не может обратиться к сервису (в том числе через DNS rebinding).
+POST принимается только с Content-Type: application/json. Задачи выполняются на
+ограниченном пуле потоков внутри одного процесса: импорты OpenCV/numpy
+и кэш метаданных видео остаются «тёплыми» между задачами, поэтому накладные
+расходы на задачу — миллисекунды, а не запуск нового процесса.
+
+API:
+    GET    /health                    состояние сервиса
+    POST   /jobs                      {"path": ..., "settings": {...}, "sampling": {...}}
+    GET    /jobs                      список задач
+    GET    /jobs/<id>                 статус и прогресс задачи
+    GET    /jobs/<id>/events          поток прогресса (NDJSON, chunked)
+    GET    /jobs/<id>/result          сводка анализа
+    GET    /jobs/<id>/trajectory      траектория (?format=json|npz)
+    DELETE /jobs/<id>                 отменить задачу
+
+Завершённые задачи хранятся finished_job_ttl секунд и не больше
+max_finished_jobs штук, затем удаляются вместе с траекторией. Отменённая
+или упавшая задача удаляет свой журнал и контрольную точку сразу.
+"""
+import asyncio
+import functools
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from utils.constants import SERVICE_SETTINGS, TRACKING_SETTINGS, SAMPLING_SETTINGS
+from utils.runtime_config import configure_runtime, ensure_applied, MODE_SERVICE
+
+LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost')
+# Допустимые имена в заголовке Host (IPv6 — в квадратных скобках)
+HOST_HEADER_NAMES = ('127.0.0.1', '[::1]', 'localhost')
+TERMINAL_STATES = ('done', 'failed', 'cancelled')
+
+HTTP_REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    415: 'Unsupported Media Type', 500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+
+
+class HttpError(Exception):
+    """Ошибка запроса, которая возвращается клиенту как JSON"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class TrackingJob:
+    """Задача трекинга одного видео"""
+
+    def __init__(self, video: str, settings: Dict, output_dir: str,
+                 sampling: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.video = video
+        self.settings = settings
+        self.sampling = sampling or {}
+        self.log_path = os.path.join(output_dir, f"{self.id}.traj")
+        self.trajectory_path = os.path.join(output_dir, f"{self.id}.npz")
+        self.status = 'queued'
+        self.frames_done = 0
+        self.frames_total = 0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.processor = None
+        self.cancel_requested = False
+        self.changed: Optional[asyncio.Event] = None
+
+    def to_dict(self) -> Dict:
+        """Публичное представление задачи"""
+        return {
+            'id': self.id,
+            'path': self.video,
+            'status': self.status,
+            'progress': {
+                'frames': self.frames_done,
+                'total': self.frames_total,
+                'fraction': self.frames_done / self.frames_total if self.frames_total else 0.0
+            },
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+
+class TrackingService:
+    """Сервис трекинга: очередь задач, пул воркеров и HTTP сервер"""
+
+    def __init__(self, host: str = SERVICE_SETTINGS["host"], port: int = SERVICE_SETTINGS["port"],
+                 workers: int = SERVICE_SETTINGS["workers"],
+                 queue_size: int = SERVICE_SETTINGS["queue_size"],
+                 output_dir: str = SERVICE_SETTINGS["output_dir"]):
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError(f"Сервис слушает только loopback-интерфейс, получено: {host}")
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.output_dir = output_dir
+        self.jobs: Dict[str, TrackingJob] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tracking-worker')
+        # Задачи выполняются параллельно — потоки OpenCV делятся между ними
+        configure_runtime(MODE_SERVICE, workers)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.server = None
+        self._worker_tasks = []
+
+    # === ЖИЗНЕННЫЙ ЦИКЛ ===
+
+    async def start(self):
+        """Запустить сервер и воркеры"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # Прогреваем импорты в потоках пула до первой задачи
+        await asyncio.gather(*[
+            self.loop.run_in_executor(self.executor, self._warm_up) for _ in range(self.workers)
+        ])
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        sockets = self.server.sockets or []
+        if sockets:
+            self.port = sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Запустить сервис и обслуживать запросы до остановки"""
+        await self.start()
+        print(f"Сервис трекинга: http://{self.host}:{self.port}")
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Остановить сервер, отменить задачи и освободить пул"""
+        if self.server:
+            self.server.close()
+        for job in self.jobs.values():
+            if job.status == 'queued':
+                job.cancel_requested = True
+                job.finished = time.time()
+                self._set_status(job, 'cancelled')
+            elif job.processor is not None:
+                job.processor.cancel()
+        for task in self._worker_tasks:
+            task.cancel()
+        # Ждём выполняющиеся задачи (они остановятся на следующем кадре)
+        # вне цикла событий, чтобы не блокировать его
+        shutdown = functools.partial(self.executor.shutdown, wait=True, cancel_futures=True)
+        if self.loop is not None:
+            await self.loop.run_in_executor(None, shutdown)
+        else:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _warm_up():
+        """Импортировать тяжёлые модули в рабочем потоке"""
+        import numpy  # noqa: F401
+        ensure_applied()
+        from core.headless_processor import HeadlessProcessor  # noqa: F401
+        from core.data_analyzer import DataAnalyzer  # noqa: F401
+
+    # === ЗАДАЧИ ===
+
+    def submit(self, video: str, settings: Optional[Dict] = None,
+               sampling: Optional[Dict] = None) -> TrackingJob:
+        """Поставить видео в очередь"""
+        if not os.path.isfile(video):
+            raise HttpError(400, f"Файл не найден: {video}")
+        unknown = set(settings or {}) - set(TRACKING_SETTINGS)
+        if unknown:
+            raise HttpError(400, f"Неизвестные настройки: {', '.join(sorted(unknown))}")
+
+        unknown = set(sampling or {}) - set(SAMPLING_SETTINGS)
+        if unknown:
+            raise HttpError(400, f"Неизвестные параметры выборки: {', '.join(sorted(unknown))}")
+
+        job = TrackingJob(os.path.abspath(video), dict(settings or {}), self.output_dir,
+                          dict(sampling or {}))
+        job.changed = asyncio.Event()
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HttpError(503, "Очередь задач заполнена")
+        self._evict_finished()
+        self.jobs[job.id] = job
+        return job
+
+    def cancel(self, job: TrackingJob):
+        """Отменить задачу (в очереди — сразу, выполняющуюся — на следующем кадре)"""
+        if job.status in TERMINAL_STATES:
+            raise HttpError(409, f"Задача уже завершена: {job.status}")
+        job.cancel_requested = True
+        if job.status == 'queued':
+            job.finished = time.time()
+            self._set_status(job, 'cancelled')
+        elif job.processor is not None:
+            job.processor.cancel()
+
+    async def _worker(self):
+        """Брать задачи из очереди и выполнять их в пуле потоков"""
+        while True:
+            job = await self.queue.get()
+            try:
+                if job.status != 'queued':
+                    continue
+                job.started = time.time()
+                self._set_status(job, 'running')
+                try:
+                    job.result = await self.loop.run_in_executor(self.executor, self._run_job, job)
+                    status = 'done' if job.result.get('completed') else 'cancelled'
+                except Exception as e:
+                    job.error = str(e)
+                    status = 'failed'
+                job.finished = time.time()
+                self._set_status(job, status)
+                self._evict_finished()
+            finally:
+                self.queue.task_done()
+
+    def _evict_finished(self):
+        """Удалить завершённые задачи старше finished_job_ttl и сверх max_finished_jobs"""
+        expire = time.time() - SERVICE_SETTINGS["finished_job_ttl"]
+        finished = sorted((job for job in self.jobs.values()
+                           if job.status in TERMINAL_STATES and job.finished is not None),
+                          key=lambda job: job.finished)
+        excess = len(finished) - SERVICE_SETTINGS["max_finished_jobs"]
+        for i, job in enumerate(finished):
+            if i >= excess and job.finished >= expire:
+                break
+            del self.jobs[job.id]
+            _remove_files(job.trajectory_path)
+
+    def _run_job(self, job: TrackingJob) -> Dict:
+        """Выполнить трекинг и анализ (в рабочем потоке)"""
+        from core.headless_processor import HeadlessProcessor
+        from core.batch_runner import analysis_summary
+        from core.trajectory_io import TrajectoryLogReader, save_npz
+
+        progress_step = SERVICE_SETTINGS["progress_every_frames"]
+
+        def on_progress(current: int, total: int):
+            if current % progress_step == 0 or current == total:
+                self.loop.call_soon_threadsafe(self._set_progress, job, current, total)
+
+        processor = HeadlessProcessor(job.settings, progress_callback=on_progress,
+                                      sampling=job.sampling)
+        job.processor = processor
+        if job.cancel_requested:
+            processor.cancel()
+        # Задачи не возобновляются — журнал и контрольная точка прерванной задачи не нужны
+        checkpoint_path = job.log_path + '.checkpoint'
+        try:
+            run_summary = processor.run(job.video, job.log_path, checkpoint_path, resume=False)
+        except Exception:
+            _remove_files(job.log_path, checkpoint_path)
+            raise
+        if not run_summary['completed']:
+            _remove_files(job.log_path, checkpoint_path)
+            return run_summary
+
+        columns = TrajectoryLogReader(job.log_path).read_columns()
+        save_npz(job.trajectory_path, columns, processor.settings)
+        os.remove(job.log_path)
+        frames = run_summary['processed_frames']
+        sampled = run_summary['sampled_frames']
+        return {
+            'completed': True,
+            'frames': frames,
+            'points': run_summary['points'],
+            'sampled_frames': sampled,
+            'detection_rate': run_summary['points'] / sampled if sampled else 0.0,
+            'fps': run_summary['fps'],
+            'tracking_seconds': run_summary['elapsed'],
+            'analysis': analysis_summary(columns),
+            'settings': processor.settings
+        }
+
+    def _set_progress(self, job: TrackingJob, current: int, total: int):
+        """Обновить прогресс (в потоке цикла событий)"""
+        job.frames_done = current
+        job.frames_total = total
+        self._notify(job)
+
+    def _set_status(self, job: TrackingJob, status: str):
+        """Сменить статус задачи и разбудить подписчиков"""
+        job.status = status
+        self._notify(job)
+
+    @staticmethod
+    def _notify(job: TrackingJob):
+        """Разбудить всех, кто ждёт изменений задачи"""
+        job.changed.set()
+        job.changed = asyncio.Event()
+
+    # === HTTP ===
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обработать одно HTTP соединение (один запрос)"""
+        try:
+            method, target, headers, body = await self._read_request(reader)
+            await self._dispatch(method, target, headers, body, writer)
+        except HttpError as e:
+            await self._send_json(writer, e.status, {'error': e.message})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            await self._send_json(writer, 500, {'error': str(e)})
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        """Прочитать строку запроса, заголовки и тело"""
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HttpError(400, "Некорректная строка запроса")
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        self._check_headers(headers)
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > SERVICE_SETTINGS["max_body_bytes"]:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    def _check_headers(self, headers: Dict[str, str]):
+        """
+        Отклонить запросы не от локального клиента
+
+        Host должен указывать на loopback-адрес (и порт сервиса, если он
+        указан) — иначе это DNS rebinding. Origin присылают только браузеры,
+        а браузерам обращаться к сервису незачем.
+        """
+        if 'origin' in headers:
+            raise HttpError(403, "Запросы из браузера (с заголовком Origin) не принимаются")
+        host = headers.get('host', '').lower()
+        name, port = host, ''
+        if host.startswith('['):
+            name, _, rest = host.partition(']')
+            name += ']'
+            if rest:
+                if not rest.startswith(':'):
+                    raise HttpError(403, f"Недопустимый заголовок Host: {host}")
+                port = rest[1:]
+        elif ':' in host:
+            name, _, port = host.partition(':')
+        if name not in HOST_HEADER_NAMES or (port and port != str(self.port)):
+            raise HttpError(403, f"Недопустимый заголовок Host: {host}")
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes,
+                        writer: asyncio.StreamWriter):
+        """Маршрутизация запроса"""
+        url = urlsplit(target)
+        parts = [p for p in url.path.split('/') if p]
+        query = parse_qs(url.query)
+
+        if parts == ['health']:
+            return await self._send_json(writer, 200, {
+                'status': 'ok',
+                'workers': self.workers,
+                'queued': self.queue.qsize(),
+                'jobs': len(self.jobs)
+            })
+
+        if parts == ['jobs']:
+            if method == 'GET':
+                return await self._send_json(writer, 200,
+                                             {'jobs': [j.to_dict() for j in self.jobs.values()]})
+            if method == 'POST':
+                content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+                if content_type != 'application/json':
+                    raise HttpError(415, "Нужен Content-Type: application/json")
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    raise HttpError(400, "Тело запроса должно быть JSON")
+                if not isinstance(payload, dict) or not payload.get('path'):
+                    raise HttpError(400, "Не указан путь к видео (path)")
+                job = self.submit(payload['path'], payload.get('settings'), payload.get('sampling'))
+                return await self._send_json(writer, 202, job.to_dict())
+            raise HttpError(405, "Метод не поддерживается")
+
+        if len(parts) < 2 or parts[0] != 'jobs':
+            raise HttpError(404, "Неизвестный адрес")
+        job = self.jobs.get(parts[1])
+        if job is None:
+            raise HttpError(404, "Задача не найдена")
+        action = parts[2] if len(parts) > 2 else None
+
+        if action is None and method == 'GET':
+            return await self._send_json(writer, 200, job.to_dict())
+        if action is None and method == 'DELETE':
+            self.cancel(job)
+            return await self._send_json(writer, 200, job.to_dict())
+        if method != 'GET':
+            raise HttpError(405, "Метод не поддерживается")
+        if action == 'events':
+            return await self._stream_events(job, writer)
+        if action == 'result':
+            if job.status != 'done':
+                raise HttpError(409, f"Задача не завершена: {job.status}")
+            return await self._send_json(writer, 200, dict(job.to_dict(), result=job.result))
+        if action == 'trajectory':
+            if job.status != 'done':
+                raise HttpError(409, f"Задача не завершена: {job.status}")
+            return await self._send_trajectory(job, query.get('format', ['json'])[0], writer)
+        raise HttpError(404, "Неизвестный адрес")
+
+    async def _stream_events(self, job: TrackingJob, writer: asyncio.StreamWriter):
+        """Отдавать состояние задачи при каждом изменении до её завершения"""
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n"
+                     b"Connection: close\r\n\r\n")
+        while True:
+            changed = job.changed
+            line = json.dumps(job.to_dict(), ensure_ascii=False).encode('utf-8') + b'\n'
+            writer.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+            await writer.drain()
+            if job.status in TERMINAL_STATES:
+                break
+            await changed.wait()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_trajectory(self, job: TrackingJob, fmt: str, writer: asyncio.StreamWriter):
+        """Отдать траекторию в JSON или NPZ"""
+        if fmt == 'npz':
+            data = await self.loop.run_in_executor(None, _read_file, job.trajectory_path)
+            return await self._send(writer, 200, data, 'application/octet-stream')
+        if fmt != 'json':
+            raise HttpError(400, f"Неизвестный формат: {fmt}")
+
+        from core.trajectory_io import load_npz
+        columns, _ = await self.loop.run_in_executor(None, load_npz, job.trajectory_path)
+        payload = {name: values.tolist() for name, values in columns.items()}
+        return await self._send_json(writer, 200, payload)
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict):
+        """Отправить JSON ответ"""
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        await self._send(writer, status, data, 'application/json; charset=utf-8')
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, data: bytes, content_type: str):
+        """Отправить ответ целиком"""
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+
+def _remove_files(*paths: str):
+    """Удалить файлы, если они есть"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _read_file(path: str) -> bytes:
+    """Прочитать файл целиком"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def run_service(**kwargs):
+    """Запустить сервис и блокироваться до Ctrl+C"""
+    service = TrackingService(**kwargs)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,41 @@
+"""
+Переиспользуемые буферы кадров для покадровой обработки
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Именованные буферы numpy, которые живут между кадрами
+
+    Буфер создаётся заново только при смене размера или типа (например,
+    при открытии видео с другим разрешением), поэтому в установившемся
+    режиме обработка кадра не выделяет память под изображения.
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Получить буфер нужной формы (содержимое не очищается)"""
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer
+
+    def copy_of(self, name: str, frame: np.ndarray) -> np.ndarray:
+        """Скопировать кадр в буфер с тем же именем"""
+        buffer = self.get(name, frame.shape, frame.dtype)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def clear(self):
+        """Освободить все буферы"""
+        self._buffers.clear()
+
+    def nbytes(self) -> int:
+        """Объём памяти, занятый буферами"""
+        return sum(buffer.nbytes for buffer in self._buffers.values())
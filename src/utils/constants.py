@@ -1,7 +1,7 @@
 """
 Константы и настройки приложения
 """
-import customtkinter as ctk
+import os
 
 # Настройки приложения
 APP_SETTINGS = {
@@ -37,12 +37,141 @@ TRACKING_SETTINGS = {
     "saturation_low": 100,
     "saturation_high": 255,
     "value_low": 100,
-    "value_high": 255
+    "value_high": 255,
+    "skip_stationary": False,   # перенос позиции на неподвижной сцене (с потерей точности) — по желанию
+    "change_threshold": 6.0,
+    "max_carried_frames": 150
 }
 
 # Поддерживаемые форматы видео
 SUPPORTED_VIDEO_FORMATS = (".mp4", ".avi", ".mov", ".mkv", ".wmv")
 
+# Кэш метаданных видео (путь + mtime + размер файла)
+METADATA_CACHE_SETTINGS = {
+    "memory_cache": True,
+    "disk_cache": True,
+    "disk_cache_path": os.path.join(os.path.expanduser("~"), ".video_motion_analyzer",
+                                    "metadata_cache.json"),
+    "max_entries": 1000
+}
+
+# Журнал траектории, который пишется на диск во время трекинга
+TRAJECTORY_LOG_SETTINGS = {
+    "enabled": True,
+    "directory": os.path.join(os.path.expanduser("~"), ".video_motion_analyzer", "sessions"),
+    "chunk_size": 256,          # точек в одном блоке записи
+    "fsync_every": 8,           # fsync раз в N блоков
+    "fsync_interval": 2.0,      # ... или раз в N секунд
+    "memory_points": 5000       # сколько последних точек держать в памяти
+}
+
+# Прореживание кадров
+SAMPLING_SETTINGS = {
+    "stride": 1,              # обрабатывать каждый N-й кадр
+    "target_rate": 0,         # целевая частота выборки, Гц (0 — по stride)
+    "adaptive": False,        # уплотнять выборку при быстром движении
+    "fast_motion_px": 4.0,    # скорость, px/кадр, при которой шаг уменьшается
+    "slow_motion_px": 1.0     # скорость, px/кадр, при которой шаг возвращается к базовому
+}
+
+# Обработка без GUI
+HEADLESS_SETTINGS = {
+    "checkpoint_interval": 500,   # кадров между контрольными точками
+    "keyframe_interval": 250      # ожидаемый интервал ключевых кадров при возобновлении
+}
+
+# Локальный сервис трекинга (HTTP/JSON, только loopback)
+SERVICE_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "workers": max(1, (os.cpu_count() or 2) // 2),
+    "queue_size": 256,
+    "output_dir": os.path.join(os.path.expanduser("~"), ".video_motion_analyzer", "service"),
+    "progress_every_frames": 25,
+    "max_body_bytes": 1024 * 1024,
+    "finished_job_ttl": 3600,      # секунд хранения завершённой задачи (и её траектории)
+    "max_finished_jobs": 1000      # завершённых задач в памяти, старые удаляются
+}
+
+# Профили калибровки камер (пиксели → метры)
+CALIBRATION_SETTINGS = {
+    "directory": os.path.join(os.path.expanduser("~"), ".video_motion_analyzer", "calibration")
+}
+
+# Производные траектории (см. core/derivatives.py)
+DERIVATIVE_SETTINGS = {
+    "method": "savgol",     # savgol, finite_diff, spline, moving_average
+    "window": 7,            # окно Савицкого–Голея, точек равномерной сетки (нечётное)
+    "polyorder": 2,         # степень полинома Савицкого–Голея
+    "spline_lam": None,     # параметр сглаживания сплайна (None — подбор по GCV)
+    "gap_factor": 5.0,      # интервал больше N медианных считается пропуском
+    "min_segment": 3        # участки короче не дифференцируются
+}
+
+# Частотный анализ (см. core/spectral_analysis.py)
+SPECTRAL_SETTINGS = {
+    "method": "welch",              # welch или fft
+    "segment_seconds": 20.0,        # длина сегмента Уэлча
+    "spectrogram_seconds": 5.0,     # окно спектрограммы
+    "overlap": 0.5,                 # перекрытие сегментов
+    "min_frequency": 0.05           # ниже — дрейф, а не колебания, Гц
+}
+
+# Карта пребывания и зоны (см. core/spatial_analysis.py)
+SPATIAL_SETTINGS = {
+    "heatmap_bins": 64,           # ячеек по каждой оси
+    "max_gap_seconds": 1.0,       # интервал, дольше которого объект считается потерянным
+    "zone_grid_resolution": 2048  # ячеек растра зон по длинной стороне
+}
+
+# Экспорт видео с разметкой (см. core/video_exporter.py)
+EXPORT_SETTINGS = {
+    "fourcc": {".mp4": "mp4v", ".avi": "MJPG", ".mkv": "XVID"},
+    "queue_size": 8,              # кадров в очереди к кодировщику
+    "trail_color": (0, 200, 255),
+    "trail_thickness": 2,
+    "trail_gap_seconds": 1.0      # разрыв следа, если объект пропадал дольше
+}
+
+# Передача кадров процессам трекинга через общую память (см. core/frame_transport.py)
+TRANSPORT_SETTINGS = {
+    "slots_per_worker": 3,      # ячеек кольца на процесс: один кадр в работе, два в очереди
+    "start_method": "spawn",    # одинаково на Linux, macOS и Windows
+    "poll_interval": 0.5        # с, период проверки живости процессов
+}
+
+# Автоподбор порогов HSV (см. core/hsv_autotune.py)
+HSV_AUTOTUNE_SETTINGS = {
+    "click_radius": 12,            # px, половина стороны квадрата вокруг щелчка по объекту
+    "percentiles": (2, 98),        # перцентили каналов H, S, V в отмеченной области
+    "margins": (4, 25, 25),        # запас к границам H, S, V после перцентилей
+    "sample_runs": 10,             # серий соседних кадров видео в наборе для перебора
+    "run_length": 4,               # кадров подряд в серии (по ним считаются рывки)
+    "missing_run_jitter": 0.05,    # рывок серии с пропуском распознавания (доля диагонали)
+    "hue_expand": (0, 4, 8),       # расширение диапазона Hue в переборе
+    "sv_expand": (0, 30, 60),      # снижение нижних порогов Saturation и Value
+    "morph_iters": (1, 2, 3),
+    "blur_sizes": (0, 5),
+    "min_area_factors": (0.2, 0.5),  # min_area как доля площади объекта в отмеченных областях
+    "label_weight": 1.0,           # вес попадания в отмеченные области
+    "smoothness_weight": 10.0,     # штраф за рывки траектории (доля диагонали кадра)
+    "start_method": "spawn"        # запуск из GUI с потоками: fork небезопасен
+}
+
+# Потоки OpenCV и OpenCL (см. utils/runtime_config.py)
+RUNTIME_SETTINGS = {
+    "opencv_threads": {},     # явное число потоков по режиму, например {"gui": 4}
+    "use_opencl": os.environ.get("VMA_OPENCL", "") not in ("", "0")
+}
+
+# Замер времени по этапам обработки кадра
+PROFILER_SETTINGS = {
+    "enabled": os.environ.get("VMA_PROFILE", "") not in ("", "0"),
+    "window": 600,                  # последних замеров на этап
+    "status_interval_ms": 1000,     # период обновления статус-бара
+    "directory": os.path.join(os.path.expanduser("~"), ".video_motion_analyzer", "profiles")
+}
+
 # Настройки интерфейса
 UI_SETTINGS = {
     "corner_radius": 8,
@@ -55,5 +184,8 @@ UI_SETTINGS = {
 
 def setup_theme():
     """Настройка темы customtkinter"""
+    # Импорт здесь, чтобы константы можно было использовать без GUI
+    import customtkinter as ctk
+    
     ctk.set_appearance_mode(APP_SETTINGS["theme"])
     ctk.set_default_color_theme(APP_SETTINGS["color_theme"])
\ No newline at end of file
@@ -5,7 +5,6 @@ import os
 import csv
 from tkinter import filedialog, messagebox
 from typing import Optional, List, Tuple
-import cv2
 
 from .constants import SUPPORTED_VIDEO_FORMATS
 
@@ -55,26 +54,12 @@ class FileHandler:
     
     @staticmethod
     def get_video_properties(video_path: str) -> Optional[dict]:
-        """Получить свойства видео файла"""
+        """Получить свойства видео файла (из кэша метаданных, если файл не менялся)"""
+        # Импорт здесь, чтобы utils не зависел от core при загрузке
+        from core.video_metadata import probe_video
+        
         try:
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                return None
-                
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            duration = frame_count / fps if fps > 0 else 0
-            
-            cap.release()
-            
-            return {
-                'fps': fps,
-                'frame_count': frame_count,
-                'width': width,
-                'height': height,
-                'duration': duration
-            }
+            metadata = probe_video(video_path)
+            return metadata.to_properties() if metadata else None
         except Exception:
             return None
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Отложенный импорт тяжёлых модулей
+"""
+import importlib
+import sys
+import threading
+import types
+from typing import Callable, Dict, List
+
+# Действия, которые нужно выполнить сразу после импорта модуля
+_import_hooks: Dict[str, List[Callable]] = {}
+_import_hooks_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Заглушка модуля, которая импортирует настоящий модуль при первом обращении"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lazy_target = None
+
+    def _load(self) -> types.ModuleType:
+        """Импортировать модуль, если он ещё не загружен"""
+        if self._lazy_target is None:
+            self._lazy_target = importlib.import_module(self.__name__)
+            _run_import_hooks(self.__name__, self._lazy_target)
+        return self._lazy_target
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "загружен" if self._lazy_target is not None else "не загружен"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Вернуть модуль, который будет импортирован при первом обращении к атрибуту
+
+    Если модуль уже импортирован, возвращается он сам.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """Проверить, импортирован ли модуль на самом деле"""
+    return name in sys.modules
+
+
+def when_imported(name: str, callback: Callable[[types.ModuleType], None]):
+    """
+    Вызвать callback(module), когда модуль будет импортирован через lazy_import
+
+    Если модуль уже загружен, callback вызывается сразу.
+    """
+    with _import_hooks_lock:
+        module = sys.modules.get(name)
+        if module is None:
+            _import_hooks.setdefault(name, []).append(callback)
+            return
+    callback(module)
+
+
+def _run_import_hooks(name: str, module: types.ModuleType):
+    """Выполнить отложенные действия для только что импортированного модуля"""
+    with _import_hooks_lock:
+        callbacks = _import_hooks.pop(name, [])
+    for callback in callbacks:
+        callback(module)
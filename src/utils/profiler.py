@@ -0,0 +1,135 @@
+"""
+Замер времени по этапам конвейера обработки кадра
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.constants import PROFILER_SETTINGS
+
+# Общий пустой контекст для выключенного профилировщика (без выделений на кадр)
+_NULL_STAGE = nullcontext()
+
+
+class _StageTimer:
+    """Контекст замера одного этапа"""
+
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler: 'StageProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class StageProfiler:
+    """
+    Скользящая статистика длительности этапов (p50/p95/p99)
+
+    Выключенный профилировщик возвращает общий пустой контекст, поэтому
+    замеры можно оставлять в горячем пути постоянно.
+    """
+
+    def __init__(self, window: int = PROFILER_SETTINGS["window"],
+                 enabled: bool = PROFILER_SETTINGS["enabled"]):
+        self.window = window
+        self.enabled = enabled
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str):
+        """Контекст для замера этапа: ``with profiler.stage('decode'): ...``"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _StageTimer(self, name)
+
+    def record(self, name: str, seconds: float):
+        """Добавить измерение этапа в секундах"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append(seconds)
+            self._counts[name] += 1
+
+    def set_enabled(self, enabled: bool):
+        """Включить или выключить замеры (накопленная статистика сохраняется)"""
+        self.enabled = enabled
+
+    def reset(self):
+        """Очистить статистику"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def summary(self) -> Dict[str, Dict]:
+        """Статистика по этапам в миллисекундах за последнее окно замеров"""
+        with self._lock:
+            snapshot = {name: (np.array(samples), self._counts[name])
+                        for name, samples in self._samples.items() if samples}
+
+        result = {}
+        for name, (samples, count) in snapshot.items():
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+            result[name] = {
+                'count': count,
+                'mean_ms': float(samples.mean() * 1000),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'last_ms': float(samples[-1] * 1000)
+            }
+        return result
+
+    def format_status(self, limit: int = 3) -> str:
+        """Короткая строка для статус-бара: самые медленные этапы по p95"""
+        summary = self.summary()
+        if not summary:
+            return ""
+        slowest = sorted(summary.items(), key=lambda item: item[1]['p95_ms'], reverse=True)
+        return " | ".join(f"{name} p95 {stats['p95_ms']:.1f} мс"
+                          for name, stats in slowest[:limit])
+
+    def dump(self, filename: str, extra: Optional[Dict] = None) -> bool:
+        """Сохранить статистику в JSON"""
+        try:
+            directory = os.path.dirname(filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            report = {
+                'created': time.time(),
+                'window': self.window,
+                'stages': self.summary()
+            }
+            if extra:
+                report.update(extra)
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            print(f"Ошибка сохранения профиля: {e}")
+            return False
+
+
+_default_profiler = StageProfiler()
+
+
+def get_profiler() -> StageProfiler:
+    """Общий профилировщик приложения"""
+    return _default_profiler
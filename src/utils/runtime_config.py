@@ -0,0 +1,110 @@
+"""
+Настройка потоков OpenCV и OpenCL (UMat) под режим выполнения
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+from utils.constants import RUNTIME_SETTINGS
+from utils.lazy_import import when_imported
+
+# Режимы выполнения
+MODE_GUI = 'gui'                    # интерфейс: ядра делятся с декодированием и Tk
+MODE_HEADLESS = 'headless'          # одно видео без интерфейса: все ядра
+MODE_BATCH_WORKER = 'batch_worker'  # процесс пула: ядра делятся между процессами
+MODE_SERVICE = 'service'            # сервис: ядра делятся между рабочими потоками
+
+_config: Dict = {}
+_config_lock = threading.Lock()
+
+
+def threads_for_mode(mode: str, workers: int = 1) -> int:
+    """Число потоков OpenCV для режима (workers — параллельных задач в процессе/пуле)"""
+    cpu_count = os.cpu_count() or 1
+    override = RUNTIME_SETTINGS["opencv_threads"].get(mode)
+    if override:
+        return override
+    if mode == MODE_GUI:
+        # Оставляем ядро потоку декодирования и ядро интерфейсу
+        return max(1, cpu_count - 2)
+    if mode in (MODE_BATCH_WORKER, MODE_SERVICE):
+        # Параллелизм уже есть на уровне задач — не создаём лишних потоков
+        return max(1, cpu_count // max(1, workers))
+    return cpu_count
+
+
+def configure_runtime(mode: str, workers: int = 1, use_opencl: Optional[bool] = None) -> Dict:
+    """
+    Задать конфигурацию выполнения
+
+    Применяется сразу, если OpenCV уже загружен, иначе — при первом его
+    импорте (чтобы не терять отложенную загрузку cv2 при запуске GUI).
+    """
+    if use_opencl is None:
+        use_opencl = RUNTIME_SETTINGS["use_opencl"]
+    with _config_lock:
+        _config.clear()
+        _config.update({
+            'mode': mode,
+            'workers': workers,
+            'threads': threads_for_mode(mode, workers),
+            'opencl_requested': bool(use_opencl),
+            'opencl': False,
+            'opencl_device': None,
+            'applied': False
+        })
+    when_imported('cv2', _apply)
+    return get_runtime_config()
+
+
+def _apply(cv2):
+    """Применить конфигурацию к загруженному модулю cv2"""
+    with _config_lock:
+        if not _config:
+            return
+        cv2.setNumThreads(_config['threads'])
+        _config['opencl'], _config['opencl_device'] = _setup_opencl(cv2, _config['opencl_requested'])
+        _config['applied'] = True
+
+
+def _setup_opencl(cv2, requested: bool):
+    """Включить OpenCL, если он запрошен и доступен; иначе явно выключить"""
+    try:
+        if requested and cv2.ocl.haveOpenCL():
+            cv2.ocl.setUseOpenCL(True)
+            if cv2.ocl.useOpenCL():
+                return True, cv2.ocl.Device_getDefault().name()
+        cv2.ocl.setUseOpenCL(False)
+    except Exception as e:
+        print(f"OpenCL недоступен, используется CPU: {e}")
+    return False, None
+
+
+def ensure_applied():
+    """Загрузить OpenCV и применить конфигурацию, если это ещё не сделано"""
+    if _config and not _config.get('applied'):
+        import cv2
+        _apply(cv2)
+
+
+def disable_opencl():
+    """Отключить OpenCL после сбоя (обработка продолжается на CPU)"""
+    with _config_lock:
+        _config['opencl'] = False
+        _config['opencl_device'] = None
+    try:
+        import cv2
+        cv2.ocl.setUseOpenCL(False)
+    except Exception:
+        pass
+
+
+def opencl_enabled() -> bool:
+    """Включена ли обработка через UMat"""
+    return bool(_config.get('opencl'))
+
+
+def get_runtime_config() -> Dict:
+    """Текущая конфигурация (для отчётов и бенчмарков)"""
+    with _config_lock:
+        return dict(_config)